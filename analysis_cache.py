@@ -0,0 +1,201 @@
+"""
+Persistent PyInstaller work directories for Lightning EXE.
+
+PyInstaller can skip Analysis, PYZ and the other build steps when its work
+directory still holds the results of an identical earlier build. Instead
+of mixing that directory into the output folder, every combination of
+project, entry script, interpreter and build options gets its own work
+directory in the Lightning EXE cache.
+
+Options that only affect packaging (compression) are kept out of the key,
+so switching them reuses the Analysis. The strategy of the last build is
+recorded, and a different one discards the saved packaging steps.
+
+PyInstaller only notices inputs whose modification time moved forward, so
+the cache additionally records the project files PyInstaller analysed and
+the installed distributions of the build interpreter. When a file was
+deleted or replaced by an older copy, or the dependencies changed, the
+work directory is wiped so the next build starts from a clean analysis.
+"""
+import ast
+import glob
+import json
+import os
+import shutil
+import time
+
+import process_runner
+from cache_utils import get_cache_dir, hash_strings
+
+INFO_FILE = "cache-info.json"
+
+# Build steps after Analysis; their saved results depend on packaging options
+PACKAGING_STEPS = ("PYZ", "PKG", "EXE", "COLLECT")
+
+_LIST_DISTRIBUTIONS = (
+    "import sys, importlib.metadata as md\n"
+    "print(sys.version)\n"
+    "for d in md.distributions():\n"
+    "    print(f\"{d.metadata['Name']}=={d.version}\")\n"
+)
+
+
+def distributions_command(python_exe):
+    """Command whose output fingerprint_distributions() hashes; lets callers run it alongside other probes"""
+    return [python_exe, "-c", _LIST_DISTRIBUTIONS]
+
+
+def fingerprint_distributions(result):
+    """dependency_fingerprint() from a finished distributions_command() (a ProcessResult)"""
+    if result.returncode != 0:
+        # Can't tell what changed, so never match a previous build
+        return hash_strings("unknown", time.time())
+    lines = result.stdout.splitlines()
+    return hash_strings(lines[0], *sorted(set(lines[1:])))
+
+
+def dependency_fingerprint(python_exe, cancel=None):
+    """
+    Hash of the interpreter version and every distribution installed in it.
+
+    This covers the project's requirements as well as PyInstaller itself
+    and its hooks.
+    """
+    return fingerprint_distributions(process_runner.run(distributions_command(python_exe), cancel=cancel,
+                                                        merge_stderr=False))
+
+
+def _toc_sources(value, found):
+    """Collect the source paths of all (dest, src, typecode) entries in a TOC structure"""
+    if isinstance(value, (list, tuple)):
+        if len(value) == 3 and all(isinstance(v, str) for v in value):
+            found.add(value[1])
+        else:
+            for item in value:
+                _toc_sources(item, found)
+
+
+def _file_signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+class AnalysisCacheEntry:
+    """The cached PyInstaller work and spec directory for one build configuration"""
+
+    def __init__(self, path, key):
+        self.path = path
+        self.key = key
+
+    @property
+    def workpath(self):
+        return os.path.join(self.path, "work")
+
+    @property
+    def specpath(self):
+        return os.path.join(self.path, "spec")
+
+    @property
+    def lock_path(self):
+        return self.path + ".lock"
+
+    @property
+    def info_path(self):
+        return os.path.join(self.path, INFO_FILE)
+
+    def analysed_files(self, project_dir):
+        """Project files listed in PyInstaller's saved Analysis results"""
+        project_dir = os.path.abspath(project_dir) + os.sep
+        found = set()
+        for toc_path in glob.glob(os.path.join(self.workpath, "*", "Analysis-*.toc")):
+            try:
+                with open(toc_path, "r", encoding="utf-8") as f:
+                    _toc_sources(ast.literal_eval(f.read()), found)
+            except (OSError, ValueError, SyntaxError):
+                continue
+        return sorted(p for p in found if os.path.abspath(p).startswith(project_dir))
+
+    def check(self, dependencies):
+        """
+        Decide whether the cached work directory can be reused.
+
+        Args:
+            dependencies (str): Current dependency_fingerprint of the build interpreter
+
+        Returns:
+            str: Why the cache must be discarded, or None if it is still valid
+        """
+        try:
+            with open(self.info_path, "r", encoding="utf-8") as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            return "no previous build"
+
+        if info.get("dependencies") != dependencies:
+            return "installed dependencies changed"
+        for path, signature in info.get("files", {}).items():
+            current = _file_signature(path)
+            if current is None:
+                return f"{os.path.basename(path)} was removed"
+            if current != signature:
+                # PyInstaller catches newer files itself, but not older ones
+                if current[1] < signature[1]:
+                    return f"{os.path.basename(path)} was replaced by an older version"
+        return None
+
+    def packaging(self):
+        """Packaging strategy of the last build, or None"""
+        try:
+            with open(self.info_path, "r", encoding="utf-8") as f:
+                return json.load(f).get("packaging")
+        except (OSError, ValueError):
+            return None
+
+    def reset_packaging(self):
+        """Make PyInstaller redo every step after Analysis"""
+        for step in PACKAGING_STEPS:
+            for toc_path in glob.glob(os.path.join(self.workpath, "*", f"{step}-*.toc")):
+                os.remove(toc_path)
+
+    def invalidate(self):
+        """Throw away the cached PyInstaller state"""
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def record(self, project_dir, dependencies, packaging=None):
+        """Remember the inputs of a successful build"""
+        files = {path: _file_signature(path) for path in self.analysed_files(project_dir)}
+        info = {
+            "key": self.key,
+            "dependencies": dependencies,
+            "files": {path: sig for path, sig in files.items() if sig is not None},
+            "packaging": packaging,
+            "built": time.time(),
+        }
+        os.makedirs(self.path, exist_ok=True)
+        with open(self.info_path, "w", encoding="utf-8") as f:
+            json.dump(info, f, indent=1)
+
+
+def get_analysis_cache_entry(project_dir, source_file, python_exe, options):
+    """
+    Return the cache entry for a build configuration.
+
+    Args:
+        project_dir (str): Project folder containing the entry script
+        source_file (str): The entry script
+        python_exe (str): Interpreter running PyInstaller
+        options (list): PyInstaller options, excluding dist/work/spec paths and packaging options
+
+    Returns:
+        AnalysisCacheEntry: Entry whose directories may or may not exist yet
+    """
+    key = hash_strings(
+        os.path.abspath(project_dir),
+        os.path.abspath(source_file),
+        os.path.abspath(python_exe),
+        *options
+    )
+    return AnalysisCacheEntry(os.path.join(get_cache_dir("workpaths"), key[:24]), key)
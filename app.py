@@ -1,16 +1,11 @@
 import flet as ft
-import os
-import threading
-import subprocess
-import tempfile
-import shutil
-import requests
-import zipfile
-import re
 import sys
-import venv
-from pull_repo import clone_github_repo
-import cmd_args_helper
+import threading
+import toolchains
+from build_daemon import DaemonClient
+from build_engine import BuildEngine, BuildTarget
+from build_log import BuildLog
+from process_runner import CancelToken
 
 
 class LightningEXEFlet:
@@ -22,18 +17,35 @@ class LightningEXEFlet:
         self.input_type = "file"
         self.source_path = ""
         self.main_file = ""
+        self.entry_points = ""
+        self.ref = ""
+        self.use_archive = False
         self.output_dir = ""
         self.onefile = True
         self.console = True
+        self.isolated_env = True
+        self.drop_unused_requirements = False
+        self.benchmark = False
+        self.fast_start = False
+        self.release_bytecode = False
+        self.compression = "default"
+        self.watch = False
+        self.use_daemon = True
+        self.python_exe = sys.executable
         self.detected_special = False
         self.detected_framework = None
         self.experimental_mode_enabled = False
+        self.cancel_token = None  # set while a build is running
         
         # UI references
         self.page = None
         self.status_text = None
         self.progress_bar = None
         self.build_button = None
+        self.cancel_button = None
+        
+        # Status lines are buffered and shown in batches
+        self.build_log = BuildLog(flush_callback=self.show_log)
         
     def main(self, page: ft.Page):
         self.page = page
@@ -150,6 +162,30 @@ class LightningEXEFlet:
             value=""
         )
         
+        # More tools built into the same folder from one shared analysis
+        self.entry_points_field = ft.TextField(
+            label="Extra Entry Points",
+            hint_text="More scripts next to the main one, one executable each (comma-separated, one-folder builds)",
+            on_change=self.on_entry_points_change,
+            value=""
+        )
+        
+        # Branch, tag or commit (GitHub only)
+        self.ref_field = ft.TextField(
+            label="Branch, Tag or Commit",
+            hint_text="Leave empty for the default branch",
+            visible=False,
+            on_change=self.on_ref_change,
+            value=""
+        )
+        
+        self.archive_checkbox = ft.Checkbox(
+            label="Download a snapshot archive instead of cloning with git",
+            value=False,
+            visible=False,
+            on_change=self.on_archive_change
+        )
+        
         # Create the main content with proper structure
         content_column = ft.Column([
             ft.Container(
@@ -166,6 +202,9 @@ class LightningEXEFlet:
                     ft.Text("Source Location", size=16, weight=ft.FontWeight.BOLD),
                     source_row,
                     self.main_file_field,
+                    self.entry_points_field,
+                    self.ref_field,
+                    self.archive_checkbox,
                 ], spacing=10),
                 padding=ft.padding.all(10),
                 border=ft.border.all(1, ft.Colors.OUTLINE),
@@ -213,6 +252,69 @@ class LightningEXEFlet:
             on_change=self.on_console_change
         )
         
+        self.isolated_env_checkbox = ft.Checkbox(
+            label="Install requirements into a cached isolated environment",
+            value=True,
+            on_change=self.on_isolated_env_change
+        )
+        
+        self.drop_unused_checkbox = ft.Checkbox(
+            label="Leave out requirements the code never imports",
+            value=False,
+            on_change=self.on_drop_unused_change
+        )
+        
+        self.benchmark_checkbox = ft.Checkbox(
+            label="Benchmark startup time after building",
+            value=False,
+            on_change=self.on_benchmark_change
+        )
+        
+        self.fast_start_checkbox = ft.Checkbox(
+            label="Fast start: unpack a single-file executable once and reuse it on later launches",
+            value=False,
+            on_change=self.on_fast_start_change
+        )
+        
+        self.release_bytecode_checkbox = ft.Checkbox(
+            label="Release-optimized bytecode (strip asserts and docstrings where safe)",
+            value=False,
+            on_change=self.on_release_bytecode_change
+        )
+        
+        self.compression_dropdown = ft.Dropdown(
+            label="Compression",
+            value="default",
+            options=[
+                ft.dropdown.Option("default", "PyInstaller default"),
+                ft.dropdown.Option("none", "None (largest, fastest start)"),
+                ft.dropdown.Option("pyz", "Python modules only"),
+                ft.dropdown.Option("upx", "Everything, plus UPX"),
+            ],
+            on_change=self.on_compression_change
+        )
+        
+        self.watch_checkbox = ft.Checkbox(
+            label="Watch mode: rebuild a folder project whenever its files change (Cancel stops watching)",
+            value=False,
+            on_change=self.on_watch_change
+        )
+        
+        self.python_dropdown = ft.Dropdown(
+            label="Build interpreter",
+            value=sys.executable,
+            options=[ft.dropdown.Option(sys.executable, f"This interpreter ({sys.executable})")],
+            on_change=self.on_python_change
+        )
+        # Probing new interpreters can take a moment, so the list fills in once they're known
+        threading.Thread(target=self.load_interpreters, daemon=True).start()
+        
+        self.daemon_checkbox = ft.Checkbox(
+            label="Submit builds to the build daemon when one is running (python cli.py daemon)",
+            value=True,
+            on_change=self.on_daemon_change
+        )
+        
         return ft.Container(
             content=ft.Column([
                 ft.Text("Output Settings", size=16, weight=ft.FontWeight.BOLD),
@@ -221,6 +323,15 @@ class LightningEXEFlet:
                 ft.Text("Build Options", size=16, weight=ft.FontWeight.BOLD),
                 self.onefile_checkbox,
                 self.console_checkbox,
+                self.isolated_env_checkbox,
+                self.drop_unused_checkbox,
+                self.python_dropdown,
+                self.fast_start_checkbox,
+                self.release_bytecode_checkbox,
+                self.compression_dropdown,
+                self.benchmark_checkbox,
+                self.watch_checkbox,
+                self.daemon_checkbox,
             ], spacing=15),
             padding=20
         )
@@ -318,12 +429,21 @@ class LightningEXEFlet:
             on_click=self.start_build
         )
         
+        # Cancel button, shown while a build runs
+        self.cancel_button = ft.OutlinedButton(
+            text="Cancel",
+            icon=ft.Icons.CANCEL,
+            visible=False,
+            on_click=self.cancel_build
+        )
+        
         return ft.Container(
             content=ft.Column([
                 self.status_text,
                 self.progress_bar,
                 ft.Row([
-                    self.build_button
+                    self.build_button,
+                    self.cancel_button
                 ], alignment=ft.MainAxisAlignment.CENTER)
             ], spacing=15),
             padding=20
@@ -337,6 +457,8 @@ class LightningEXEFlet:
         # Show/hide main file field for folder and GitHub options
         if self.input_type in ["folder", "github"]:
             self.main_file_field.visible = True
+            self.ref_field.visible = self.input_type == "github"
+            self.archive_checkbox.visible = self.input_type == "github"
             if self.input_type == "github":
                 self.source_path_field.hint_text = "Enter GitHub repository URL"
                 self.source_path_field.label = "GitHub Repository URL"
@@ -347,6 +469,8 @@ class LightningEXEFlet:
                 self.browse_button.visible = True
         else:
             self.main_file_field.visible = False
+            self.ref_field.visible = False
+            self.archive_checkbox.visible = False
             self.source_path_field.hint_text = "Select a Python file"
             self.source_path_field.label = "Python File"
             self.browse_button.visible = True
@@ -354,8 +478,10 @@ class LightningEXEFlet:
         # Clear the current value when switching types
         self.source_path_field.value = ""
         self.main_file_field.value = ""
+        self.ref_field.value = ""
         self.source_path = ""
         self.main_file = ""
+        self.ref = ""
         
         self.page.update()
         
@@ -366,6 +492,15 @@ class LightningEXEFlet:
     def on_main_file_change(self, e):
         self.main_file = e.control.value
         
+    def on_entry_points_change(self, e):
+        self.entry_points = e.control.value
+        
+    def on_ref_change(self, e):
+        self.ref = e.control.value.strip()
+        
+    def on_archive_change(self, e):
+        self.use_archive = e.control.value
+        
     def on_output_dir_change(self, e):
         self.output_dir = e.control.value
         
@@ -375,6 +510,46 @@ class LightningEXEFlet:
     def on_console_change(self, e):
         self.console = e.control.value
         
+    def on_isolated_env_change(self, e):
+        self.isolated_env = e.control.value
+        
+    def on_drop_unused_change(self, e):
+        self.drop_unused_requirements = e.control.value
+        
+    def on_benchmark_change(self, e):
+        self.benchmark = e.control.value
+        
+    def on_fast_start_change(self, e):
+        self.fast_start = e.control.value
+        
+    def on_release_bytecode_change(self, e):
+        self.release_bytecode = e.control.value
+        
+    def on_compression_change(self, e):
+        self.compression = e.control.value
+        
+    def on_watch_change(self, e):
+        self.watch = e.control.value
+        
+    def on_daemon_change(self, e):
+        self.use_daemon = e.control.value
+        
+    def on_python_change(self, e):
+        self.python_exe = e.control.value
+        
+    def load_interpreters(self):
+        """Offer every interpreter the toolchain registry finds"""
+        try:
+            interpreters = toolchains.discover()
+        except Exception as ex:
+            self.update_status(f"Warning: Could not look for Python interpreters: {ex}", "warning")
+            return
+        options = [ft.dropdown.Option(sys.executable, f"This interpreter ({sys.executable})")]
+        options.extend(ft.dropdown.Option(i.path, i.describe()) for i in interpreters if i.path != sys.executable)
+        self.python_dropdown.options = options
+        if self.page is not None:
+            self.page.update()
+        
     def on_cmd_args_change(self, e):
         self.cmd_args = e.control.value
         
@@ -487,9 +662,21 @@ class LightningEXEFlet:
             self.input_type = "file"
             self.source_path = ""
             self.main_file = ""
+            self.entry_points = ""
+            self.ref = ""
+            self.use_archive = False
             self.output_dir = ""
             self.onefile = True
             self.console = True
+            self.isolated_env = True
+            self.drop_unused_requirements = False
+            self.benchmark = False
+            self.fast_start = False
+            self.release_bytecode = False
+            self.compression = "default"
+            self.watch = False
+            self.use_daemon = True
+            self.python_exe = sys.executable
             self.detected_special = False
             self.detected_framework = None
             self.experimental_mode_enabled = False
@@ -504,6 +691,17 @@ class LightningEXEFlet:
                 self.main_file_field.value = ""
                 self.main_file_field.visible = False
                 
+            if hasattr(self, 'entry_points_field'):
+                self.entry_points_field.value = ""
+                
+            if hasattr(self, 'ref_field'):
+                self.ref_field.value = ""
+                self.ref_field.visible = False
+                
+            if hasattr(self, 'archive_checkbox'):
+                self.archive_checkbox.value = False
+                self.archive_checkbox.visible = False
+                
             if hasattr(self, 'output_dir_field'):
                 self.output_dir_field.value = ""
                 
@@ -513,6 +711,33 @@ class LightningEXEFlet:
             if hasattr(self, 'console_checkbox'):
                 self.console_checkbox.value = True
                 
+            if hasattr(self, 'isolated_env_checkbox'):
+                self.isolated_env_checkbox.value = True
+                
+            if hasattr(self, 'drop_unused_checkbox'):
+                self.drop_unused_checkbox.value = False
+                
+            if hasattr(self, 'benchmark_checkbox'):
+                self.benchmark_checkbox.value = False
+                
+            if hasattr(self, 'fast_start_checkbox'):
+                self.fast_start_checkbox.value = False
+                
+            if hasattr(self, 'release_bytecode_checkbox'):
+                self.release_bytecode_checkbox.value = False
+                
+            if hasattr(self, 'compression_dropdown'):
+                self.compression_dropdown.value = "default"
+                
+            if hasattr(self, 'watch_checkbox'):
+                self.watch_checkbox.value = False
+                
+            if hasattr(self, 'daemon_checkbox'):
+                self.daemon_checkbox.value = True
+                
+            if hasattr(self, 'python_dropdown'):
+                self.python_dropdown.value = sys.executable
+                
             if hasattr(self, 'cmd_args_field'):
                 self.cmd_args_field.value = ""
                 
@@ -534,6 +759,7 @@ class LightningEXEFlet:
                 self.env_vars_list.controls.clear()
                 
             # Reset status
+            self.build_log.clear()
             if hasattr(self, 'status_text'):
                 self.status_text.value = "Ready to build executable..."
                 
@@ -545,6 +771,10 @@ class LightningEXEFlet:
             if hasattr(self, 'build_button'):
                 self.build_button.disabled = False
                 
+            # Stop a running build
+            if self.cancel_token is not None:
+                self.cancel_token.cancel()
+                
             # Show browse button
             if hasattr(self, 'browse_button'):
                 self.browse_button.visible = True
@@ -556,8 +786,7 @@ class LightningEXEFlet:
             self.update_status(f"Error during reset: {str(ex)}", "error")
         
     def update_status(self, message, status_type="info"):
-        """Update the status text area with new message"""
-        current_text = self.status_text.value
+        """Add a status line; the text area is refreshed in batches by the build log"""
         timestamp = __import__('datetime').datetime.now().strftime("%H:%M:%S")
         
         status_icons = {
@@ -568,13 +797,11 @@ class LightningEXEFlet:
         }
         
         icon = status_icons.get(status_type, "ℹ️")
-        new_line = f"[{timestamp}] {icon} {message}"
+        self.build_log.write(f"[{timestamp}] {icon} {message}")
         
-        if current_text.strip() == "Ready to build executable...":
-            self.status_text.value = new_line
-        else:
-            self.status_text.value = current_text + "\n" + new_line
-            
+    def show_log(self, text):
+        """Show the buffered log lines in the status text area"""
+        self.status_text.value = text
         self.page.update()
         
     def start_build(self, e):
@@ -583,7 +810,10 @@ class LightningEXEFlet:
             return
             
         # Disable build button and show progress
+        self.cancel_token = CancelToken()
         self.build_button.disabled = True
+        self.cancel_button.disabled = False
+        self.cancel_button.visible = True
         self.progress_bar.visible = True
         self.page.update()
         
@@ -592,244 +822,77 @@ class LightningEXEFlet:
         build_thread.daemon = True
         build_thread.start()
         
+    def cancel_build(self, e):
+        """Stop the running build and everything it started"""
+        if self.cancel_token is None:
+            return
+        self.update_status("Cancelling build...", "warning")
+        self.cancel_token.cancel()
+        self.cancel_button.disabled = True
+        self.page.update()
+        
     def validate_inputs(self):
         """Validate user inputs before building"""
-        if not self.source_path:
-            self.update_status("Please select a source file, folder, or GitHub URL", "error")
-            return False
-            
-        if self.input_type in ["folder", "github"] and not self.main_file:
-            self.update_status("Please specify the main Python file", "error")
-            return False
-            
-        if not self.output_dir:
-            self.update_status("Please select an output directory", "error")
+        error = self.create_build_target().validate()
+        if error:
+            self.update_status(error, "error")
             return False
             
         return True
         
     def build_executable(self):
         """Main build process - runs in separate thread"""
+        target = self.create_build_target()
         try:
-            self.update_status("Starting build process...", "info")
-            
-            # Prepare source
-            if self.input_type == "file":
-                source_file = self.source_path
-                source_dir = os.path.dirname(source_file)
-            elif self.input_type == "folder":
-                source_dir = self.source_path
-                source_file = os.path.join(source_dir, self.main_file)
-            else:  # github
-                self.update_status("Cloning GitHub repository...", "info")
-                temp_dir = tempfile.mkdtemp()
-                source_dir = self.download_github_repo(self.source_path, temp_dir)
-                source_file = os.path.join(source_dir, self.main_file)
-                
-            if not os.path.exists(source_file):
-                raise Exception(f"Main file not found: {source_file}")
-                
-            self.update_status(f"Source file: {source_file}", "info")
-            
-            # Create output directory
-            os.makedirs(self.output_dir, exist_ok=True)
-            
-            # Run PyInstaller
-            self.update_status("Running PyInstaller...", "info")
-            self.run_pyinstaller(source_file, self.output_dir)
-            
-            self.update_status("Build completed successfully! 🎉", "success")
-            
+            # Keep the complete log on disk next to the executable
+            self.build_log.open_file(target.log_path)
+            # Watch mode stays in this process, since it waits on the local file system
+            daemon = DaemonClient.find() if self.use_daemon and not self.watch else None
+            engine = BuildEngine(status_callback=self.update_status, python_exe=self.python_exe,
+                                 cancel_token=self.cancel_token)
+            if daemon is not None:
+                self.update_status(f"Submitting the build to the build daemon at {daemon.url}", "info")
+                result = daemon.build(target, self.update_status, self.cancel_token, python_exe=self.python_exe)
+            elif self.watch:
+                # Runs until Cancel is pressed
+                result = engine.watch(target)[-1]
+            else:
+                result = engine.build(target)
+            if self.build_log.log_path:
+                self.update_status(f"Full build log: {self.build_log.log_path}", "success" if result.success else "info")
         except Exception as e:
             self.update_status(f"Build failed: {str(e)}", "error")
         finally:
+            self.build_log.close()
             # Re-enable build button and hide progress
+            self.cancel_token = None
             self.build_button.disabled = False
+            self.cancel_button.visible = False
             self.progress_bar.visible = False
             self.page.update()
-            
-    def parse_requirements_file(self, requirements_path):
-        """Parse a requirements.txt file and return a list of package names"""
-        packages = []
-        try:
-            with open(requirements_path, 'r', encoding='utf-8') as f:
-                for line in f:
-                    line = line.strip()
-                    # Skip empty lines and comments
-                    if not line or line.startswith('#'):
-                        continue
-                    # Skip -r or -f flags
-                    if line.startswith('-r') or line.startswith('-f') or line.startswith('--'):
-                        continue
-                    # Extract package name (remove version specifiers)
-                    package_name = re.split(r'[>=<!=~]', line)[0].strip()
-                    # Remove any extra characters
-                    package_name = re.sub(r'[\[\]\s].*$', '', package_name)
-                    if package_name:
-                        packages.append(package_name)
-        except Exception as e:
-            self.update_status(f"Warning: Could not parse {requirements_path}: {e}", "warning")
-        return packages
-            
-    def download_github_repo(self, github_url, dest_dir):
-        """Clone a GitHub repository using git"""
-        try:
-            repo_dir = os.path.join(dest_dir, "repo")
-            clone_github_repo(github_url, repo_dir)
-            return repo_dir
-        except Exception as e:
-            raise Exception(f"Error cloning GitHub repository: {str(e)}")
-            
-    def run_pyinstaller(self, source_file, output_dir, python_exe=None, custom_cmd=None):
-        """Run PyInstaller to create an executable"""
-        if python_exe is None:
-            python_exe = sys.executable
-            
-        # Check if PyInstaller is installed
-        try:
-            version_check = subprocess.run(
-                [python_exe, "-m", "PyInstaller", "--version"],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            self.update_status(f"Found PyInstaller version: {version_check.stdout.strip()}")
-        except (subprocess.SubprocessError, FileNotFoundError):
-            self.update_status("Installing PyInstaller...", "info")
-            try:
-                subprocess.run([python_exe, "-m", "pip", "install", "pyinstaller"], check=True)
-            except subprocess.CalledProcessError:
-                raise Exception("Failed to install PyInstaller")
-                
-        # Auto-detect and install dependencies from requirements.txt
-        project_dir = os.path.dirname(source_file)
-        requirements_files = []
-        
-        # Look for requirements files in the project directory
-        for req_file in ["requirements.txt", "requirements.pip", "reqs.txt"]:
-            req_path = os.path.join(project_dir, req_file)
-            if os.path.exists(req_path):
-                requirements_files.append(req_path)
-                
-        if requirements_files:
-            self.update_status(f"Found requirements files: {', '.join([os.path.basename(f) for f in requirements_files])}", "info")
-            
-            # Parse and install requirements
-            all_packages = set()
-            for req_file in requirements_files:
-                packages = self.parse_requirements_file(req_file)
-                all_packages.update(packages)
-                
-            if all_packages:
-                self.update_status(f"Installing {len(all_packages)} dependencies...", "info")
-                try:
-                    # Install all requirements
-                    for req_file in requirements_files:
-                        subprocess.run([python_exe, "-m", "pip", "install", "-r", req_file], 
-                                     check=True, capture_output=True, text=True)
-                    self.update_status("Dependencies installed successfully", "success")
-                except subprocess.CalledProcessError as e:
-                    self.update_status(f"Warning: Some dependencies may not have installed: {e}", "warning")
-        else:
-            self.update_status("No requirements.txt file found in project directory", "info")
-                
-        # Prepare PyInstaller command
-        cmd = [
-            python_exe, "-m", "PyInstaller",
-            "--distpath", output_dir,
-            "--workpath", os.path.join(output_dir, "build"),
-            "--specpath", output_dir
-        ]
-        
-        # Add onefile/onedir option
-        if self.onefile:
-            cmd.append("--onefile")
-        else:
-            cmd.append("--onedir")
-            
-        # Add console/no-console option
-        if not self.console:
-            cmd.append("--windowed")
-            
-        # Add hidden imports for required modules
-        cmd.extend(["--hidden-import", "dotenv"])
-        
-        # Add dependencies from requirements.txt as hidden imports
-        if requirements_files:
-            all_packages = set()
-            for req_file in requirements_files:
-                packages = self.parse_requirements_file(req_file)
-                all_packages.update(packages)
-            
-            for package in all_packages:
-                cmd.extend(["--hidden-import", package])
-                self.update_status(f"Adding hidden import: {package}")
-                
-            # Also try to collect data files for common packages that need them
-            data_packages = ['pygame', 'tkinter', 'PIL', 'numpy', 'scipy', 'matplotlib']
-            for package in all_packages:
-                if package.lower() in [p.lower() for p in data_packages]:
-                    cmd.extend(["--collect-all", package])
-                    self.update_status(f"Collecting all files for: {package}")
-        
-        # Add environment variables if defined
-        if self.env_vars:
-            env_vars_str = "{" + ", ".join([f"'{k}': '{v}'" for k, v in self.env_vars]) + "}"
-            cmd.extend(["--add-data", f"env_vars.py:."])
-            
-            # Create temporary env_vars.py file
-            env_vars_dir = os.path.dirname(source_file)
-            env_vars_path = os.path.join(env_vars_dir, "env_vars.py")
-            
-            with open(env_vars_path, "w") as f:
-                f.write(f"# Environment variables for Lightning EXE\n")
-                f.write(f"import os\n\n")
-                f.write(f"_env_vars = {env_vars_str}\n\n")
-                f.write(f"def init_env_vars():\n")
-                f.write(f"    for key, value in _env_vars.items():\n")
-                f.write(f"        os.environ[key] = value\n\n")
-                f.write(f"init_env_vars()\n")
-                
-        # Add extra packages
-        if self.extra_packages:
-            packages = [pkg.strip() for pkg in self.extra_packages.split(",") if pkg.strip()]
-            for pkg in packages:
-                cmd.extend(["--hidden-import", pkg])
-                
-        # Add command line arguments
-        if self.cmd_args:
-            # Parse and add command line arguments using cmd_args_helper
-            try:
-                args = cmd_args_helper.parse_args(self.cmd_args)
-                cmd.extend(args)
-            except Exception as e:
-                self.update_status(f"Warning: Could not parse command line arguments: {e}", "warning")
-                
-        # Add the source file
-        cmd.append(source_file)
-        
-        # Run PyInstaller
-        self.update_status(f"Running command: {' '.join(cmd)}", "info")
-        
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            universal_newlines=True
-        )
-        
-        # Stream output
-        while True:
-            output = process.stdout.readline()
-            if output == '' and process.poll() is not None:
-                break
-            if output:
-                self.update_status(output.strip())
-                
-        rc = process.poll()
-        if rc != 0:
-            raise Exception(f"PyInstaller failed with return code {rc}")
+
+    def create_build_target(self):
+        """Describe the current form state as a BuildTarget for the engine"""
+        return BuildTarget(
+            source_path=self.source_path,
+            output_dir=self.output_dir,
+            input_type=self.input_type,
+            main_file=self.main_file,
+            entry_points=self.entry_points,
+            onefile=self.onefile,
+            console=self.console,
+            env_vars=self.env_vars,
+            cmd_args=self.cmd_args,
+            extra_packages=self.extra_packages,
+            isolated_env=self.isolated_env,
+            drop_unused_requirements=self.drop_unused_requirements,
+            ref=self.ref or None,
+            fetch_mode="archive" if self.use_archive else "git",
+            benchmark_runs=5 if self.benchmark else 0,
+            fast_start=self.fast_start and self.onefile,
+            bytecode_profile="release" if self.release_bytecode else "default",
+            compression=self.compression,
+        )
 
 
 def main(page: ft.Page):
@@ -0,0 +1,213 @@
+"""
+Archive snapshots as an alternative to git for repository sources.
+
+Most builds only need the files of one ref, not the repository history.
+This downloads a tarball and extracts it while it streams in, so the
+archive is never held in memory, and checks its integrity before the
+extracted tree is handed to the build.
+"""
+import gzip
+import hashlib
+import os
+import re
+import shutil
+import tarfile
+import tempfile
+import zipfile
+
+import requests
+
+CHUNK_SIZE = 64 * 1024
+
+_GITHUB_URL = re.compile(r"^(?:https?://|git@)(?:www\.)?github\.com[/:]([^/]+)/([^/]+?)(?:\.git)?/?$")
+
+
+def archive_url_for(source_url, ref=None):
+    """
+    Return the archive URL for a repository URL.
+
+    GitHub repository URLs are turned into codeload tarball URLs; URLs that
+    already point at a .tar.gz, .tgz or .zip file are returned unchanged.
+
+    Raises:
+        Exception: If no archive URL can be derived
+    """
+    if source_url.lower().endswith((".tar.gz", ".tgz", ".zip")):
+        return source_url
+    match = _GITHUB_URL.match(source_url)
+    if not match:
+        raise Exception(f"Can't download an archive for {source_url}: not a GitHub repository or archive URL")
+    owner, repo = match.groups()
+    return f"https://codeload.github.com/{owner}/{repo}/tar.gz/{ref or 'HEAD'}"
+
+
+class _HashingReader:
+    """File-like view of a streamed HTTP body that hashes everything it reads"""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._buffer = b""
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self.sha256.update(chunk)
+            self.size += len(chunk)
+            self._buffer += chunk
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def drain(self):
+        """Consume (and hash) whatever hasn't been read yet"""
+        while self.read(CHUNK_SIZE):
+            pass
+
+
+def _safe_member_path(name):
+    """Return the relative path to extract an archive member to, or None to skip it"""
+    parts = [p for p in name.replace("\\", "/").split("/") if p and p != "."]
+    if ".." in parts or name.startswith(("/", "\\")) or re.match(r"^[A-Za-z]:", name):
+        raise Exception(f"Refusing to extract unsafe path from archive: {name}")
+    return os.path.join(*parts) if parts else None
+
+
+def _archive_root(tree_dir):
+    """
+    The folder holding the project inside an extracted archive.
+
+    GitHub and most release archives wrap everything in one top-level folder
+    (``repo-<ref>/``); that folder is the root then. Archives with files or
+    several folders at the top level are used as they are.
+    """
+    entries = os.listdir(tree_dir)
+    if len(entries) == 1 and os.path.isdir(os.path.join(tree_dir, entries[0])):
+        return os.path.join(tree_dir, entries[0])
+    return tree_dir
+
+
+def _extract_tar_stream(fileobj, dest_dir):
+    """Extract a plain tar stream with its paths as they are"""
+    count = 0
+    with tarfile.open(fileobj=fileobj, mode="r|") as tar:
+        for member in tar:
+            if member.issym() or member.islnk() or member.isdev():
+                # Links could point outside the tree; GitHub archives rarely need them
+                continue
+            relative = _safe_member_path(member.name)
+            if relative is None:
+                continue
+            target = os.path.join(dest_dir, relative)
+            if member.isdir():
+                os.makedirs(target, exist_ok=True)
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            source = tar.extractfile(member)
+            with open(target, "wb") as out:
+                shutil.copyfileobj(source, out, CHUNK_SIZE)
+            if member.mode & 0o111:
+                os.chmod(target, 0o755)
+            count += 1
+    return count
+
+
+def _extract_zip(zip_path, dest_dir):
+    """Extract a zip file with its paths as they are, checking CRCs"""
+    count = 0
+    with zipfile.ZipFile(zip_path) as archive:
+        for info in archive.infolist():
+            relative = _safe_member_path(info.filename)
+            if relative is None or info.is_dir():
+                continue
+            target = os.path.join(dest_dir, relative)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            # ZipExtFile raises BadZipFile on a CRC mismatch
+            with archive.open(info) as source, open(target, "wb") as out:
+                shutil.copyfileobj(source, out, CHUNK_SIZE)
+            count += 1
+    return count
+
+
+class ArchiveDownload:
+    """Details of a downloaded and extracted archive"""
+
+    def __init__(self, url, sha256, size, files):
+        self.url = url
+        self.sha256 = sha256
+        self.size = size
+        self.files = files
+
+
+def download_archive(url, dest_dir, expected_sha256=None, timeout=60):
+    """
+    Download an archive and extract it into ``dest_dir``.
+
+    Tarballs are decompressed and extracted while they download. Zip files
+    need random access, so they are spooled to a temporary file first.
+    ``dest_dir`` only appears once the whole archive was received and
+    verified: the byte count must match Content-Length, the gzip/zip
+    checksums must be valid and, if given, the sha256 must match. When every
+    member is inside one top-level folder, as in GitHub archives, that
+    folder's contents become ``dest_dir``.
+
+    Args:
+        url (str): Archive URL
+        dest_dir (str): Directory to create with the archive's contents
+        expected_sha256 (str): Hex digest the archive must have
+        timeout (float): Connect/read timeout in seconds
+
+    Returns:
+        ArchiveDownload: URL, digest, size and number of extracted files
+
+    Raises:
+        Exception: If the download fails or the archive doesn't verify
+    """
+    partial_dir = dest_dir + ".partial"
+    shutil.rmtree(partial_dir, ignore_errors=True)
+    tree_dir = os.path.join(partial_dir, "tree")
+    os.makedirs(tree_dir)
+
+    try:
+        with requests.get(url, stream=True, timeout=timeout) as response:
+            response.raise_for_status()
+            reader = _HashingReader(response.iter_content(CHUNK_SIZE))
+
+            if url.lower().split("?")[0].endswith(".zip"):
+                with tempfile.TemporaryFile() as spool:
+                    shutil.copyfileobj(reader, spool, CHUNK_SIZE)
+                    spool.seek(0)
+                    files = _extract_zip(spool, tree_dir)
+            else:
+                # GzipFile checks the CRC and length trailer once it reaches the end
+                with gzip.GzipFile(fileobj=reader, mode="rb") as gz:
+                    files = _extract_tar_stream(gz, tree_dir)
+                    while gz.read(CHUNK_SIZE):
+                        pass
+                reader.drain()
+
+            expected_size = response.headers.get("Content-Length")
+            if expected_size is not None and response.headers.get("Content-Encoding") is None:
+                if int(expected_size) != reader.size:
+                    raise Exception(f"Archive truncated: received {reader.size} of {expected_size} bytes")
+
+        digest = reader.sha256.hexdigest()
+        if expected_sha256 and digest.lower() != expected_sha256.lower():
+            raise Exception(f"Archive checksum mismatch: expected {expected_sha256}, got {digest}")
+        if files == 0:
+            raise Exception(f"Archive from {url} contains no files")
+
+        shutil.rmtree(dest_dir, ignore_errors=True)
+        os.replace(_archive_root(tree_dir), dest_dir)
+        shutil.rmtree(partial_dir, ignore_errors=True)
+        return ArchiveDownload(url, digest, reader.size, files)
+    except (requests.RequestException, tarfile.TarError, zipfile.BadZipFile, OSError, EOFError) as e:
+        shutil.rmtree(partial_dir, ignore_errors=True)
+        raise Exception(f"Failed to download archive {url}: {e}")
+    except Exception:
+        shutil.rmtree(partial_dir, ignore_errors=True)
+        raise
@@ -0,0 +1,467 @@
+"""
+Shared, content-addressed artifact cache for Lightning EXE.
+
+Finished executables and one-folder builds are stored under the build's
+portable fingerprint (see build_fingerprint.portable_fingerprint), so any
+machine that builds the same project with the same options and
+dependencies can download the result instead of running PyInstaller.
+
+The cache has two parts, like most build caches:
+
+* blobs: file contents stored under their sha256, so the numpy or Qt
+  libraries shared by many builds are only stored once
+* actions: one small JSON manifest per fingerprint listing the files of
+  the artifact, their blobs and permissions
+
+A backend stores both. ``LocalBackend`` keeps them in a folder (the
+per-user cache, or a network share), and ``HttpBackend`` talks to any
+server that answers GET/HEAD/PUT on ``/cas/<sha256>`` and
+``/ac/<fingerprint>``. ``serve()`` is such a server, backed by a folder,
+for teams without one. The local cache is always consulted first, and a
+remote hit is copied into it.
+
+Manifests are checked before anything is written from them, so a shared
+cache can't place files outside the artifact. Requests to an HTTP cache
+carry the shared token from ``LIGHTNING_EXE_CACHE_TOKEN`` when it is set.
+"""
+import hashlib
+import hmac
+import http.server
+import json
+import os
+import re
+import shutil
+import stat
+import tempfile
+
+import requests
+
+import cache_prune
+from cache_utils import get_cache_dir, hash_file
+
+_DIGEST = re.compile(r"^[0-9a-f]{64}$")
+
+
+def _check_digest(value):
+    if not _DIGEST.match(value or ""):
+        raise ValueError(f"Not a sha256 digest: {value!r}")
+    return value
+
+
+def check_manifest(manifest):
+    """
+    Check that a manifest only describes files inside its artifact.
+
+    Raises:
+        ValueError: If it names paths outside the artifact, links pointing
+            out of it, setuid/setgid modes or malformed entries
+    """
+    if not isinstance(manifest, dict) or manifest.get("kind") not in ("file", "dir") \
+            or not isinstance(manifest.get("files"), list):
+        raise ValueError("Malformed artifact manifest")
+    if manifest["kind"] == "file" and [item.get("path") for item in manifest["files"]
+                                       if isinstance(item, dict)] != [""]:
+        raise ValueError("A single-file artifact must list exactly one file")
+    for item in manifest["files"]:
+        if not isinstance(item, dict) or not isinstance(item.get("path"), str):
+            raise ValueError("Malformed artifact manifest entry")
+        parts = item["path"].split("/")
+        if manifest["kind"] == "dir" and (any(p in ("", ".", "..") or "\\" in p or ":" in p for p in parts)):
+            raise ValueError(f"Artifact path escapes the artifact: {item['path']!r}")
+        if "link" in item:
+            target = item["link"]
+            if manifest["kind"] != "dir" or not isinstance(target, str) or os.path.isabs(target) or "\\" in target:
+                raise ValueError(f"Artifact link points outside the artifact: {item['path']!r}")
+            depth = len(parts) - 1
+            for part in target.split("/"):
+                depth += -1 if part == ".." else 0 if part in ("", ".") else 1
+                if depth < 0:
+                    raise ValueError(f"Artifact link points outside the artifact: {item['path']!r}")
+            continue
+        _check_digest(item.get("sha256"))
+        if not isinstance(item.get("mode"), int) or item["mode"] & ~0o777:
+            raise ValueError(f"Artifact file has an unsafe mode: {item['path']!r}")
+
+
+class LocalBackend:
+    """Blobs and actions in a folder"""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def describe(self):
+        return self.root
+
+    def _blob_path(self, digest):
+        return os.path.join(self.root, "cas", digest[:2], _check_digest(digest))
+
+    def _action_path(self, key):
+        return os.path.join(self.root, "ac", _check_digest(key) + ".json")
+
+    def has_blob(self, digest):
+        return os.path.exists(self._blob_path(digest))
+
+    def fetch_blob(self, digest, dest):
+        """Copy a blob to ``dest``; False if it isn't stored"""
+        try:
+            shutil.copyfile(self._blob_path(digest), dest)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def store_blob(self, digest, path):
+        blob_path = self._blob_path(digest)
+        if os.path.exists(blob_path):
+            os.utime(blob_path)  # so pruning doesn't take it before the action listing it is stored
+            return
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        tmp = f"{blob_path}.{os.getpid()}.tmp"
+        shutil.copyfile(path, tmp)
+        os.replace(tmp, blob_path)
+
+    def get_action(self, key):
+        try:
+            with open(self._action_path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def touch_action(self, key):
+        """Record that an action was used, for cache pruning"""
+        try:
+            os.utime(self._action_path(key))
+        except OSError:
+            pass
+
+    def put_action(self, key, manifest):
+        path = self._action_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.{os.getpid()}.tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(f"{path}.{os.getpid()}.tmp", path)
+
+
+class HttpBackend:
+    """Blobs and actions on an HTTP server (``serve()`` or any compatible store)"""
+
+    def __init__(self, url, timeout=60, token=None):
+        """
+        Args:
+            url (str): Base URL of the cache
+            timeout (float): Seconds to wait for the server
+            token (str): Shared token of the server; defaults to ``LIGHTNING_EXE_CACHE_TOKEN``
+        """
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        token = token or os.environ.get("LIGHTNING_EXE_CACHE_TOKEN")
+        if token:
+            self.session.headers["Authorization"] = f"Bearer {token}"
+
+    def describe(self):
+        return self.url
+
+    def has_blob(self, digest):
+        response = self.session.head(f"{self.url}/cas/{_check_digest(digest)}", timeout=self.timeout)
+        return response.status_code == 200
+
+    def fetch_blob(self, digest, dest):
+        with self.session.get(f"{self.url}/cas/{_check_digest(digest)}", stream=True, timeout=self.timeout) as response:
+            if response.status_code == 404:
+                return False
+            response.raise_for_status()
+            sha256 = hashlib.sha256()
+            with open(dest, "wb") as f:
+                for chunk in response.iter_content(chunk_size=1024 * 1024):
+                    sha256.update(chunk)
+                    f.write(chunk)
+        if sha256.hexdigest() != digest:
+            raise Exception(f"Blob {digest[:16]}... from {self.url} is corrupt")
+        return True
+
+    def store_blob(self, digest, path):
+        if self.has_blob(digest):
+            return
+        with open(path, "rb") as f:
+            response = self.session.put(f"{self.url}/cas/{_check_digest(digest)}", data=f, timeout=self.timeout)
+        response.raise_for_status()
+
+    def get_action(self, key):
+        response = self.session.get(f"{self.url}/ac/{_check_digest(key)}", timeout=self.timeout)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    def put_action(self, key, manifest):
+        response = self.session.put(f"{self.url}/ac/{_check_digest(key)}", data=json.dumps(manifest).encode("utf-8"),
+                                    headers={"Content-Type": "application/json"}, timeout=self.timeout)
+        response.raise_for_status()
+
+
+def backend_for(location):
+    """HttpBackend for an http(s) URL, LocalBackend for a folder"""
+    if location.startswith(("http://", "https://")):
+        return HttpBackend(location)
+    return LocalBackend(location)
+
+
+def describe_artifact(artifact):
+    """
+    List the files of an executable or one-folder build.
+
+    Returns:
+        tuple: (manifest dict, {sha256: path of a file with that content})
+    """
+    blobs = {}
+
+    def entry(path, relative):
+        if os.path.islink(path):
+            return {"path": relative, "link": os.readlink(path)}
+        digest = hash_file(path)
+        blobs.setdefault(digest, path)
+        return {"path": relative, "sha256": digest, "size": os.path.getsize(path),
+                "mode": stat.S_IMODE(os.stat(path).st_mode) & 0o777}
+
+    if os.path.isfile(artifact):
+        return {"kind": "file", "files": [entry(artifact, "")]}, blobs
+
+    files = []
+    for root, dirs, names in os.walk(artifact):
+        dirs.sort()
+        for name in sorted(dirs + names):
+            path = os.path.join(root, name)
+            if os.path.isdir(path) and not os.path.islink(path):
+                continue
+            files.append(entry(path, os.path.relpath(path, artifact).replace(os.sep, "/")))
+    return {"kind": "dir", "files": files}, blobs
+
+
+class ArtifactCache:
+    """The local cache, optionally backed by a shared remote one"""
+
+    def __init__(self, remote=None):
+        """
+        Args:
+            remote (str): URL or folder of the shared cache; defaults to
+                ``LIGHTNING_EXE_REMOTE_CACHE``, and none when that is unset too
+        """
+        self.local = LocalBackend(get_cache_dir("artifacts"))
+        remote = remote or os.environ.get("LIGHTNING_EXE_REMOTE_CACHE")
+        self.remote = backend_for(remote) if remote else None
+
+    def _fetch(self, manifest):
+        """Make sure every blob of a manifest is in the local cache"""
+        for item in manifest["files"]:
+            digest = item.get("sha256")
+            if digest is None or self.local.has_blob(digest):
+                continue
+            fd, tmp = tempfile.mkstemp(dir=get_cache_dir("artifacts", "tmp"))
+            os.close(fd)
+            try:
+                if not self.remote.fetch_blob(digest, tmp):
+                    return False
+                self.local.store_blob(digest, tmp)
+            finally:
+                os.remove(tmp)
+        return True
+
+    def restore(self, key, artifact):
+        """
+        Recreate the artifact built from a fingerprint.
+
+        Args:
+            key (str): portable_fingerprint() of the build
+            artifact (str): Where the executable or one-folder build belongs
+
+        Returns:
+            str: The cache it came from, or None on a miss
+        """
+        source = self.local
+        manifest = self.local.get_action(key)
+        if manifest is None and self.remote is not None:
+            manifest = self.remote.get_action(key)
+            if manifest is not None:
+                check_manifest(manifest)
+            if manifest is None or not self._fetch(manifest):
+                return None
+            self.local.put_action(key, manifest)
+            source = self.remote
+        if manifest is None:
+            return None
+        check_manifest(manifest)
+        if source is self.local:
+            self.local.touch_action(key)
+
+        staging = artifact + ".restoring"
+        _remove(staging)
+        try:
+            for item in manifest["files"]:
+                path = staging if manifest["kind"] == "file" else os.path.join(staging, *item["path"].split("/"))
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                if "link" in item:
+                    os.symlink(item["link"], path)
+                    continue
+                if not self.local.fetch_blob(item["sha256"], path):
+                    # Blob evicted or deleted by hand: treat as a miss
+                    _remove(staging)
+                    return None
+                os.chmod(path, item["mode"])
+            _remove(artifact)
+            os.replace(staging, artifact)
+        except BaseException:
+            _remove(staging)
+            raise
+        return source.describe()
+
+    def store(self, key, artifact):
+        """
+        Add a freshly built artifact to the local cache and the remote one.
+
+        The local cache is then pruned to cache_prune.artifact_cache_limit(),
+        dropping the least recently used builds.
+
+        Returns:
+            int: Bytes of file contents stored
+        """
+        manifest, blobs = describe_artifact(artifact)
+        for backend in filter(None, [self.local, self.remote]):
+            for digest, path in blobs.items():
+                backend.store_blob(digest, path)
+            # The action goes last, so nobody sees an artifact whose blobs are still uploading
+            backend.put_action(key, manifest)
+        cache_prune.prune("artifacts", max_bytes=cache_prune.artifact_cache_limit(), root=self.local.root)
+        return sum(os.path.getsize(path) for path in blobs.values())
+
+
+def _remove(path):
+    if os.path.islink(path) or os.path.isfile(path):
+        os.remove(path)
+    elif os.path.isdir(path):
+        shutil.rmtree(path)
+
+
+class _CacheRequestHandler(http.server.BaseHTTPRequestHandler):
+    # Set by serve()
+    backend = None  # LocalBackend
+    token = None  # shared token every request must carry, if any
+    read_only = False
+    max_bytes = None  # size to prune the folder to after every stored action
+
+    def _authorized(self):
+        if self.token is None:
+            return True
+        header = self.headers.get("Authorization", "")
+        if hmac.compare_digest(header.encode("utf-8"), f"Bearer {self.token}".encode("utf-8")):
+            return True
+        self.send_error(401, "Missing or wrong cache token")
+        return False
+
+    def _target(self):
+        match = re.match(r"^/(cas|ac)/([0-9a-f]{64})$", self.path)
+        if not match:
+            self.send_error(404)
+            return None, None
+        kind, digest = match.groups()
+        path = self.backend._blob_path(digest) if kind == "cas" else self.backend._action_path(digest)
+        return kind, path
+
+    def _send_file(self, include_body):
+        kind, path = self._target()
+        if path is None:
+            return
+        if not os.path.exists(path):
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream" if kind == "cas" else "application/json")
+        self.send_header("Content-Length", str(os.path.getsize(path)))
+        self.end_headers()
+        if include_body:
+            with open(path, "rb") as f:
+                shutil.copyfileobj(f, self.wfile)
+
+    def do_GET(self):
+        if self._authorized():
+            self._send_file(True)
+
+    def do_HEAD(self):
+        if self._authorized():
+            self._send_file(False)
+
+    def do_PUT(self):
+        if not self._authorized():
+            return
+        if self.read_only:
+            self.send_error(403, "This cache is read-only")
+            return
+        kind, path = self._target()
+        if path is None:
+            return
+        remaining = int(self.headers.get("Content-Length", 0))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{id(self)}.tmp"
+        sha256 = hashlib.sha256()
+        with open(tmp, "wb") as f:
+            while remaining:
+                chunk = self.rfile.read(min(remaining, 1024 * 1024))
+                if not chunk:
+                    break
+                sha256.update(chunk)
+                f.write(chunk)
+                remaining -= len(chunk)
+        if remaining or (kind == "cas" and sha256.hexdigest() != os.path.basename(path)):
+            os.remove(tmp)
+            self.send_error(400, "Body doesn't match its digest")
+            return
+        if kind == "ac":
+            try:
+                with open(tmp, "r", encoding="utf-8") as f:
+                    check_manifest(json.load(f))
+            except ValueError as e:
+                os.remove(tmp)
+                self.send_error(400, f"Invalid manifest: {e}")
+                return
+        os.replace(tmp, path)
+        self.send_response(201)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+        if kind == "ac" and self.max_bytes is not None:
+            cache_prune.prune("artifacts", max_bytes=self.max_bytes, root=self.backend.root)
+
+    def log_message(self, format, *args):
+        print(f"{self.address_string()} {format % args}", flush=True)
+
+
+def serve(root, host="127.0.0.1", port=8765, token=None, read_only=False, max_bytes=None):
+    """
+    Serve a folder as an HTTP artifact cache until interrupted.
+
+    Anyone who can store builds in a shared cache decides what other machines
+    run, so a cache reachable from the network needs a shared token or must be
+    read-only.
+
+    Args:
+        root (str): Folder holding the blobs and actions
+        host (str): Address to listen on; use 0.0.0.0 to share it on the network
+        port (int): Port to listen on
+        token (str): Shared token clients send as ``Authorization: Bearer <token>``
+        read_only (bool): Refuse uploads; the folder is filled some other way
+        max_bytes (int): Prune the least recently used builds beyond this size
+
+    Raises:
+        Exception: If a non-loopback address would accept uploads from anyone
+    """
+    if host not in ("127.0.0.1", "localhost", "::1") and not token and not read_only:
+        raise Exception(f"Serving on {host} lets anyone on the network store builds: "
+                        f"set a shared token or serve read-only")
+    handler = type("CacheRequestHandler", (_CacheRequestHandler,), {
+        "backend": LocalBackend(root), "token": token or None, "read_only": read_only, "max_bytes": max_bytes})
+    server = http.server.ThreadingHTTPServer((host, port), handler)
+    mode = "read-only" if read_only else "read-write"
+    print(f"Serving the artifact cache in {os.path.abspath(root)} on http://{host}:{server.server_port} "
+          f"({mode}{', token required' if token else ''})", flush=True)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
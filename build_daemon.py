@@ -0,0 +1,398 @@
+"""
+Build daemon for Lightning EXE.
+
+Every build pays a fixed toll before PyInstaller does any real work:
+starting Lightning EXE itself, then starting the build interpreter and
+importing PyInstaller for the version check, the environment probes, the
+spec and the build. For a small project that is most of the build.
+
+The daemon is a long-lived process that takes build jobs over a local
+HTTP/JSON API and runs them with the build engine. It keeps a warm
+interpreter per build interpreter (see warm_interpreter), so those
+commands are forked with PyInstaller already imported, and its own
+imports and caches stay loaded between builds. ``lightning-exe build
+--daemon`` and the GUI submit their builds to it when it is running.
+
+The API listens on 127.0.0.1 only. Every request needs the token the
+daemon writes to ``daemon.json`` in the Lightning EXE cache, which only
+the user running it can read, so neither other users nor web pages can
+submit builds.
+
+    POST /builds                  {"target": {...}} -> {"id": ...}
+    GET  /builds/<id>?since=N     status, log lines from N on, result
+    POST /builds/<id>/cancel
+    GET  /status
+    POST /shutdown
+"""
+import collections
+import concurrent.futures
+import http.server
+import json
+import os
+import re
+import secrets
+import threading
+import time
+import urllib.parse
+
+import requests
+
+import process_runner
+from build_engine import BuildEngine, BuildResult, BuildTarget
+from cache_utils import get_cache_dir
+from warm_interpreter import WarmPool
+
+MAX_FINISHED_JOBS = 50  # finished jobs kept around for clients that reconnect
+
+
+def info_path():
+    """Where a running daemon records its address and token"""
+    return os.path.join(get_cache_dir("daemon"), "daemon.json")
+
+
+class BuildJob:
+    """One submitted build and everything it reported"""
+
+    def __init__(self, job_id, target, python_exe=None, remote_cache=None):
+        self.id = job_id
+        self.target = target
+        self.python_exe = python_exe
+        self.remote_cache = remote_cache
+        self.status = "queued"  # then running, and succeeded, failed or cancelled
+        self.lines = []
+        self.result = None
+        self.cancel_token = process_runner.CancelToken()
+        self.submitted = time.time()
+        self._changed = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.status in ("succeeded", "failed", "cancelled")
+
+    def log(self, message, status_type="info"):
+        with self._changed:
+            self.lines.append([message, status_type])
+            self._changed.notify_all()
+
+    def finish(self, status, result=None):
+        with self._changed:
+            self.status = status
+            self.result = result
+            self._changed.notify_all()
+
+    def snapshot(self, since=0, wait=0.0):
+        """
+        The job's state, waiting up to ``wait`` seconds for lines after ``since`` or the end of the job.
+
+        Returns:
+            dict: JSON-ready state; ``next`` is the ``since`` for the following call
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: len(self.lines) > since or self.finished, timeout=wait)
+            state = {
+                "id": self.id,
+                "name": self.target.display_name,
+                "status": self.status,
+                "lines": self.lines[since:],
+                "next": len(self.lines),
+                "result": None,
+            }
+            if self.result is not None:
+                state["result"] = {"success": self.result.success, "artifact": self.result.artifact,
+                                   "error": self.result.error, "duration": self.result.duration}
+            return state
+
+
+class BuildDaemon:
+    """Runs submitted jobs with a bounded pool of build threads"""
+
+    def __init__(self, max_workers=1, python_exe=None):
+        """
+        Args:
+            max_workers (int): Number of jobs built at the same time
+            python_exe (str): Default interpreter for pip and PyInstaller
+        """
+        self.max_workers = max_workers
+        self.python_exe = python_exe
+        self.started = time.time()
+        self.jobs = collections.OrderedDict()
+        self.warm_pool = WarmPool()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                               thread_name_prefix="build")
+        self._lock = threading.Lock()
+        process_runner.use_warm_pool(self.warm_pool)
+
+    def submit(self, target, python_exe=None, remote_cache=None):
+        """
+        Queue a build.
+
+        Args:
+            target (BuildTarget): What to build; paths must be absolute
+            python_exe (str): Interpreter for this build (default: the daemon's)
+            remote_cache (str): Shared artifact cache for this build
+
+        Returns:
+            BuildJob: The queued job
+        """
+        error = target.validate()
+        if error:
+            raise ValueError(error)
+        with self._lock:
+            job = BuildJob(secrets.token_hex(8), target, python_exe or self.python_exe, remote_cache)
+            self.jobs[job.id] = job
+            finished = [j for j in self.jobs.values() if j.finished]
+            for old in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+                del self.jobs[old.id]
+        self._executor.submit(self.run_job, job)
+        return job
+
+    def run_job(self, job):
+        if job.cancel_token.cancelled:
+            job.finish("cancelled", BuildResult(job.target, False, error="Build cancelled"))
+            return
+        job.status = "running"
+        job.log(f"Building {job.target.display_name} in the build daemon (pid {os.getpid()})", "info")
+        try:
+            engine = BuildEngine(status_callback=job.log, python_exe=job.python_exe,
+                                 cancel_token=job.cancel_token, remote_cache=job.remote_cache)
+            result = engine.build(job.target)
+        except Exception as e:
+            result = BuildResult(job.target, False, error=str(e))
+        if result.success:
+            job.finish("succeeded", result)
+        else:
+            job.finish("cancelled" if job.cancel_token.cancelled else "failed", result)
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def status(self):
+        """What the daemon is doing, as a JSON-ready dict"""
+        with self._lock:
+            jobs = list(self.jobs.values())
+        return {
+            "pid": os.getpid(),
+            "uptime": time.time() - self.started,
+            "workers": self.max_workers,
+            "warm_interpreters": self.warm_pool.describe(),
+            "jobs": [{"id": j.id, "name": j.target.display_name, "status": j.status} for j in jobs],
+        }
+
+    def close(self):
+        """Cancel every job and stop the warm interpreters"""
+        with self._lock:
+            jobs = list(self.jobs.values())
+        for job in jobs:
+            job.cancel_token.cancel()
+        self._executor.shutdown(wait=True)
+        process_runner.use_warm_pool(None)
+        self.warm_pool.close()
+
+
+class _DaemonRequestHandler(http.server.BaseHTTPRequestHandler):
+    daemon = None  # BuildDaemon, set by serve()
+    token = None
+    server_version = "LightningEXE"
+
+    def _authorized(self):
+        if secrets.compare_digest(self.headers.get("Authorization", ""), f"Bearer {self.token}"):
+            return True
+        self._send_json({"error": "Missing or wrong token"}, 401)
+        return False
+
+    def _send_json(self, data, code=200):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _job(self, job_id):
+        job = self.daemon.get(job_id)
+        if job is None:
+            self._send_json({"error": f"No build {job_id}"}, 404)
+        return job
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        url = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qs(url.query)
+        if url.path == "/status":
+            self._send_json(self.daemon.status())
+            return
+        match = re.match(r"^/builds/([0-9a-f]+)$", url.path)
+        if not match:
+            self._send_json({"error": "Not found"}, 404)
+            return
+        job = self._job(match.group(1))
+        if job is not None:
+            since = int(query.get("since", ["0"])[0])
+            wait = min(float(query.get("wait", ["0"])[0]), 30.0)
+            self._send_json(job.snapshot(since, wait))
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        if self.path == "/builds":
+            try:
+                data = self._read_json()
+                target = BuildTarget.from_dict(data["target"])
+                job = self.daemon.submit(target, data.get("python_exe"), data.get("remote_cache"))
+            except Exception as e:
+                self._send_json({"error": str(e)}, 400)
+                return
+            self._send_json({"id": job.id}, 201)
+            return
+        if self.path == "/shutdown":
+            self._send_json({"stopping": True})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return
+        match = re.match(r"^/builds/([0-9a-f]+)/cancel$", self.path)
+        if not match:
+            self._send_json({"error": "Not found"}, 404)
+            return
+        job = self._job(match.group(1))
+        if job is not None:
+            job.cancel_token.cancel()
+            self._send_json({"id": job.id, "status": job.status})
+
+    def log_message(self, format, *args):
+        pass  # clients poll several times a second
+
+
+def serve(port=0, max_workers=1, python_exe=None):
+    """
+    Run the build daemon until interrupted or told to shut down.
+
+    Args:
+        port (int): Port on 127.0.0.1 to listen on (0 picks a free one)
+        max_workers (int): Number of jobs built at the same time
+        python_exe (str): Default interpreter for pip and PyInstaller
+    """
+    daemon = BuildDaemon(max_workers, python_exe)
+    handler = type("DaemonRequestHandler", (_DaemonRequestHandler,),
+                   {"daemon": daemon, "token": secrets.token_urlsafe(32)})
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    url = f"http://127.0.0.1:{server.server_port}"
+
+    path = info_path()
+    fd = os.open(f"{path}.{os.getpid()}.tmp", os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump({"url": url, "token": handler.token, "pid": os.getpid()}, f)
+    os.replace(f"{path}.{os.getpid()}.tmp", path)
+
+    print(f"Build daemon listening on {url} with {max_workers} worker(s) (pid {os.getpid()})", flush=True)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                if json.load(f).get("pid") == os.getpid():
+                    os.remove(path)
+        except (OSError, ValueError):
+            pass
+        daemon.close()
+        print("Build daemon stopped", flush=True)
+
+
+class DaemonClient:
+    """Submits builds to a running daemon and follows them"""
+
+    def __init__(self, url, token, timeout=10):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {token}"
+        self.session.trust_env = False  # never send the token through a proxy
+
+    @classmethod
+    def find(cls):
+        """
+        Connect to the daemon this user is running.
+
+        Returns:
+            DaemonClient: A client, or None when no daemon answers
+        """
+        try:
+            with open(info_path(), "r", encoding="utf-8") as f:
+                info = json.load(f)
+            client = cls(info["url"], info["token"], timeout=2)
+            client.status()
+        except (OSError, ValueError, KeyError, requests.RequestException):
+            return None
+        client.timeout = 10
+        return client
+
+    def _call(self, method, path, **kwargs):
+        response = self.session.request(method, self.url + path, timeout=kwargs.pop("timeout", self.timeout), **kwargs)
+        if response.status_code >= 400:
+            try:
+                error = response.json()["error"]
+            except (ValueError, KeyError):
+                error = response.text
+            raise Exception(f"Build daemon: {error}")
+        return response.json()
+
+    def status(self):
+        return self._call("GET", "/status")
+
+    def shutdown(self):
+        return self._call("POST", "/shutdown")
+
+    def submit(self, target, python_exe=None, remote_cache=None):
+        """
+        Queue a build; relative paths are resolved against the current directory first.
+
+        Returns:
+            str: The job id
+        """
+        target = BuildTarget.from_dict(target.to_dict(), base_dir=os.getcwd())
+        return self._call("POST", "/builds", json={"target": target.to_dict(), "python_exe": python_exe,
+                                                   "remote_cache": remote_cache})["id"]
+
+    def cancel(self, job_id):
+        return self._call("POST", f"/builds/{job_id}/cancel")
+
+    def follow(self, job_id, target, status_callback=None, cancel_token=None):
+        """
+        Relay a job's status lines until it finishes.
+
+        Args:
+            job_id (str): From submit()
+            target (BuildTarget): The submitted target, for the result
+            status_callback: Called as ``status_callback(message, status_type)``
+            cancel_token (CancelToken): Cancels the job when cancelled
+
+        Returns:
+            BuildResult: The outcome (without a timeline)
+        """
+        report = status_callback or (lambda message, status_type="info": print(f"[{status_type}] {message}", flush=True))
+        since = 0
+        cancel_sent = False
+        while True:
+            if cancel_token is not None and cancel_token.cancelled and not cancel_sent:
+                self.cancel(job_id)
+                cancel_sent = True
+            state = self._call("GET", f"/builds/{job_id}", params={"since": since, "wait": 1},
+                               timeout=self.timeout + 1)
+            for message, status_type in state["lines"]:
+                report(message, status_type)
+            since = state["next"]
+            if state["result"] is not None:
+                result = state["result"]
+                return BuildResult(target, result["success"], artifact=result["artifact"], error=result["error"],
+                                   duration=result["duration"])
+
+    def build(self, target, status_callback=None, cancel_token=None, python_exe=None, remote_cache=None):
+        """Submit a build and follow it; see follow()"""
+        job_id = self.submit(target, python_exe, remote_cache)
+        return self.follow(job_id, target, status_callback, cancel_token)
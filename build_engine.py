@@ -0,0 +1,1153 @@
+"""
+Build engine for Lightning EXE.
+
+All of the build logic lives here so that executables can be produced
+without starting the Flet GUI (CLI, CI boxes, scripts). The GUI and the
+command line are both thin clients that describe what to build with a
+BuildTarget and hand it to a BuildEngine.
+"""
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from pull_repo import clone_github_repo, remove_checkout
+import cmd_args_helper
+from archive_source import archive_url_for, download_archive
+from artifact_cache import ArtifactCache
+from analysis_cache import distributions_command, fingerprint_distributions, get_analysis_cache_entry
+import build_fingerprint
+import bytecode_profile
+import compression
+import fast_start
+import multi_entry
+import process_runner
+import source_watcher
+import staging
+import startup_bench
+import toolchains
+import wheelhouse
+from build_timeline import BuildTimeline, PyInstallerPhaseParser
+from build_env import environment_key, get_build_environment, requirement_args
+from cache_utils import file_lock
+from collection_policy import plan_collection
+from import_scanner import (exclude_candidates_command, installed_exclude_candidates, plan_imports, scan_project,
+                            script_files)
+from requirements_resolver import find_requirements_files, included_requirements_files, resolve_dependencies
+
+INPUT_TYPES = ("file", "folder", "github")
+BYTECODE_PROFILES = tuple(bytecode_profile.PROFILES)
+COMPRESSION_STRATEGIES = tuple(compression.STRATEGIES)
+FETCH_MODES = ("git", "archive")
+
+# Option names accepted in manifests, matching the BuildTarget constructor
+TARGET_OPTIONS = (
+    "source_path", "output_dir", "input_type", "main_file", "name",
+    "onefile", "console", "env_vars", "cmd_args", "extra_packages",
+    "isolated_env", "ref", "fetch_mode", "archive_sha256",
+    "benchmark_runs", "profile_imports", "trace", "fast_start", "bytecode_profile",
+    "compression", "compare_compression", "force", "entry_points", "drop_unused_requirements",
+)
+
+
+class BuildTarget:
+    """Everything needed to build one executable"""
+
+    def __init__(self, source_path, output_dir, input_type="file", main_file="",
+                 name=None, onefile=True, console=True, env_vars=None,
+                 cmd_args="", extra_packages="", isolated_env=True, ref=None,
+                 fetch_mode="git", archive_sha256=None, benchmark_runs=0,
+                 profile_imports=False, trace=False, fast_start=False, bytecode_profile="default",
+                 compression="default", compare_compression=False, force=False, entry_points="",
+                 drop_unused_requirements=False):
+        self.source_path = source_path
+        self.output_dir = output_dir
+        self.input_type = input_type
+        self.main_file = main_file
+        self.name = name
+        self.onefile = onefile
+        self.console = console
+        self.env_vars = list(env_vars or [])  # (key, value) tuples
+        self.cmd_args = cmd_args
+        self.extra_packages = extra_packages
+        self.isolated_env = isolated_env  # build inside a cached virtualenv
+        self.ref = ref  # branch, tag or commit for GitHub sources
+        self.fetch_mode = fetch_mode  # "git" checkout or "archive" snapshot
+        self.archive_sha256 = archive_sha256  # expected digest of the snapshot
+        self.benchmark_runs = benchmark_runs  # warm startup runs after the build (0 = no benchmark)
+        self.profile_imports = profile_imports  # add an -X importtime breakdown to the benchmark
+        self.trace = trace  # save the build timeline as JSON and Chrome trace
+        self.fast_start = fast_start  # one-file launcher that keeps its extracted payload between runs
+        self.bytecode_profile = bytecode_profile  # "default", or "release" for optimized bytecode
+        self.compression = compression  # one of compression.STRATEGIES
+        self.compare_compression = compare_compression  # build and benchmark every strategy afterwards
+        self.force = force  # run PyInstaller even if nothing changed since the last build
+        self.entry_points = entry_points  # more scripts next to main_file, one executable each (comma-separated)
+        self.drop_unused_requirements = drop_unused_requirements  # leave out requirements the code never imports
+
+    @property
+    def display_name(self):
+        """Name used in status messages and reports"""
+        if self.name:
+            return self.name
+        entry = self.main_file or self.source_path
+        return os.path.splitext(os.path.basename(entry.rstrip("/\\")))[0]
+
+    @property
+    def log_path(self):
+        """Where the full build log for this target is written"""
+        return os.path.join(self.output_dir, f"{self.display_name}-build.log")
+
+    @property
+    def benchmark_path(self):
+        """Where the startup benchmark report for this target is written"""
+        return os.path.join(self.output_dir, f"{self.display_name}-startup.json")
+
+    @property
+    def timeline_path(self):
+        """Where the build timeline is written as JSON"""
+        return os.path.join(self.output_dir, f"{self.display_name}-timeline.json")
+
+    @property
+    def trace_path(self):
+        """Where the build timeline is written in Chrome trace format"""
+        return os.path.join(self.output_dir, f"{self.display_name}-trace.json")
+
+    @property
+    def bytecode_report_path(self):
+        """Where the comparison of a release build with the default profile is written"""
+        return os.path.join(self.output_dir, f"{self.display_name}-bytecode.json")
+
+    @property
+    def compression_report_path(self):
+        """Where the comparison of compression strategies is written"""
+        return os.path.join(self.output_dir, f"{self.display_name}-compression.json")
+
+    @property
+    def collection_report_path(self):
+        """Where the collection policy's per-package report is written"""
+        return os.path.join(self.output_dir, f"{self.display_name}-collection.json")
+
+    def validate(self):
+        """
+        Check the target for missing or invalid options.
+
+        Returns:
+            str: An error message, or None if the target looks buildable
+        """
+        if self.input_type not in INPUT_TYPES:
+            return f"Unknown input type '{self.input_type}' (expected one of {', '.join(INPUT_TYPES)})"
+        if not self.source_path:
+            return "Please select a source file, folder, or GitHub URL"
+        if self.fetch_mode not in FETCH_MODES:
+            return f"Unknown fetch mode '{self.fetch_mode}' (expected one of {', '.join(FETCH_MODES)})"
+        if self.input_type in ["folder", "github"] and not self.main_file:
+            return "Please specify the main Python file"
+        if not self.output_dir:
+            return "Please select an output directory"
+        if self.fast_start and not self.onefile:
+            return "Fast-start mode needs a single-file executable"
+        entry_points = multi_entry.split_entry_points(self.entry_points)
+        if entry_points:
+            if self.onefile:
+                return "Several entry points need a one-folder build, so their executables can share it"
+            error = multi_entry.check_entry_points(self.display_name, entry_points)
+            if error:
+                return error
+        if self.bytecode_profile not in BYTECODE_PROFILES:
+            return (f"Unknown bytecode profile '{self.bytecode_profile}' "
+                    f"(expected one of {', '.join(BYTECODE_PROFILES)})")
+        if self.compression not in COMPRESSION_STRATEGIES:
+            return (f"Unknown compression strategy '{self.compression}' "
+                    f"(expected one of {', '.join(COMPRESSION_STRATEGIES)})")
+        try:
+            cmd_args_helper.parse_args(self.cmd_args)
+        except ValueError as e:
+            return f"Could not parse the command line arguments: {e}"
+        return None
+
+    @classmethod
+    def from_dict(cls, data, base_dir=None):
+        """
+        Create a target from a manifest entry.
+
+        Args:
+            data (dict): Target options, using the same names as the constructor
+            base_dir (str): Directory that relative paths are resolved against
+
+        Returns:
+            BuildTarget: The new target
+        """
+        data = dict(data)
+        unknown = set(data) - set(TARGET_OPTIONS)
+        if unknown:
+            raise Exception(f"Unknown build target option(s): {', '.join(sorted(unknown))}")
+
+        env_vars = data.get("env_vars") or []
+        if isinstance(env_vars, dict):
+            env_vars = list(env_vars.items())
+        data["env_vars"] = [(str(k), str(v)) for k, v in env_vars]
+
+        if isinstance(data.get("extra_packages"), list):
+            data["extra_packages"] = ", ".join(data["extra_packages"])
+        if isinstance(data.get("entry_points"), list):
+            data["entry_points"] = ", ".join(data["entry_points"])
+        if isinstance(data.get("cmd_args"), list):
+            data["cmd_args"] = cmd_args_helper.format_args(data["cmd_args"])
+
+        if base_dir:
+            if data.get("input_type", "file") != "github" and data.get("source_path"):
+                data["source_path"] = os.path.join(base_dir, os.path.expanduser(data["source_path"]))
+            if data.get("output_dir"):
+                data["output_dir"] = os.path.join(base_dir, os.path.expanduser(data["output_dir"]))
+
+        return cls(**data)
+
+    def to_dict(self):
+        """Return the target options as a plain dictionary"""
+        return {
+            "source_path": self.source_path,
+            "output_dir": self.output_dir,
+            "input_type": self.input_type,
+            "main_file": self.main_file,
+            "name": self.name,
+            "onefile": self.onefile,
+            "console": self.console,
+            "env_vars": [list(pair) for pair in self.env_vars],
+            "cmd_args": self.cmd_args,
+            "extra_packages": self.extra_packages,
+            "isolated_env": self.isolated_env,
+            "ref": self.ref,
+            "fetch_mode": self.fetch_mode,
+            "archive_sha256": self.archive_sha256,
+            "benchmark_runs": self.benchmark_runs,
+            "profile_imports": self.profile_imports,
+            "trace": self.trace,
+            "fast_start": self.fast_start,
+            "bytecode_profile": self.bytecode_profile,
+            "compression": self.compression,
+            "compare_compression": self.compare_compression,
+            "force": self.force,
+            "entry_points": self.entry_points,
+            "drop_unused_requirements": self.drop_unused_requirements,
+        }
+
+
+class BuildResult:
+    """Outcome of building a single target"""
+
+    def __init__(self, target, success, artifact=None, error=None, duration=0.0, timeline=None):
+        self.target = target
+        self.success = success
+        self.artifact = artifact
+        self.error = error
+        self.duration = duration
+        self.timeline = timeline  # BuildTimeline with a span per build phase
+
+    def __repr__(self):
+        state = "ok" if self.success else f"failed: {self.error}"
+        return f"<BuildResult {self.target.display_name} {state} in {self.duration:.1f}s>"
+
+
+def load_manifest(manifest_path):
+    """
+    Load the build targets listed in a JSON or TOML manifest.
+
+    The manifest holds a ``targets`` list and an optional ``defaults`` table
+    whose values apply to every target that doesn't set them itself. Relative
+    paths are resolved against the manifest's directory.
+
+    Args:
+        manifest_path (str): Path to a .json or .toml manifest
+
+    Returns:
+        list: BuildTarget objects in manifest order
+
+    Raises:
+        Exception: If the manifest can't be read or is malformed
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+
+    if manifest_path.lower().endswith(".toml"):
+        try:
+            import tomllib
+        except ImportError:
+            try:
+                import tomli as tomllib
+            except ImportError:
+                raise Exception("Reading TOML manifests needs Python 3.11+ or the 'tomli' package")
+        with open(manifest_path, "rb") as f:
+            data = tomllib.load(f)
+    else:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+    if isinstance(data, list):
+        data = {"targets": data}
+    entries = data.get("targets")
+    if not entries:
+        raise Exception(f"No targets found in manifest: {manifest_path}")
+
+    defaults = data.get("defaults", {})
+    targets = []
+    for entry in entries:
+        merged = dict(defaults)
+        merged.update(entry)
+        targets.append(BuildTarget.from_dict(merged, base_dir=base_dir))
+    return targets
+
+
+class BuildEngine:
+    """Turns BuildTargets into executables with PyInstaller"""
+
+    def __init__(self, status_callback=None, python_exe=None, cancel_token=None, remote_cache=None):
+        """
+        Args:
+            status_callback: Called as ``status_callback(message, status_type)``
+                for every status line. Messages are printed when not given.
+            python_exe (str): Interpreter used to run pip and PyInstaller
+            cancel_token (CancelToken): Shared with whatever may cancel the
+                build; a new one is made when not given
+            remote_cache (str): URL or folder of a shared artifact cache
+                (default: ``LIGHTNING_EXE_REMOTE_CACHE``)
+        """
+        self.status_callback = status_callback
+        self.python_exe = python_exe or sys.executable
+        self.cancel_token = cancel_token or process_runner.CancelToken()
+        self.artifact_cache = ArtifactCache(remote_cache)
+        self.timeline = BuildTimeline()
+        self.bytecode_profile = None  # profile the last PyInstaller run used
+        self.collection = None  # collection plan of the last PyInstaller run
+        self.stage = None  # staging tree of the running build
+
+    def update_status(self, message, status_type="info"):
+        """Report a status line to the callback or stdout"""
+        if self.status_callback is not None:
+            self.status_callback(message, status_type)
+        else:
+            print(f"[{status_type}] {message}", flush=True)
+
+    def cancel(self):
+        """Stop the running build, killing git, pip or PyInstaller and everything they started"""
+        self.cancel_token.cancel()
+
+    def build_all(self, targets, keep_going=True):
+        """
+        Build several targets one after another.
+
+        Args:
+            targets (list): BuildTarget objects
+            keep_going (bool): Continue with the remaining targets after a failure
+
+        Returns:
+            list: BuildResult for every target that was attempted
+        """
+        results = []
+        for index, target in enumerate(targets, 1):
+            self.update_status(f"[{index}/{len(targets)}] Building {target.display_name}", "info")
+            result = self.build(target)
+            results.append(result)
+            if self.cancel_token.cancelled:
+                break
+            if not result.success and not keep_going:
+                break
+        return results
+
+    def build(self, target):
+        """
+        Build one target, reporting progress through update_status.
+
+        Returns:
+            BuildResult: Never raises for build failures, check ``success``
+        """
+        start = time.monotonic()
+        self.timeline = BuildTimeline(target.display_name)
+        try:
+            with self.timeline.span("build", target=target.display_name):
+                artifact = self.build_executable(target)
+            result = BuildResult(target, True, artifact=artifact, duration=time.monotonic() - start)
+        except process_runner.ProcessCancelled as e:
+            self.update_status("Build cancelled", "warning")
+            result = BuildResult(target, False, error=str(e), duration=time.monotonic() - start)
+        except Exception as e:
+            self.update_status(f"Build failed: {str(e)}", "error")
+            result = BuildResult(target, False, error=str(e), duration=time.monotonic() - start)
+        self.timeline.close()
+        result.timeline = self.timeline
+        self.save_timeline(target)
+        return result
+
+    def watch(self, target, debounce=0.5):
+        """
+        Build a folder project, then rebuild it whenever its files change until the build is cancelled.
+
+        Rebuilds go through build(), so they reuse the build environment and the analysis
+        cache and only redo the PyInstaller steps the changes affect.
+
+        Args:
+            target (BuildTarget): A folder target
+            debounce (float): Seconds the folder must stay quiet before rebuilding
+
+        Returns:
+            list: BuildResult of every build
+
+        Raises:
+            Exception: If the target isn't a folder project or is invalid
+        """
+        if target.input_type != "folder":
+            raise Exception("Watch mode needs a folder project")
+        error = target.validate()
+        if error:
+            raise Exception(error)
+
+        # Build output inside the project must not trigger the next build
+        exclude = [target.output_dir] + glob.glob(os.path.join(glob.escape(target.output_dir), target.display_name + "*"))
+        watcher = source_watcher.SourceWatcher(target.source_path, exclude, debounce=debounce)
+
+        results = [self.build(target)]
+        while not self.cancel_token.cancelled:
+            self.update_status(f"Watching {watcher.root} for changes...", "info")
+            changes = watcher.wait(lambda: self.cancel_token.cancelled)
+            if changes is None:
+                break
+            self.update_status(f"{changes.describe(watcher.root)}; rebuilding...", "info")
+            result = self.build(target)
+            results.append(result)
+            if result.success:
+                self.update_status(f"Executable ready {time.time() - changes.saved_at:.1f}s after the save "
+                                   f"(rebuild took {result.duration:.1f}s)", "success")
+            elif not self.cancel_token.cancelled:
+                self.update_status("Rebuild failed; waiting for the next change", "warning")
+        self.update_status("Stopped watching", "info")
+        return results
+
+    def save_collection_report(self, target):
+        """Save what the collection policy bundled of each heavy package, when the project uses any"""
+        if self.collection is None or not self.collection.packages:
+            return
+        try:
+            with open(target.collection_report_path, "w", encoding="utf-8") as f:
+                json.dump(self.collection.to_dict(), f, indent=2)
+            self.update_status(f"Collection report: {target.collection_report_path}", "info")
+        except OSError as e:
+            self.update_status(f"Warning: Could not save collection report: {e}", "warning")
+
+    def save_timeline(self, target):
+        """Report where the build spent its time and save the timeline if asked to"""
+        self.update_status(self.timeline.summary(), "info")
+        if not target.trace:
+            return
+        try:
+            self.timeline.save(target.timeline_path)
+            self.timeline.save_chrome_trace(target.trace_path)
+            self.update_status(f"Build timeline: {target.timeline_path} (Chrome trace: {target.trace_path})", "info")
+        except OSError as e:
+            self.update_status(f"Warning: Could not save build timeline: {e}", "warning")
+
+    def build_executable(self, target):
+        """
+        Main build process.
+
+        Returns:
+            str: Path of the produced executable (or onedir folder)
+
+        Raises:
+            Exception: If the build fails
+        """
+        error = target.validate()
+        if error:
+            raise Exception(error)
+
+        self.update_status("Starting build process...", "info")
+
+        with self.timeline.span("prepare source", input_type=target.input_type):
+            source_file, temp_dir = self.prepare_source(target)
+        stage = None
+        try:
+            if not os.path.exists(source_file):
+                raise Exception(f"Main file not found: {source_file}")
+
+            self.update_status(f"Source file: {source_file}", "info")
+
+            # Create output directory
+            os.makedirs(target.output_dir, exist_ok=True)
+
+            # Build from a mirror of the project, so nothing is ever written into it
+            with self.timeline.span("stage source"):
+                stage = self.stage = self.stage_source(source_file, target)
+            source_file = stage.staged(source_file)
+
+            # Run PyInstaller
+            self.update_status("Running PyInstaller...", "info")
+            variants = {}
+            if target.fast_start:
+                variants["onedir"], python_exe = self.build_fast_start(source_file, target)
+            else:
+                python_exe = self.run_pyinstaller(source_file, target)
+            self.save_collection_report(target)
+
+            self.update_status("Build completed successfully! 🎉", "success")
+            artifact = self.artifact_path(source_file, target)
+            if target.bytecode_profile != "default":
+                with self.timeline.span("compare bytecode profiles"):
+                    self.compare_bytecode_profiles(source_file, target, variants.get("onedir", artifact), python_exe)
+            if target.compare_compression:
+                with self.timeline.span("compare compression"):
+                    self.compare_compression(source_file, target, None if target.fast_start else artifact)
+            if target.benchmark_runs:
+                with self.timeline.span("benchmark startup", runs=target.benchmark_runs):
+                    self.benchmark_startup(source_file, target, artifact, variants)
+            return artifact
+        finally:
+            if stage is not None:
+                stage.release()
+                self.stage = None
+            if target.fast_start:
+                shutil.rmtree(os.path.join(target.output_dir, ".fast-start"), ignore_errors=True)
+            if temp_dir:
+                with self.timeline.span("cleanup source"):
+                    self.cleanup_source(temp_dir)
+
+    def build_fast_start(self, source_file, target):
+        """
+        Build a fast-start executable: a one-file launcher carrying a one-folder build.
+
+        Returns:
+            tuple: (the one-folder build the payload was made from, build interpreter)
+        """
+        name = target.name or os.path.splitext(os.path.basename(source_file))[0]
+        payload_dir = os.path.join(target.output_dir, ".fast-start")
+        shutil.rmtree(payload_dir, ignore_errors=True)
+
+        with self.timeline.span("fast-start payload"):
+            self.update_status("Building the application folder for the fast-start payload...", "info")
+            payload_target = BuildTarget.from_dict(dict(target.to_dict(), output_dir=payload_dir, onefile=False,
+                                                        fast_start=False, benchmark_runs=0))
+            python_exe = self.run_pyinstaller(source_file, payload_target)
+        collection = self.collection
+
+        with self.timeline.span("fast-start launcher"):
+            self.update_status("Building the fast-start launcher...", "info")
+            launcher_script = fast_start.stage_launcher(name)
+            launcher_target = BuildTarget(launcher_script, target.output_dir, name=name, onefile=True,
+                                          console=target.console, isolated_env=False)
+            launcher_options = []
+            for module in fast_start.LAUNCHER_EXCLUDES:
+                launcher_options.extend(["--exclude-module", module])
+            self.run_pyinstaller(launcher_script, launcher_target, python_exe=python_exe, extra_options=launcher_options)
+
+        with self.timeline.span("fast-start stub"):
+            try:
+                stub = fast_start.build_stub(self.cancel_token)
+            except process_runner.ProcessCancelled:
+                raise
+            except Exception as e:
+                self.update_status(f"Warning: {e}", "warning")
+                stub = None
+            if stub is None:
+                self.update_status("No native stub for fast-start (needs a C compiler, not available on Windows); "
+                                   "the launcher unpacks its own Python runtime on every start", "warning")
+
+        with self.timeline.span("fast-start attach"):
+            launcher = startup_bench.executable_in(self.artifact_path(source_file, target))
+            executable = name + (".exe" if sys.platform == "win32" else "")
+            info = fast_start.attach_payload(launcher, os.path.join(payload_dir, name), name, executable, stub,
+                                             self.cancel_token)
+            self.update_status(f"Attached {info['files']} files ({info['size'] / 1e6:.1f} MB compressed) to "
+                               f"the fast-start launcher; they are unpacked once on first launch", "success")
+        self.collection = collection  # the payload's, not the launcher's
+        return os.path.join(payload_dir, name), python_exe
+
+    def compare_bytecode_profiles(self, source_file, target, artifact, python_exe):
+        """
+        Build the default profile alongside and report the size and startup differences.
+
+        Args:
+            artifact (str): The optimized build (the one-folder payload for fast-start targets)
+            python_exe (str): Interpreter the optimized build ran with
+        """
+        profile = self.bytecode_profile
+        compare_dir = tempfile.mkdtemp(prefix="lightning-exe-bytecode-")
+        try:
+            self.update_status("Building with the default bytecode profile for comparison...", "info")
+            onefile = target.onefile and not target.fast_start
+            default_target = BuildTarget.from_dict(dict(target.to_dict(), output_dir=compare_dir, onefile=onefile,
+                                                        fast_start=False, benchmark_runs=0,
+                                                        bytecode_profile="default"))
+            self.run_pyinstaller(source_file, default_target)
+            default_artifact = self.artifact_path(source_file, default_target)
+
+            runs = max(3, target.benchmark_runs)
+            report = {}
+            for name, path in ((target.bytecode_profile, artifact), ("default", default_artifact)):
+                startup = startup_bench.benchmark(path, runs=runs, cold_runs=0, options={"bytecode_profile": name})
+                sources = bytecode_profile.bundled_sources(path, python_exe, self.cancel_token)
+                report[name] = {
+                    "size": startup_bench.artifact_size(path),
+                    "startup": startup.stats("warm"),
+                    "sources": [{"path": p, "size": size} for p, size in sources],
+                }
+            report["optimize"] = profile.optimize
+            report["docstrings_kept_because"] = profile.reasons
+            with open(target.bytecode_report_path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+
+            release, default = report[target.bytecode_profile], report["default"]
+            saved = default["size"] - release["size"]
+            message = (f"{target.bytecode_profile.capitalize()} profile: {release['size'] / 1e6:.1f} MB "
+                       f"({saved / 1e6:.1f} MB smaller than the default profile)")
+            if release["startup"]["wall_time"] and default["startup"]["wall_time"]:
+                release_ms = release["startup"]["wall_time"]["median"] * 1000
+                default_ms = default["startup"]["wall_time"]["median"] * 1000
+                message += f", warm start {release_ms:.0f} ms vs {default_ms:.0f} ms"
+            self.update_status(message, "success")
+            if release["sources"]:
+                self.update_status(f"{len(release['sources'])} .py source files are bundled because "
+                                   f"PyInstaller hooks ask for them (listed in the report)", "info")
+            self.update_status(f"Bytecode profile report: {target.bytecode_report_path}", "info")
+        finally:
+            shutil.rmtree(compare_dir, ignore_errors=True)
+
+    def compare_compression(self, source_file, target, artifact=None):
+        """
+        Build every available compression strategy and report size and startup cost.
+
+        The builds share the target's Analysis, so each one only redoes the
+        packaging steps.
+
+        Args:
+            artifact (str): The target's own build, reused for its strategy
+                (None to build it again, e.g. for fast-start targets)
+        """
+        compare_dir = tempfile.mkdtemp(prefix="lightning-exe-compression-")
+        try:
+            runs = max(3, target.benchmark_runs)
+            report = {"chosen": target.compression, "onefile": target.onefile, "strategies": {}, "skipped": {}}
+            for strategy in compression.STRATEGIES:
+                if strategy not in compression.available_strategies():
+                    report["skipped"][strategy] = "UPX is not installed"
+                    continue
+                path = artifact
+                if strategy != target.compression or artifact is None:
+                    self.update_status(f"Building with the '{strategy}' compression strategy...", "info")
+                    variant = BuildTarget.from_dict(dict(target.to_dict(), output_dir=os.path.join(compare_dir, strategy),
+                                                         compression=strategy, compare_compression=False,
+                                                         fast_start=False, benchmark_runs=0))
+                    self.run_pyinstaller(source_file, variant)
+                    path = self.artifact_path(source_file, variant)
+
+                self.update_status(f"Benchmarking the '{strategy}' compression strategy...", "info")
+                startup = startup_bench.benchmark(path, runs=runs, options={"compression": strategy})
+                report["strategies"][strategy] = {
+                    "size": startup_bench.artifact_size(path),
+                    "cold": startup.stats("cold"),
+                    "warm": startup.stats("warm"),
+                }
+
+            with open(target.compression_report_path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            for strategy, result in report["strategies"].items():
+                message = f"  {strategy}: {result['size'] / 1e6:.1f} MB"
+                for kind in ("cold", "warm"):
+                    wall = result[kind]["wall_time"]
+                    if wall:
+                        message += f", {kind} start {wall['median'] * 1000:.0f} ms"
+                self.update_status(message, "success" if strategy == target.compression else "info")
+            for strategy, reason in report["skipped"].items():
+                self.update_status(f"  {strategy}: skipped ({reason})", "info")
+            self.update_status(f"Compression report: {target.compression_report_path}", "info")
+        finally:
+            shutil.rmtree(compare_dir, ignore_errors=True)
+
+    def benchmark_startup(self, source_file, target, artifact, variants=None):
+        """
+        Measure the startup of a fresh build and save the report next to it.
+
+        Args:
+            variants (dict): Other builds of the same program to compare, by name
+        """
+        profile_dir = None
+        variants = dict(variants or {})
+        try:
+            if target.profile_imports or target.fast_start:
+                profile_dir = tempfile.mkdtemp(prefix="lightning-exe-profile-")
+            if target.profile_imports:
+                # Bundled executables ignore PYTHONPROFILEIMPORTTIME, so build a copy with -X importtime
+                self.update_status("Building import-time profiling variant...", "info")
+                profile_target = BuildTarget.from_dict(dict(target.to_dict(), output_dir=os.path.join(profile_dir, "importtime"),
+                                                            benchmark_runs=0, fast_start=False))
+                self.run_pyinstaller(source_file, profile_target, extra_options=["--python-option", "X importtime"])
+            if target.fast_start:
+                self.update_status("Building a plain one-file variant for comparison...", "info")
+                onefile_target = BuildTarget.from_dict(dict(target.to_dict(), output_dir=os.path.join(profile_dir, "onefile"),
+                                                            benchmark_runs=0, fast_start=False))
+                self.run_pyinstaller(source_file, onefile_target)
+                variants["onefile"] = self.artifact_path(source_file, onefile_target)
+
+            self.update_status(f"Benchmarking startup ({target.benchmark_runs} warm runs)...", "info")
+            env = None
+            if target.fast_start:
+                # A fresh extraction cache, so the cold run includes the one-time unpacking
+                env = dict(os.environ, LIGHTNING_EXE_APP_CACHE=os.path.join(profile_dir, "app-cache"))
+            report = startup_bench.benchmark(
+                artifact, runs=target.benchmark_runs,
+                profile_artifact=self.artifact_path(source_file, profile_target) if target.profile_imports else None,
+                options={"onefile": target.onefile, "console": target.console, "fast_start": target.fast_start},
+                env=env,
+            )
+            for variant, path in variants.items():
+                report.compared[variant] = startup_bench.benchmark(path, runs=target.benchmark_runs,
+                                                                   options={"variant": variant})
+            report.save(target.benchmark_path)
+            self.update_status(report.summary(), "success")
+            for variant, compared in report.compared.items():
+                self.update_status(f"  {variant}: {compared.summary()}", "info")
+            if not report.page_cache_dropped:
+                self.update_status("Cold runs reused the OS page cache (dropping it needs root on Linux)", "info")
+            for entry in (report.importtime or [])[:5]:
+                self.update_status(f"  import {entry['module']}: {entry['cumulative_us'] / 1000:.1f} ms", "info")
+            self.update_status(f"Startup report: {target.benchmark_path}", "info")
+        except Exception as e:
+            self.update_status(f"Warning: Startup benchmark failed: {e}", "warning")
+        finally:
+            if profile_dir:
+                shutil.rmtree(profile_dir, ignore_errors=True)
+
+    def prepare_source(self, target):
+        """
+        Locate the entry script, fetching remote sources first.
+
+        Returns:
+            tuple: (entry script path, temporary directory to delete afterwards or None)
+        """
+        if target.input_type == "file":
+            return target.source_path, None
+        if target.input_type == "folder":
+            return os.path.join(target.source_path, target.main_file), None
+
+        temp_dir = tempfile.mkdtemp(prefix="lightning-exe-")
+        try:
+            if target.fetch_mode == "archive":
+                source_dir = self.download_source_archive(target, temp_dir)
+            else:
+                self.update_status("Cloning GitHub repository...", "info")
+                source_dir = self.download_github_repo(target.source_path, temp_dir, target.ref)
+        except Exception:
+            self.cleanup_source(temp_dir)
+            raise
+        return os.path.join(source_dir, target.main_file), temp_dir
+
+    def stage_source(self, source_file, target):
+        """
+        Mirror the project folder into its staging tree.
+
+        A single script is staged with just the sibling modules and packages it
+        imports and its requirements files, since the folder it sits in (say the
+        Desktop) is no project, and mirroring it would also make the import scan
+        and the build fingerprint walk all of it.
+
+        Returns:
+            StagingTree: Reserved for this build; release() it afterwards
+        """
+        project_dir = os.path.dirname(os.path.abspath(source_file))
+        if target.input_type == "github":
+            # The checkout is a new temporary folder every time; the repository identifies the project
+            key = "|".join([target.source_path, os.path.dirname(target.main_file)])
+        else:
+            key = project_dir
+        include = None
+        if target.input_type == "file":
+            key = os.path.abspath(source_file)
+            entry_files = multi_entry.resolve_entry_points(source_file, multi_entry.split_entry_points(target.entry_points))
+            include = script_files(source_file, entry_files) + \
+                included_requirements_files(find_requirements_files(project_dir))
+        outputs = [target.output_dir] + glob.glob(os.path.join(glob.escape(target.output_dir), target.display_name + "*"))
+        stage = staging.stage_project(key, project_dir, exclude=outputs,
+                                      generated=[cmd_args_helper.RUNTIME_HOOK] if target.env_vars or target.cmd_args else [],
+                                      include=include)
+        self.update_status(f"Staged {stage.files} files ({stage.updated} updated, {stage.method or 'unchanged'}) "
+                           f"in {stage.duration * 1000:.0f} ms", "info")
+        return stage
+
+    def cleanup_source(self, temp_dir):
+        """Delete a temporary source checkout"""
+        repo_dir = os.path.join(temp_dir, "repo")
+        if os.path.exists(repo_dir):
+            remove_checkout(repo_dir)
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def artifact_path(self, source_file, target):
+        """Where PyInstaller puts the executable for this target"""
+        name = target.name or os.path.splitext(os.path.basename(source_file))[0]
+        if not target.onefile:
+            return os.path.join(target.output_dir, name)
+        if sys.platform == "win32":
+            name += ".exe"
+        elif sys.platform == "darwin" and not target.console:
+            name += ".app"
+        return os.path.join(target.output_dir, name)
+
+    def download_github_repo(self, github_url, dest_dir, ref=None):
+        """Check out a GitHub repository using the local mirror cache"""
+        try:
+            repo_dir = os.path.join(dest_dir, "repo")
+            clone_github_repo(github_url, repo_dir, ref=ref, cancel=self.cancel_token,
+                              status_callback=self.update_status)
+            return repo_dir
+        except process_runner.ProcessCancelled:
+            raise
+        except Exception as e:
+            raise Exception(f"Error cloning GitHub repository: {str(e)}")
+
+    def find_requirements_files(self, project_dir):
+        """Return the requirements files found in the project directory"""
+        requirements_files = find_requirements_files(project_dir)
+        if requirements_files:
+            self.update_status(f"Found requirements files: {', '.join([os.path.basename(f) for f in requirements_files])}", "info")
+        return requirements_files
+
+    def resolve_dependencies(self, project_dir, python_exe):
+        """Parse the project's requirements once for the build interpreter"""
+        deps = resolve_dependencies(self.find_requirements_files(project_dir), python_exe)
+        skipped = len(deps.requirements) - len(deps.active)
+        if deps.requirements:
+            message = f"Resolved {len(deps.active)} requirements"
+            if skipped:
+                message += f" ({skipped} skipped by environment markers)"
+            self.update_status(message, "info")
+        return deps
+
+    def ensure_pyinstaller(self, python_exe):
+        """Install PyInstaller into the interpreter if the toolchain registry says it's missing"""
+        interpreter = toolchains.lookup(python_exe, self.cancel_token)
+        if interpreter.pyinstaller:
+            self.update_status(f"Found PyInstaller version: {interpreter.pyinstaller} (Python {interpreter.version})")
+            return
+
+        self.update_status(f"Installing PyInstaller into {python_exe}...", "info")
+        try:
+            process_runner.run([python_exe, "-m", "pip", "install", "pyinstaller"], line_callback=lambda line: self.update_status(line.strip()),
+                               phase="pip", cancel=self.cancel_token).check()
+        except (subprocess.CalledProcessError, process_runner.ProcessTimeout):
+            raise Exception("Failed to install PyInstaller")
+
+    def plan_imports(self, source_file, deps, extra_packages=(), entry_files=(), installed_candidates=None,
+                     drop_unused=False):
+        """Scan the project's imports and decide on hidden imports and excludes"""
+        start = time.monotonic()
+        graph = scan_project(os.path.dirname(source_file))
+        plan = plan_imports(graph, [source_file, *entry_files], deps, extra_packages, installed_candidates, drop_unused)
+        entries = ", ".join(os.path.basename(path) for path in [source_file, *entry_files])
+        self.update_status(f"Scanned {len(graph.modules)} modules ({graph.parsed} parsed, "
+                           f"{len(graph.modules) - graph.parsed} cached) in {time.monotonic() - start:.2f}s; "
+                           f"{len(plan.modules)} reachable from {entries}", "info")
+        for path, error in graph.errors.items():
+            self.update_status(f"Warning: Could not parse {os.path.basename(path)}: {error}", "warning")
+        if plan.unused_requirements and plan.drop_unused:
+            self.update_status(f"Warning: Not bundling unused requirements: {', '.join(plan.unused_requirements)} "
+                               f"(add them to Extra Packages if they're loaded at runtime)", "warning")
+        elif plan.unused_requirements:
+            self.update_status(f"Bundling requirements the code never imports: {', '.join(plan.unused_requirements)} "
+                               f"(--drop-unused-requirements leaves them out)", "info")
+        if plan.excludes:
+            self.update_status(f"Excluding development-only modules the project never imports: "
+                               f"{', '.join(plan.excludes)}", "info")
+        return plan
+
+    def plan_collection(self, plan, python_exe):
+        """Decide what to bundle of the heavy packages the project imports"""
+        collection = plan_collection(plan.bundled_requirements, plan.imports, python_exe, self.cancel_token)
+        for package in collection.packages:
+            self.update_status(
+                f"Collecting {package.package}: {package.policy_bytes / 1e6:.1f} MB instead of "
+                f"{package.collect_all_bytes / 1e6:.1f} MB with --collect-all"
+                + (f" (excluding {', '.join(package.excludes)})" if package.excludes else ""), "info")
+        if collection.packages:
+            self.update_status(f"Collection policy saves about {collection.saved_bytes / 1e6:.1f} MB "
+                               f"of installed files versus --collect-all", "success")
+        return collection
+
+    def install_requirements(self, python_exe, deps):
+        """Install a project's requirements into the given interpreter from the local wheelhouse"""
+        if not deps.active:
+            return
+
+        self.update_status(f"Installing {len(deps.active)} dependencies...", "info")
+        try:
+            key = environment_key(deps, build_tools=False)
+            wheel_set = wheelhouse.prefetch(key, python_exe, requirement_args(deps.requirement_files, build_tools=False),
+                                            self.update_status, cancel=self.cancel_token)
+            wheelhouse.install(python_exe, wheel_set, self.cancel_token)
+            self.update_status("Dependencies installed successfully", "success")
+        except process_runner.ProcessCancelled:
+            raise
+        except subprocess.CalledProcessError as e:
+            self.update_status(f"Warning: Some dependencies may not have installed: {e}", "warning")
+        except Exception as e:
+            self.update_status(f"Warning: Some dependencies may not have installed: {e}", "warning")
+
+    def download_source_archive(self, target, dest_dir):
+        """Download and extract a snapshot of the repository at the target's ref"""
+        url = archive_url_for(target.source_path, target.ref)
+        self.update_status(f"Downloading source archive {url}...", "info")
+        repo_dir = os.path.join(dest_dir, "repo")
+        download = download_archive(url, repo_dir, expected_sha256=target.archive_sha256)
+        self.update_status(f"Extracted {download.files} files from {download.size / 1024:.0f} KB archive "
+                           f"(sha256 {download.sha256[:16]}...)", "success")
+        return repo_dir
+
+    def run_pyinstaller(self, source_file, target, python_exe=None, extra_options=()):
+        """
+        Run PyInstaller to create an executable.
+
+        Returns:
+            str: The interpreter PyInstaller ran with (the build environment's, if isolated)
+        """
+        if python_exe is None:
+            python_exe = self.python_exe
+        output_dir = target.output_dir
+
+        # Auto-detect dependencies from requirements.txt
+        with self.timeline.span("resolve requirements"):
+            deps = self.resolve_dependencies(os.path.dirname(source_file), python_exe)
+
+        if deps.requirement_files and target.isolated_env:
+            # Build inside a cached virtualenv so the host interpreter stays clean
+            with self.timeline.span("build environment"):
+                env = get_build_environment(deps, self.update_status, self.cancel_token)
+            python_exe = env.python_exe
+        else:
+            with self.timeline.span("check PyInstaller"):
+                self.ensure_pyinstaller(python_exe)
+            if deps.requirement_files:
+                with self.timeline.span("install requirements"):
+                    self.install_requirements(python_exe, deps)
+            else:
+                self.update_status("No requirements.txt file found in project directory", "info")
+
+        # Find out which modules the requirements actually installed, and fingerprint everything
+        # installed for the analysis cache; both only read the environment, so they run side by side
+        probes = [distributions_command(python_exe), exclude_candidates_command(python_exe)]
+        if deps.names:
+            probes.append(deps.import_names_command(python_exe))
+        with self.timeline.span("probe build environment"):
+            results = process_runner.run_concurrently(probes, cancel=self.cancel_token, merge_stderr=False)
+        dependencies = fingerprint_distributions(results[0])
+        installed_candidates = installed_exclude_candidates(results[1])
+        if deps.names:
+            for name in deps.apply_import_names(results[2]):
+                self.update_status(f"Warning: {name} is not installed in the build environment", "warning")
+
+        # More scripts analysed together with the main one, each becoming an executable of its own
+        entry_files = multi_entry.resolve_entry_points(source_file, multi_entry.split_entry_points(target.entry_points))
+
+        # Work out from the code itself what PyInstaller needs to be told
+        extra_packages = [pkg.strip() for pkg in target.extra_packages.split(",") if pkg.strip()]
+        with self.timeline.span("scan imports"):
+            plan = self.plan_imports(source_file, deps, extra_packages, entry_files, installed_candidates,
+                                     target.drop_unused_requirements)
+
+        # Prepare PyInstaller options
+        options = []
+
+        if target.name:
+            options.extend(["--name", target.name])
+
+        # Add onefile/onedir option
+        if target.onefile:
+            options.append("--onefile")
+        else:
+            options.append("--onedir")
+
+        # Add console/no-console option
+        if not target.console:
+            options.append("--windowed")
+
+        # Add hidden imports for modules PyInstaller can't find by itself
+        for module in plan.hidden_imports:
+            options.extend(["--hidden-import", module])
+            self.update_status(f"Adding hidden import: {module}")
+
+        for module in plan.excludes:
+            options.extend(["--exclude-module", module])
+
+        # Collect heavy packages by their curated rules rather than --collect-all
+        with self.timeline.span("collection policy"):
+            self.collection = self.plan_collection(plan, python_exe)
+            options.extend(self.collection.options)
+
+        # Compile bundled modules at the profile's optimization level
+        profile = bytecode_profile.choose_profile(target.bytecode_profile, plan)
+        if profile.optimize is not None:
+            self.update_status(f"Using the {profile.describe()}", "info")
+            for reason in profile.reasons:
+                self.update_status(f"Keeping docstrings: {reason}", "info")
+            options.extend(profile.options)
+        self.bytecode_profile = profile
+
+        # Apply baked-in environment variables and arguments from a runtime hook
+        if target.env_vars or target.cmd_args:
+            hook_path = self.write_generated(source_file, cmd_args_helper.RUNTIME_HOOK, cmd_args_helper.runtime_hook_source(
+                cmd_args_helper.parse_args(target.cmd_args), target.env_vars))
+            options.extend(["--runtime-hook", hook_path])
+
+        # Add extra packages
+        for pkg in extra_packages:
+            options.extend(["--hidden-import", pkg])
+
+        options.extend(extra_options)
+
+        # PyInstaller appends __main__ to a non-empty exclude list in place, which makes every
+        # later build think the excludes changed and redo Analysis; listing it up front avoids that
+        if "--exclude-module" in options:
+            options.extend(["--exclude-module", "__main__"])
+
+        # Compression only changes packaging, so it stays out of the analysis cache key
+        packaging_options = compression.strategy_options(target.compression)
+
+        # Reuse PyInstaller's work directory from earlier identical builds
+        project_dir = os.path.dirname(source_file)
+        cache_entry = get_analysis_cache_entry(project_dir, source_file, python_exe, options + entry_files)
+        with file_lock(cache_entry.lock_path):
+            with self.timeline.span("check analysis cache"):
+                reason = cache_entry.check(dependencies)
+            if reason:
+                self.update_status(f"Starting fresh analysis cache ({reason})", "info")
+                cache_entry.invalidate()
+
+            # The generated spec is the canonical description of the build
+            with self.timeline.span("generate spec"):
+                spec_path = self.generate_spec(source_file, target, python_exe, cache_entry.specpath,
+                                               options + packaging_options, entry_files)
+            pyinstaller = [*compression.pyinstaller_command(python_exe, target.compression),
+                           *compression.build_options(target.compression)]
+            artifact = self.artifact_path(source_file, target)
+            with self.timeline.span("fingerprint"):
+                outputs = [output_dir] + glob.glob(os.path.join(glob.escape(output_dir), target.display_name + "*"))
+                fingerprint = build_fingerprint.build_fingerprint(spec_path, project_dir, dependencies,
+                                                                  pyinstaller, exclude=outputs)
+            if not reason and not target.force and build_fingerprint.matches(fingerprint, artifact):
+                self.update_status(f"Nothing changed since the last build; keeping {artifact}", "success")
+                return python_exe
+
+            # Someone may have built exactly this before, here or on another machine
+            cache_key = build_fingerprint.portable_fingerprint(spec_path, project_dir, dependencies, pyinstaller,
+                                                               python_exe, exclude=outputs,
+                                                               site_dirs=self.collection.site_dirs)
+            if not target.force:
+                with self.timeline.span("restore artifact"):
+                    if self.restore_artifact(cache_key, artifact):
+                        build_fingerprint.record(fingerprint, artifact)
+                        return python_exe
+
+            if not reason:
+                self.update_status("Reusing cached analysis from the previous build", "info")
+                if cache_entry.packaging() != target.compression:
+                    cache_entry.reset_packaging()
+
+            cmd = [
+                *pyinstaller,
+                "--distpath", output_dir,
+                "--workpath", cache_entry.workpath,
+                "--noconfirm",
+                spec_path
+            ]
+            with self.timeline.span("PyInstaller", "pyinstaller") as span:
+                parser = PyInstallerPhaseParser(self.timeline, depth=span.depth + 1)
+                try:
+                    self.run_command(cmd, parser.feed)
+                finally:
+                    parser.finish()
+            cache_entry.record(project_dir, dependencies, target.compression)
+            build_fingerprint.record(fingerprint, artifact)
+            with self.timeline.span("store artifact"):
+                self.store_artifact(cache_key, artifact)
+        return python_exe
+
+    def restore_artifact(self, cache_key, artifact):
+        """Fetch the artifact from the artifact cache; False on a miss or when the cache can't be reached"""
+        try:
+            source = self.artifact_cache.restore(cache_key, artifact)
+        except Exception as e:
+            self.update_status(f"Warning: Could not read the artifact cache: {e}", "warning")
+            return False
+        if source:
+            self.update_status(f"Restored {artifact} from the artifact cache ({source}) instead of running PyInstaller",
+                               "success")
+        return bool(source)
+
+    def store_artifact(self, cache_key, artifact):
+        """Add a fresh artifact to the local and shared artifact caches"""
+        try:
+            size = self.artifact_cache.store(cache_key, artifact)
+        except Exception as e:
+            self.update_status(f"Warning: Could not store the build in the artifact cache: {e}", "warning")
+            return
+        where = f" and {self.artifact_cache.remote.describe()}" if self.artifact_cache.remote else ""
+        self.update_status(f"Stored the build in the artifact cache{where} ({size / 1e6:.1f} MB)", "info")
+
+    def write_generated(self, source_file, name, content):
+        """
+        Write a file the build generates next to the entry script.
+
+        Inside build() this is the staging tree, never the user's project.
+
+        Returns:
+            str: Path of the written file
+        """
+        if self.stage is not None and os.path.dirname(source_file) == self.stage.path:
+            return self.stage.write(name, content)
+        path = os.path.join(os.path.dirname(source_file), name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+    def generate_spec(self, source_file, target, python_exe, spec_dir, options, entry_files=()):
+        """
+        Write the .spec file for a build with PyInstaller's makespec.
+
+        Args:
+            entry_files (list): More entry scripts, each packaged as an executable of its own
+
+        Returns:
+            str: Path of the spec file
+        """
+        name = target.name or os.path.splitext(os.path.basename(source_file))[0]
+        os.makedirs(spec_dir, exist_ok=True)
+        cmd = [python_exe, "-m", "PyInstaller.utils.cliutils.makespec", "--specpath", spec_dir, *options,
+               source_file, *entry_files]
+        result = process_runner.run(cmd, cancel=self.cancel_token, merge_stderr=False)
+        if result.returncode != 0:
+            raise Exception(f"Could not generate the spec file: {(result.stderr or result.stdout).strip()}")
+        spec_path = os.path.join(spec_dir, name + ".spec")
+        if entry_files:
+            names = multi_entry.executable_names(name, entry_files)
+            multi_entry.rewrite_spec(spec_path, names)
+            self.update_status(f"Building {len(names)} executables from one analysis: {', '.join(names)}", "info")
+        return spec_path
+
+    def run_command(self, cmd, line_callback=None, phase="pyinstaller"):
+        """
+        Run PyInstaller, streaming its output as status lines.
+
+        Raises:
+            Exception: If it fails
+            ProcessCancelled: If the build was cancelled
+            ProcessTimeout: If it runs or stays silent for longer than the phase allows
+        """
+        self.update_status(f"Running command: {' '.join(cmd)}", "info")
+
+        def on_line(line):
+            if line.strip():
+                self.update_status(line.strip())
+            if line_callback is not None:
+                line_callback(line)
+
+        result = process_runner.run(cmd, line_callback=on_line, phase=phase, cancel=self.cancel_token)
+        if result.returncode != 0:
+            raise Exception(f"PyInstaller failed with return code {result.returncode}")
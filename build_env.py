@@ -0,0 +1,144 @@
+"""
+Cached, isolated build environments for Lightning EXE.
+
+Instead of installing a project's requirements into the interpreter that
+runs Lightning EXE, each project gets a virtualenv keyed by a hash of its
+requirements and the base interpreter. Building an unchanged project again
+reuses the warm environment and skips pip entirely. New environments are
+installed offline from the local wheelhouse.
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import process_runner
+import wheelhouse
+from cache_utils import file_lock, get_cache_dir, hash_strings
+
+READY_MARKER = "lightning-exe-env.json"
+
+# Packages every build environment needs on top of the project's requirements
+BUILD_TOOLS = ["pyinstaller"]
+
+
+def environment_key(deps, build_tools=True):
+    """Hash identifying the environment for a resolved DependencySet"""
+    return hash_strings(deps.key, *(BUILD_TOOLS if build_tools else []))
+
+
+def build_tools_key(deps):
+    """Hash identifying the wheel set of the build tools alone, for the interpreter of a DependencySet"""
+    return hash_strings(os.path.abspath(deps.python_exe), deps.python_version, *BUILD_TOOLS)
+
+
+def requirement_args(requirements_files, build_tools=True):
+    """pip arguments installing the requirements files (and the build tools)"""
+    args = list(BUILD_TOOLS) if build_tools else []
+    for req_file in requirements_files:
+        args.extend(["-r", req_file])
+    return args
+
+
+class BuildEnvironment:
+    """A virtualenv in the Lightning EXE cache"""
+
+    def __init__(self, path):
+        self.path = path
+
+    @property
+    def python_exe(self):
+        """Path of the environment's interpreter"""
+        if sys.platform == "win32":
+            return os.path.join(self.path, "Scripts", "python.exe")
+        return os.path.join(self.path, "bin", "python")
+
+    @property
+    def marker_path(self):
+        return os.path.join(self.path, READY_MARKER)
+
+    def is_ready(self):
+        """True if the environment was fully provisioned"""
+        return os.path.exists(self.marker_path) and os.path.exists(self.python_exe)
+
+
+def get_build_environment(deps, status_callback=None, cancel=None):
+    """
+    Return a provisioned build environment for the given requirements.
+
+    A cached environment is reused when one exists for the same requirements
+    and interpreter; otherwise a new virtualenv is created and PyInstaller
+    plus the requirements are installed into it.
+
+    Args:
+        deps (DependencySet): The project's requirements, resolved for the
+            base interpreter of the virtualenv
+        status_callback: Called as ``status_callback(message, status_type)``
+        cancel (CancelToken): Stops venv and pip when the build is cancelled
+
+    Returns:
+        BuildEnvironment: The ready-to-use environment
+
+    Raises:
+        ProcessCancelled: If the build was cancelled
+    """
+    python_exe = deps.python_exe
+    requirements_files = deps.requirement_files
+    report = status_callback or (lambda message, status_type="info": print(message))
+
+    key = environment_key(deps)
+    envs_dir = get_cache_dir("envs")
+    env = BuildEnvironment(os.path.join(envs_dir, key[:24]))
+
+    with file_lock(os.path.join(envs_dir, key[:24] + ".lock")):
+        if env.is_ready():
+            os.utime(env.marker_path)  # last use, for cache pruning
+            report(f"Reusing cached build environment {os.path.basename(env.path)}", "success")
+            return env
+
+        if os.path.exists(env.path):
+            # Left behind by an interrupted or failed build
+            shutil.rmtree(env.path, ignore_errors=True)
+
+        report("Creating isolated build environment...", "info")
+        start = time.monotonic()
+        process_runner.run([python_exe, "-m", "venv", env.path], phase="pip", cancel=cancel).check()
+
+        # The build tools go in first, so a requirement that can't be installed
+        # leaves a working environment and a build without it, not one without PyInstaller
+        try:
+            tools = wheelhouse.prefetch(build_tools_key(deps), env.python_exe, list(BUILD_TOOLS), report, cancel=cancel)
+            wheelhouse.install(env.python_exe, tools, cancel)
+        except process_runner.ProcessCancelled:
+            raise
+        except subprocess.CalledProcessError as e:
+            tail = "\n".join((e.stderr or "").strip().splitlines()[-5:])
+            raise Exception(f"Could not install {', '.join(BUILD_TOOLS)} into the build environment: {tail}")
+
+        try:
+            wheel_set = wheelhouse.prefetch(key, env.python_exe, requirement_args(requirements_files), report,
+                                            cancel=cancel)
+            report("Installing dependencies into build environment from the local wheelhouse...", "info")
+            wheelhouse.install(env.python_exe, wheel_set, cancel)
+        except process_runner.ProcessCancelled:
+            raise
+        except subprocess.CalledProcessError as e:
+            tail = "\n".join((e.stderr or "").strip().splitlines()[-5:])
+            report(f"Warning: Could not install the project's requirements, building without them: {tail}", "warning")
+            # Not marked ready, so the next build tries again
+            return env
+        except Exception as e:
+            report(f"Warning: Could not install the project's requirements, building without them: {e}", "warning")
+            return env
+
+        with open(env.marker_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "key": key,
+                "base_python": os.path.abspath(python_exe),
+                "requirements": [os.path.abspath(p) for p in requirements_files],
+                "created": time.time(),
+            }, f, indent=2)
+        report(f"Build environment ready in {time.monotonic() - start:.1f}s", "success")
+        return env
@@ -0,0 +1,180 @@
+"""
+Build fingerprints for Lightning EXE.
+
+Before PyInstaller runs, a build's inputs are reduced to one hash:
+
+* the generated .spec file, which holds every PyInstaller option the
+  target produces (name, one-file/one-folder, console, hidden imports,
+  excludes, data files and extra packages)
+* the contents of every file in the project folder, which includes the
+  generated runtime hook and so the baked-in environment variables and arguments
+* the build interpreter and every distribution installed in it,
+  PyInstaller and its hooks included
+* the command that runs PyInstaller and the options that aren't stored in
+  the spec, such as the compression strategy
+
+When the hash matches the one recorded for the artifact the previous
+build produced, and the artifact hasn't been touched since, the build is
+skipped and the artifact returned as it is.
+
+portable_fingerprint() hashes the same inputs without machine-specific
+paths; it keys the shared artifact cache.
+"""
+import json
+import os
+import platform
+import sys
+
+from cache_utils import file_lock, get_cache_dir, hash_file, hash_strings
+from import_scanner import SKIP_DIRS
+
+
+def tree_fingerprint(project_dir, exclude=()):
+    """
+    Hash the contents of every file in a project folder.
+
+    Files are only read again when their size or modification time
+    changed since the last call.
+
+    Args:
+        project_dir (str): Folder to hash
+        exclude: Files and folders inside it to leave out, e.g. the build output
+
+    Returns:
+        str: sha256 over the relative paths and contents
+    """
+    project_dir = os.path.abspath(project_dir)
+    excluded = {os.path.abspath(path) for path in exclude}
+    cache_path = os.path.join(get_cache_dir("fingerprints", "trees"), hash_strings(project_dir)[:24] + ".json")
+
+    with file_lock(cache_path + ".lock"):
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            cached = {}
+
+        entries = {}
+        for root, dirs, files in os.walk(project_dir):
+            dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS and os.path.join(root, d) not in excluded
+                             and not os.path.exists(os.path.join(root, d, "pyvenv.cfg")))
+            for name in files:
+                path = os.path.join(root, name)
+                if path in excluded:
+                    continue
+                relative = os.path.relpath(path, project_dir).replace(os.sep, "/")
+                try:
+                    stat = os.stat(path)
+                    entry = cached.get(relative)
+                    if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+                        entries[relative] = entry
+                    else:
+                        entries[relative] = [stat.st_mtime_ns, stat.st_size, hash_file(path)]
+                except OSError:
+                    continue
+
+        if entries != cached:
+            with open(cache_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(entries, f)
+            os.replace(cache_path + ".tmp", cache_path)
+
+    return hash_strings(*(f"{relative}:{entry[2]}" for relative, entry in sorted(entries.items())))
+
+
+def artifact_signature(artifact):
+    """Sizes and modification times of an executable or build folder, or None if it's missing"""
+    if os.path.isfile(artifact):
+        stat = os.stat(artifact)
+        return hash_strings(stat.st_size, stat.st_mtime_ns)
+    if not os.path.isdir(artifact):
+        return None
+    values = []
+    for root, dirs, files in os.walk(artifact):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            stat = os.lstat(path)
+            values.extend([os.path.relpath(path, artifact), stat.st_size, stat.st_mtime_ns])
+    return hash_strings(*values)
+
+
+def build_fingerprint(spec_path, project_dir, dependencies, command, exclude=()):
+    """
+    Hash everything a PyInstaller build depends on.
+
+    Args:
+        spec_path (str): The generated .spec file
+        project_dir (str): Folder holding the entry script and its modules
+        dependencies (str): dependency_fingerprint() of the build interpreter
+        command (list): PyInstaller command line without the spec and output paths
+        exclude: Files and folders inside the project to leave out
+
+    Returns:
+        str: sha256 fingerprint
+    """
+    with open(spec_path, "r", encoding="utf-8") as f:
+        spec = f.read()
+    return hash_strings(spec, tree_fingerprint(project_dir, exclude), dependencies, *command)
+
+
+def portable_fingerprint(spec_path, project_dir, dependencies, command, python_exe, exclude=(), site_dirs=()):
+    """
+    Like build_fingerprint(), but the same on every machine that builds the project the same way.
+
+    Absolute paths of the project, the folders packages are installed in,
+    the Lightning EXE cache and the build interpreter are replaced by
+    placeholders, and the platform is added, so it can key a shared cache.
+    What is installed is covered by ``dependencies`` instead.
+
+    Args:
+        spec_path (str): The generated .spec file
+        project_dir (str): Folder holding the entry script and its modules
+        dependencies (str): dependency_fingerprint() of the build interpreter
+        command (list): PyInstaller command line without the spec and output paths
+        python_exe (str): The build interpreter
+        exclude: Files and folders inside the project to leave out
+        site_dirs: Folders the spec collects installed package files from
+
+    Returns:
+        str: sha256 fingerprint
+    """
+    with open(spec_path, "r", encoding="utf-8") as f:
+        spec = f.read()
+    project_dir = os.path.abspath(project_dir)
+    placeholders = {}
+    # Longest first, so a project staged inside the cache becomes <project> rather than <cache>/...
+    for path, placeholder in [(get_cache_dir(), "<cache>"), *[(d, "<site-packages>") for d in site_dirs],
+                              (project_dir, "<project>")]:
+        path = os.path.abspath(path)
+        placeholders[path] = placeholder
+        placeholders[path.replace(os.sep, "/")] = placeholder
+    for path in sorted(placeholders, key=len, reverse=True):
+        spec = spec.replace(repr(path)[1:-1], placeholders[path])
+    command = ["<python>" if part == python_exe else os.path.basename(part) if os.path.isabs(part) else part
+               for part in command]
+    return hash_strings("portable", sys.platform, platform.machine(), spec,
+                        tree_fingerprint(project_dir, exclude), dependencies, *command)
+
+
+def _record_path(artifact):
+    return os.path.join(get_cache_dir("fingerprints", "artifacts"), hash_strings(os.path.abspath(artifact))[:24] + ".json")
+
+
+def matches(fingerprint, artifact):
+    """True if the artifact was built from this fingerprint and hasn't changed since"""
+    try:
+        with open(_record_path(artifact), "r", encoding="utf-8") as f:
+            record = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return record.get("fingerprint") == fingerprint and record.get("signature") == artifact_signature(artifact)
+
+
+def record(fingerprint, artifact):
+    """Remember which fingerprint produced the artifact"""
+    path = _record_path(artifact)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"artifact": os.path.abspath(artifact), "fingerprint": fingerprint,
+                   "signature": artifact_signature(artifact)}, f)
+    os.replace(path + ".tmp", path)
+
@@ -0,0 +1,112 @@
+"""
+Bounded, batched build log for Lightning EXE.
+
+PyInstaller can print tens of thousands of lines. Re-rendering the whole
+status box for every line makes the UI stall, so lines are kept in a ring
+buffer and the view is refreshed in batches, while the complete log is
+streamed to a file on disk.
+"""
+import collections
+import os
+import threading
+
+
+class BuildLog:
+    """Thread-safe ring buffer of log lines with batched flushes"""
+
+    def __init__(self, flush_callback=None, max_lines=500, flush_interval=0.1, flush_lines=100):
+        """
+        Args:
+            flush_callback: Called as ``flush_callback(text)`` with the visible
+                lines joined by newlines whenever a batch is flushed
+            max_lines (int): Number of lines kept in memory for display
+            flush_interval (float): Longest time in seconds a line waits before
+                it is shown
+            flush_lines (int): Flush immediately once this many lines are pending
+        """
+        self.flush_callback = flush_callback
+        self.flush_interval = flush_interval
+        self.flush_lines = flush_lines
+        self.log_path = None
+
+        self._lines = collections.deque(maxlen=max_lines)
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()  # keeps callbacks in order
+        self._pending = 0
+        self._timer = None
+        self._file = None
+
+    def open_file(self, log_path):
+        """
+        Start streaming every line to a file, replacing any previous log file.
+
+        Args:
+            log_path (str): Where to write the full log
+        """
+        with self._lock:
+            self.close_file()
+            log_dir = os.path.dirname(log_path)
+            if log_dir:
+                os.makedirs(log_dir, exist_ok=True)
+            self._file = open(log_path, "w", encoding="utf-8", buffering=64 * 1024)
+            self.log_path = log_path
+
+    def close_file(self):
+        """Flush and close the log file, if one is open"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def write(self, line):
+        """Add a line; safe to call from any thread"""
+        flush_now = False
+        with self._lock:
+            self._lines.append(line)
+            self._pending += 1
+            if self._file is not None:
+                self._file.write(line + "\n")
+            if self._pending >= self.flush_lines:
+                flush_now = True
+            elif self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if flush_now:
+            self.flush()
+
+    def text(self):
+        """Return the lines currently held in the buffer"""
+        with self._lock:
+            return "\n".join(self._lines)
+
+    def flush(self):
+        """Push pending lines to the callback and the log file"""
+        with self._flush_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                if self._file is not None:
+                    self._file.flush()
+                if not self._pending:
+                    return
+                self._pending = 0
+                text = "\n".join(self._lines)
+            if self.flush_callback is not None:
+                self.flush_callback(text)
+
+    def clear(self):
+        """Drop all buffered lines (the log file is left untouched)"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._lines.clear()
+            self._pending = 0
+
+    def close(self):
+        """Flush everything and close the log file"""
+        self.flush()
+        self.close_file()
+
@@ -0,0 +1,198 @@
+"""
+Parallel build queue for Lightning EXE.
+
+Runs independent BuildTargets concurrently in a process pool. Every target
+has its own PyInstaller work/spec directory and its own log file, so builds
+don't step on each other, and the queue reports aggregate throughput once
+all targets have finished.
+
+A matrix build is a queue too: expand_matrix() turns every target into
+one copy per interpreter, each with an output folder of its own.
+"""
+import concurrent.futures
+import multiprocessing
+import os
+import time
+
+from build_engine import BuildEngine, BuildResult, BuildTarget
+from build_log import BuildLog
+
+
+def default_workers():
+    """Default concurrency: half the CPUs, since PyInstaller is CPU and IO heavy"""
+    return max(1, (os.cpu_count() or 2) // 2)
+
+
+def expand_matrix(targets, interpreters):
+    """
+    One copy of every target per interpreter, built into ``<output_dir>/<interpreter tag>``.
+
+    Args:
+        targets (list): BuildTarget objects
+        interpreters (list): toolchains.Interpreter objects
+
+    Returns:
+        list: (BuildTarget, python_exe) pairs
+    """
+    tags = [interpreter.tag for interpreter in interpreters]
+    builds = []
+    for target in targets:
+        for interpreter, tag in zip(interpreters, tags):
+            if tags.count(tag) > 1:
+                # e.g. two 3.11 installations: tell them apart by the full version
+                tag = tag.replace(".".join(interpreter.version.split(".")[:2]), interpreter.version, 1)
+            copy = BuildTarget.from_dict(target.to_dict())
+            copy.output_dir = os.path.join(target.output_dir, tag)
+            builds.append((copy, interpreter.path))
+    return builds
+
+
+def build_in_worker(target, python_exe=None):
+    """
+    Build one target inside a pool worker, logging to the target's log file.
+
+    Returns:
+        BuildResult: The outcome of the build
+    """
+    log = BuildLog(flush_interval=1.0)
+    log.open_file(target.log_path)
+
+    def status(message, status_type="info"):
+        log.write(f"[{time.strftime('%H:%M:%S')}] [{status_type}] {message}")
+
+    try:
+        return BuildEngine(status_callback=status, python_exe=python_exe).build(target)
+    finally:
+        log.close()
+
+
+class QueueReport:
+    """Aggregate results and throughput of a queue run"""
+
+    def __init__(self, results, wall_time, workers):
+        self.results = results
+        self.wall_time = wall_time
+        self.workers = workers
+
+    @property
+    def succeeded(self):
+        return [r for r in self.results if r.success]
+
+    @property
+    def failed(self):
+        return [r for r in self.results if not r.success]
+
+    @property
+    def build_time(self):
+        """Sum of the individual build durations"""
+        return sum(r.duration for r in self.results)
+
+    @property
+    def throughput(self):
+        """Finished targets per minute"""
+        if not self.wall_time:
+            return 0.0
+        return len(self.results) * 60.0 / self.wall_time
+
+    @property
+    def speedup(self):
+        """How much faster the queue was than building the targets one by one"""
+        if not self.wall_time:
+            return 0.0
+        return self.build_time / self.wall_time
+
+    def summary(self):
+        """One-line description of the run"""
+        return (f"{len(self.succeeded)} succeeded, {len(self.failed)} failed in {self.wall_time:.1f}s "
+                f"with {self.workers} workers: {self.throughput:.1f} targets/min, "
+                f"{self.speedup:.2f}x vs sequential ({self.build_time:.1f}s of build time)")
+
+
+class BuildQueue:
+    """Runs many BuildTargets concurrently with a bounded process pool"""
+
+    def __init__(self, max_workers=None, python_exe=None, status_callback=None):
+        """
+        Args:
+            max_workers (int): Number of targets built at the same time
+            python_exe (str): Interpreter used to run pip and PyInstaller
+            status_callback: Called as ``status_callback(message, status_type)``
+                as targets start and finish
+        """
+        self.max_workers = max_workers or default_workers()
+        self.python_exe = python_exe
+        self.status_callback = status_callback
+        self.targets = []
+
+    def update_status(self, message, status_type="info"):
+        if self.status_callback is not None:
+            self.status_callback(message, status_type)
+        else:
+            print(f"[{status_type}] {message}", flush=True)
+
+    def add(self, target, python_exe=None):
+        """
+        Queue a target for the next run.
+
+        Args:
+            target (BuildTarget): What to build
+            python_exe (str): Interpreter for this target (default: the queue's)
+        """
+        self.targets.append((target, python_exe or self.python_exe))
+
+    def run(self):
+        """
+        Build every queued target and wait for all of them.
+
+        Returns:
+            QueueReport: Results in queue order plus throughput numbers
+        """
+        builds = list(self.targets)
+        self.targets = []
+        targets = [target for target, _ in builds]
+        if not targets:
+            return QueueReport([], 0.0, 0)
+
+        # Executables and logs are named after the target, so duplicates would collide
+        seen = set()
+        for target in targets:
+            key = (os.path.abspath(target.output_dir), target.display_name)
+            if key in seen:
+                raise Exception(f"Two targets named '{target.display_name}' write to {target.output_dir}")
+            seen.add(key)
+        # Matrix builds share a name, so they're told apart by their output folder
+        names = [t.display_name for t in targets]
+        labels = [name if names.count(name) == 1 else f"{name} ({os.path.basename(t.output_dir)})"
+                  for name, t in zip(names, targets)]
+
+        workers = min(self.max_workers, len(targets))
+        self.update_status(f"Building {len(targets)} targets with {workers} workers", "info")
+        start = time.monotonic()
+        results = [None] * len(targets)
+
+        # spawn keeps workers independent of the GUI/log threads in this process
+        context = multiprocessing.get_context("spawn")
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = {}
+            for index, (target, python_exe) in enumerate(builds):
+                futures[pool.submit(build_in_worker, target, python_exe)] = index
+
+            for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                index = futures[future]
+                target, label = targets[index], labels[index]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # The worker itself died, e.g. it was killed
+                    result = BuildResult(target, False, error=f"Build worker failed: {e}")
+                results[index] = result
+
+                if result.success:
+                    self.update_status(f"[{done}/{len(targets)}] {label} built in {result.duration:.1f}s", "success")
+                else:
+                    self.update_status(f"[{done}/{len(targets)}] {label} failed: {result.error} "
+                                       f"(log: {target.log_path})", "error")
+
+        report = QueueReport(results, time.monotonic() - start, workers)
+        self.update_status(report.summary(), "success" if not report.failed else "warning")
+        return report
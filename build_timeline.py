@@ -0,0 +1,219 @@
+"""
+Build timelines for Lightning EXE.
+
+Every build records a span for each of its phases (fetching the source,
+resolving and installing requirements, scanning imports, running
+PyInstaller and so on). PyInstaller's own phases (Analysis, PYZ, PKG, EXE,
+COLLECT and the steps inside Analysis) are recovered from its log output.
+Timelines can be saved as plain JSON or in the Chrome trace event format,
+which chrome://tracing and https://ui.perfetto.dev display as a flame chart.
+"""
+import contextlib
+import json
+import os
+import re
+import threading
+import time
+
+# PyInstaller log lines start with the milliseconds since it started
+_LOG_LINE = re.compile(r"^(\d+) (?:DEBUG|INFO|WARNING|ERROR|CRITICAL): (.*)$")
+_TARGET_PHASE = re.compile(r"^checking (Analysis|PYZ|PKG|EXE|COLLECT|BUNDLE|MERGE|Splash)\b")
+_REBUILD = re.compile(r"^Building (?:(\w+) )?because (.*)$")
+
+# Steps inside Analysis, keyed by the message that starts them
+ANALYSIS_STEPS = [
+    (re.compile(r"^Initializing module dependency graph"), "module graph setup"),
+    (re.compile(r"^Analyzing modules for base_library\.zip"), "base library"),
+    (re.compile(r"^Caching module dependency graph"), "cache module graph"),
+    (re.compile(r"^Analyzing .+\.pyw?$"), "entry script graph"),
+    (re.compile(r"^Processing module hooks \(post-graph stage\)"), "post-graph hooks"),
+    (re.compile(r"^Performing binary vs\. data reclassification"), "reclassify binaries"),
+    (re.compile(r"^Looking for ctypes DLLs"), "ctypes libraries"),
+    (re.compile(r"^Analyzing run-time hooks"), "runtime hooks"),
+    (re.compile(r"^Creating base_library\.zip"), "base_library.zip"),
+    (re.compile(r"^Looking for dynamic libraries"), "dynamic libraries"),
+    (re.compile(r"^Warnings written to"), "reports"),
+]
+
+
+class Span:
+    """A named interval of a build"""
+
+    def __init__(self, name, category, start, end=None, args=None, depth=0):
+        self.name = name
+        self.category = category
+        self.start = start  # seconds since the timeline started
+        self.end = end
+        self.args = args or {}
+        self.depth = depth
+
+    @property
+    def duration(self):
+        return (self.end if self.end is not None else self.start) - self.start
+
+    def to_dict(self):
+        return {"name": self.name, "category": self.category, "start": round(self.start, 6),
+                "end": round(self.end, 6) if self.end is not None else None,
+                "duration": round(self.duration, 6), "depth": self.depth, "args": self.args}
+
+
+class BuildTimeline:
+    """Spans of one build, in the order they started"""
+
+    def __init__(self, name="build"):
+        self.name = name
+        self.origin = time.perf_counter()
+        self.started_at = time.time()
+        self.spans = []
+        self._open = []
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Timelines travel back from build queue workers with their BuildResult
+        state = dict(self.__dict__)
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def now(self):
+        """Seconds since the timeline started"""
+        return time.perf_counter() - self.origin
+
+    def begin(self, name, category="build", **args):
+        with self._lock:
+            span = Span(name, category, self.now(), args=args, depth=len(self._open))
+            self.spans.append(span)
+            self._open.append(span)
+            return span
+
+    def end(self, span, **args):
+        with self._lock:
+            span.end = self.now()
+            span.args.update(args)
+            if span in self._open:
+                self._open.remove(span)
+
+    @contextlib.contextmanager
+    def span(self, name, category="build", **args):
+        """Record the enclosed block as a span; it's marked failed if it raises"""
+        span = self.begin(name, category, **args)
+        try:
+            yield span
+        except BaseException as e:
+            span.args["error"] = str(e)
+            raise
+        finally:
+            self.end(span)
+
+    def add(self, name, start, end, category="build", depth=0, **args):
+        """Record a span whose times are already known"""
+        with self._lock:
+            span = Span(name, category, start, end, args, depth)
+            self.spans.append(span)
+            return span
+
+    def close(self):
+        """End any spans still open, e.g. after a failure"""
+        for span in list(self._open):
+            self.end(span, unfinished=True)
+
+    @property
+    def duration(self):
+        ends = [s.end for s in self.spans if s.end is not None]
+        return max(ends) if ends else 0.0
+
+    def summary(self, limit=6):
+        """The longest build and PyInstaller phases as one line"""
+        phases = [s for s in self.spans if s.depth > 0 and s.end is not None and s.category != "step"]
+        phases.sort(key=lambda s: s.duration, reverse=True)
+        return "Timeline: " + ", ".join(f"{s.name} {s.duration:.1f}s" for s in phases[:limit])
+
+    def to_dict(self):
+        return {"name": self.name, "started_at": self.started_at, "duration": round(self.duration, 6),
+                "spans": [s.to_dict() for s in self.spans]}
+
+    def to_chrome_trace(self):
+        """Chrome trace event format: complete ("X") events in microseconds"""
+        events = [{"name": "process_name", "ph": "M", "pid": 1, "tid": 1, "args": {"name": self.name}}]
+        for span in self.spans:
+            end = span.end if span.end is not None else self.duration
+            events.append({"name": span.name, "cat": span.category, "ph": "X", "pid": 1, "tid": 1,
+                           "ts": round(span.start * 1e6), "dur": round((end - span.start) * 1e6),
+                           "args": span.args})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save(self, path):
+        """Write the timeline as JSON"""
+        _write_json(path, self.to_dict())
+
+    def save_chrome_trace(self, path):
+        """Write the timeline in Chrome trace format"""
+        _write_json(path, self.to_chrome_trace())
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1)
+
+
+class PyInstallerPhaseParser:
+    """Turns PyInstaller's log lines into spans on a BuildTimeline"""
+
+    def __init__(self, timeline, depth=1):
+        self.timeline = timeline
+        self.depth = depth
+        self._offset = None  # timeline time at which PyInstaller's clock read 0
+        self._phase = None
+        self._step = None
+
+    def _close_step(self, at):
+        if self._step is not None:
+            self._step.end = at
+            self._step = None
+
+    def _close_phase(self, at):
+        self._close_step(at)
+        if self._phase is not None:
+            self._phase.end = at
+            self._phase = None
+
+    def feed(self, line):
+        """Process one line of PyInstaller output"""
+        match = _LOG_LINE.match(line.strip())
+        if not match:
+            return
+        ms, message = int(match.group(1)), match.group(2)
+        if self._offset is None:
+            self._offset = self.timeline.now() - ms / 1000.0
+            self._phase = self.timeline.add("startup", self._offset, None, "pyinstaller", self.depth)
+        at = self._offset + ms / 1000.0
+
+        phase = _TARGET_PHASE.match(message)
+        if phase:
+            self._close_phase(at)
+            self._phase = self.timeline.add(phase.group(1), at, None, "pyinstaller", self.depth, rebuilt=False)
+            return
+
+        rebuild = _REBUILD.match(message)
+        if rebuild and self._phase is not None and rebuild.group(1) in (None, self._phase.name):
+            self._phase.args.update(rebuilt=True, reason=rebuild.group(2))
+            return
+
+        if message.startswith("Build complete!"):
+            self._close_phase(at)
+            return
+
+        if self._phase is not None and self._phase.name == "Analysis":
+            for pattern, name in ANALYSIS_STEPS:
+                if pattern.match(message):
+                    self._close_step(at)
+                    self._step = self.timeline.add(name, at, None, "step", self.depth + 1)
+                    break
+
+    def finish(self):
+        """Close whatever phase was running when the output ended"""
+        self._close_phase(self.timeline.now())
@@ -0,0 +1,113 @@
+"""
+Bytecode profiles for Lightning EXE.
+
+The "default" profile bundles modules compiled the way the build
+interpreter runs them. The "release" profile compiles every bundled module
+with ``--optimize 2`` and runs the executable with matching ``-OO``
+flags: asserts and docstrings are gone, which makes the archive smaller
+and the modules quicker to unmarshal. Code that reads docstrings at
+runtime breaks or loses its help text without them, so when the project
+or one of the packages it imports does, the profile falls back to
+``--optimize 1`` and keeps the docstrings.
+
+The PYZ archive only ever holds bytecode. Source files end up in the
+bundle as data when a PyInstaller hook asks for them (torch's JIT, for
+example, needs its sources), so they are listed in the comparison report
+rather than removed.
+"""
+import json
+import os
+
+import process_runner
+
+PROFILES = ["default", "release"]
+
+# Packages that need docstrings at runtime, and what they do with them
+DOCSTRING_PACKAGES = {
+    "ply": "builds its grammar from docstrings",
+    "docopt": "parses the usage text from __doc__",
+    "click": "shows docstrings as command help",
+    "typer": "shows docstrings as command help",
+    "fire": "shows docstrings as command help",
+    "invoke": "shows docstrings as task help",
+    "plac": "shows docstrings as command help",
+}
+
+# Runs inside the build interpreter: .py files inside a one-file executable
+_LIST_ARCHIVE_SOURCES = r"""
+import json, sys
+from PyInstaller.archive.readers import CArchiveReader
+toc = CArchiveReader(sys.argv[1]).toc
+print(json.dumps([[name, entry[2]] for name, entry in toc.items() if name.endswith(".py")]))
+"""
+
+
+class BytecodeProfile:
+    """How bundled modules are compiled"""
+
+    def __init__(self, name, optimize=None, reasons=None):
+        self.name = name
+        self.optimize = optimize  # bytecode optimization level, None for PyInstaller's default
+        self.reasons = reasons or []  # why docstrings were kept
+
+    @property
+    def options(self):
+        if self.optimize is None:
+            return []
+        return ["--optimize", str(self.optimize)]
+
+    def describe(self):
+        if self.optimize is None:
+            return f"{self.name} bytecode profile"
+        stripped = "asserts and docstrings" if self.optimize == 2 else "asserts"
+        return f"{self.name} bytecode profile (optimization level {self.optimize}, {stripped} stripped)"
+
+
+def choose_profile(name, plan=None):
+    """
+    Work out the optimization level for a profile.
+
+    Args:
+        name (str): One of PROFILES
+        plan (ImportPlan): The project's imports, to find code that reads docstrings
+
+    Returns:
+        BytecodeProfile: The profile to build with
+    """
+    if name != "release":
+        return BytecodeProfile(name)
+
+    reasons = []
+    if plan is not None:
+        top_levels = {module.split(".")[0] for module in plan.imports}
+        reasons.extend(f"{package} {why}" for package, why in sorted(DOCSTRING_PACKAGES.items())
+                       if package in top_levels)
+        reasons.extend(f"{module} reads __doc__" for module in plan.docstring_modules)
+    return BytecodeProfile(name, 1 if reasons else 2, reasons)
+
+
+def bundled_sources(artifact, python_exe, cancel=None):
+    """
+    List the Python source files shipped inside a build.
+
+    Args:
+        artifact (str): One-file executable or one-folder build
+        python_exe (str): Build interpreter, used to read one-file archives
+        cancel (CancelToken): Stops reading the archive when the build is cancelled
+
+    Returns:
+        list: (path inside the bundle, size in bytes) pairs
+    """
+    if os.path.isdir(artifact):
+        sources = []
+        for root, _, files in os.walk(artifact):
+            for name in files:
+                if name.endswith(".py"):
+                    path = os.path.join(root, name)
+                    sources.append((os.path.relpath(path, artifact).replace(os.sep, "/"), os.path.getsize(path)))
+        return sorted(sources)
+
+    result = process_runner.run([python_exe, "-c", _LIST_ARCHIVE_SOURCES, artifact], cancel=cancel, merge_stderr=False)
+    if result.returncode != 0:
+        return []
+    return sorted((name, size) for name, size in json.loads(result.stdout))
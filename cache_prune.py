@@ -0,0 +1,245 @@
+"""
+Eviction for Lightning EXE's on-disk caches.
+
+Every cache keeps what it stores until it is pruned. Entries record when
+they were last used (builds touch a file of the entry when they reuse it),
+and pruning removes the entries nobody used for a while, then the least
+recently used ones until the cache fits a size limit:
+
+* ``artifacts``: finished builds, plus the stored files no build lists any more
+* ``wheelhouse``: resolved wheel sets, plus the wheels no set lists any more
+* ``envs``: build virtualenvs
+* ``workpaths``: PyInstaller's work and spec folders
+* ``staging``: project mirrors
+
+Entries used in the last hour and entries a running build holds the lock of
+are left alone, so pruning is safe while builds run. The artifact cache
+prunes itself to ``LIGHTNING_EXE_ARTIFACT_CACHE_GB`` after every store.
+"""
+import contextlib
+import glob
+import json
+import os
+import shutil
+import time
+
+import analysis_cache
+import build_env
+import wheelhouse
+from cache_utils import file_lock, get_cache_dir
+
+CACHES = ("artifacts", "wheelhouse", "envs", "workpaths", "staging")
+MIN_AGE = 3600  # seconds; a build may still be using anything younger
+DEFAULT_ARTIFACT_CACHE_GB = 10.0
+
+
+class PruneResult:
+    """What pruning one cache removed"""
+
+    def __init__(self, cache, entries, removed, size, freed):
+        self.cache = cache
+        self.entries = entries  # entries before pruning
+        self.removed = removed  # entries removed
+        self.size = size  # bytes before pruning
+        self.freed = freed  # bytes removed
+
+
+class _Entry:
+    """One evictable unit of a cache"""
+
+    def __init__(self, paths, last_used, locks=(), size=0, blobs=()):
+        self.paths = paths  # files and folders removed together
+        self.last_used = last_used
+        self.locks = locks  # lock files a build holds while using the entry
+        self.size = size  # bytes of its own, not counting shared blobs
+        self.blobs = set(blobs)  # digests of the shared blobs it uses
+
+
+def artifact_cache_limit():
+    """Size the local artifact cache is pruned to after every store, in bytes"""
+    try:
+        gb = float(os.environ.get("LIGHTNING_EXE_ARTIFACT_CACHE_GB", DEFAULT_ARTIFACT_CACHE_GB))
+    except ValueError:
+        gb = DEFAULT_ARTIFACT_CACHE_GB
+    return int(gb * 1024 ** 3)
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return 0
+
+
+def _tree_size(path):
+    """Bytes of the files below a folder, counting hard-linked files once"""
+    seen = set()
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            try:
+                st = os.lstat(os.path.join(root, name))
+            except OSError:
+                continue
+            if (st.st_dev, st.st_ino) not in seen:
+                seen.add((st.st_dev, st.st_ino))
+                total += st.st_size
+    return total
+
+
+def _blob_files(folder):
+    """{digest: path} of a content-addressed store laid out as <digest[:2]>/<digest>"""
+    return {os.path.basename(path): path for path in glob.glob(os.path.join(folder, "??", "?" * 64))}
+
+
+def _folder_entries(folder, last_used_file):
+    """One entry per sub-folder, with the lock file next to it"""
+    entries = []
+    for path in glob.glob(os.path.join(folder, "*", "")):
+        path = path.rstrip(os.sep)
+        if path.endswith((".partial", ".restoring")):
+            continue
+        entries.append(_Entry([path], max(_mtime(path), _mtime(os.path.join(path, last_used_file))),
+                              [path + ".lock"], _tree_size(path)))
+    return entries
+
+
+def _artifact_entries(root):
+    entries = []
+    for path in glob.glob(os.path.join(root, "ac", "*.json")):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            blobs = {item["sha256"] for item in manifest["files"] if "sha256" in item}
+        except (OSError, ValueError, KeyError, TypeError):
+            blobs = set()
+        # The manifest is rewritten on every store and touched on every restore
+        entries.append(_Entry([path], _mtime(path), blobs=blobs))
+    return entries, _blob_files(os.path.join(root, "cas"))
+
+
+def _wheelhouse_entries(root):
+    entries = []
+    for path in glob.glob(os.path.join(root, "sets", "*", "")):
+        path = path.rstrip(os.sep)
+        if path.endswith(".partial"):
+            continue
+        manifest = os.path.join(path, wheelhouse.MANIFEST)
+        try:
+            with open(manifest, "r", encoding="utf-8") as f:
+                blobs = {wheel["sha256"] for wheel in json.load(f)["wheels"]}
+        except (OSError, ValueError, KeyError, TypeError):
+            blobs = set()
+        # The set's files are links to the blobs, so the set itself costs nothing
+        entries.append(_Entry([path], max(_mtime(path), _mtime(manifest)), [path + ".lock"], blobs=blobs))
+    return entries, _blob_files(os.path.join(root, "blobs"))
+
+
+def _staging_entries(root):
+    entries = []
+    for base in glob.glob(os.path.join(root, "*", "")):
+        base = base.rstrip(os.sep)
+        last_used = max([_mtime(base)] + [_mtime(p) for p in glob.glob(os.path.join(base, "*", "state.json"))])
+        entries.append(_Entry([base], last_used, glob.glob(os.path.join(base, "*.lock")), _tree_size(base)))
+    return entries
+
+
+def _find_entries(cache, root):
+    """(entries, {digest: blob path} or None) of a cache"""
+    if cache == "artifacts":
+        return _artifact_entries(root)
+    if cache == "wheelhouse":
+        return _wheelhouse_entries(root)
+    if cache == "envs":
+        return _folder_entries(root, build_env.READY_MARKER), None
+    if cache == "workpaths":
+        return _folder_entries(root, analysis_cache.INFO_FILE), None
+    if cache == "staging":
+        return _staging_entries(root), None
+    raise Exception(f"Unknown cache '{cache}' (expected one of {', '.join(CACHES)})")
+
+
+def _remove_entry(entry):
+    """Delete an entry unless a build holds one of its locks; False if it's in use"""
+    with contextlib.ExitStack() as stack:
+        try:
+            for lock in entry.locks:
+                if os.path.exists(lock):
+                    stack.enter_context(file_lock(lock, timeout=0))
+        except TimeoutError:
+            return False
+        for path in entry.paths:
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path, ignore_errors=True)
+            elif os.path.lexists(path):
+                os.remove(path)
+    return True
+
+
+def prune(cache, older_than=None, max_bytes=None, root=None, dry_run=False):
+    """
+    Remove unused entries from one cache.
+
+    Args:
+        cache (str): One of CACHES
+        older_than (float): Remove entries not used for this many seconds
+        max_bytes (int): Then remove the least recently used entries until the cache fits
+        root (str): Folder of the cache (default: its folder in the Lightning EXE cache);
+            for ``artifacts`` this may also be a shared cache folder
+        dry_run (bool): Only report what would be removed
+
+    Returns:
+        PruneResult: What was (or would be) removed
+    """
+    root = root or get_cache_dir(cache)
+    with file_lock(os.path.join(root, "prune.lock")):
+        entries, blobs = _find_entries(cache, root)
+        blob_sizes = {digest: os.path.getsize(path) for digest, path in (blobs or {}).items()}
+        users = {}
+        for entry in entries:
+            for digest in entry.blobs:
+                users[digest] = users.get(digest, 0) + 1
+        size = sum(entry.size for entry in entries) + sum(blob_sizes.values())
+
+        now = time.time()
+        total = size
+        removed = 0
+        for entry in sorted(entries, key=lambda e: e.last_used):
+            age = now - entry.last_used
+            if age < MIN_AGE:
+                break
+            if not (older_than is not None and age > older_than) and not (max_bytes is not None and total > max_bytes):
+                break
+            if not dry_run and not _remove_entry(entry):
+                continue
+            removed += 1
+            total -= entry.size
+            for digest in entry.blobs:
+                users[digest] -= 1
+                if users[digest] == 0:
+                    total -= blob_sizes.get(digest, 0)
+
+        # Blobs no remaining entry lists; young ones may belong to a store in progress
+        for digest, path in (blobs or {}).items():
+            if users.get(digest, 0) == 0 and now - _mtime(path) >= MIN_AGE:
+                if users.get(digest) is None:
+                    total -= blob_sizes[digest]  # wasn't listed by anything to begin with
+                if not dry_run:
+                    with contextlib.suppress(OSError):
+                        os.remove(path)
+        if cache == "wheelhouse" and not dry_run:
+            _drop_dangling_sources(root)
+    return PruneResult(cache, len(entries), removed, size, size - total)
+
+
+def _drop_dangling_sources(root):
+    """Forget which wheel a source built into once that wheel is gone"""
+    for path in glob.glob(os.path.join(root, "sources", "*.json")):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                digest = json.load(f)["sha256"]
+        except (OSError, ValueError, KeyError, TypeError):
+            continue
+        if not os.path.exists(os.path.join(root, "blobs", digest[:2], digest)):
+            with contextlib.suppress(OSError):
+                os.remove(path)
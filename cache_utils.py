@@ -0,0 +1,98 @@
+"""
+Shared helpers for Lightning EXE's on-disk caches.
+"""
+import contextlib
+import hashlib
+import os
+import sys
+import time
+
+
+def get_cache_dir(*parts):
+    """
+    Return (and create) a directory inside the Lightning EXE cache.
+
+    The cache root is ``LIGHTNING_EXE_CACHE`` when set, otherwise the
+    platform's usual per-user cache location.
+
+    Args:
+        *parts: Sub-directory names below the cache root
+
+    Returns:
+        str: Absolute path of the directory
+    """
+    root = os.environ.get("LIGHTNING_EXE_CACHE")
+    if not root:
+        if sys.platform == "win32":
+            base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~\\AppData\\Local")
+            root = os.path.join(base, "lightning-exe", "cache")
+        elif sys.platform == "darwin":
+            root = os.path.expanduser("~/Library/Caches/lightning-exe")
+        else:
+            base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+            root = os.path.join(base, "lightning-exe")
+    path = os.path.abspath(os.path.join(root, *parts))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def hash_strings(*values):
+    """Return a sha256 hex digest over a sequence of strings"""
+    digest = hashlib.sha256()
+    for value in values:
+        digest.update(str(value).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """Return the sha256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@contextlib.contextmanager
+def file_lock(lock_path, timeout=None):
+    """
+    Hold an exclusive lock on ``lock_path`` across processes.
+
+    Args:
+        lock_path (str): Lock file to create/lock
+        timeout (float): Give up after this many seconds (wait forever if None)
+
+    Raises:
+        TimeoutError: If the lock couldn't be taken in time
+    """
+    lock_dir = os.path.dirname(lock_path)
+    if lock_dir:
+        os.makedirs(lock_dir, exist_ok=True)
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    with open(lock_path, "a+") as f:
+        while True:
+            try:
+                if sys.platform == "win32":
+                    import msvcrt
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                else:
+                    import fcntl
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except OSError:
+                if deadline is not None and time.monotonic() > deadline:
+                    raise TimeoutError(f"Timed out waiting for lock: {lock_path}")
+                time.sleep(0.1)
+        try:
+            yield
+        finally:
+            if sys.platform == "win32":
+                import msvcrt
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,442 @@
+"""
+Command-line entry point for Lightning EXE.
+
+Builds executables without starting the Flet GUI:
+
+    python cli.py build lightning.toml
+    python cli.py build --source app.py --output-dir dist
+"""
+import argparse
+import os
+import sys
+
+import artifact_cache
+import build_daemon
+import cache_prune
+import toolchains
+import wheelhouse
+from build_engine import BuildEngine, BuildTarget, load_manifest
+from build_env import BUILD_TOOLS, build_tools_key, environment_key, requirement_args
+from build_queue import BuildQueue, expand_matrix
+from requirements_resolver import resolve_dependencies
+
+
+def build_parser():
+    """Create the argument parser for the ``lightning-exe`` command"""
+    parser = argparse.ArgumentParser(
+        prog="lightning-exe",
+        description="Convert Python projects to executable files"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Build one or more executables")
+    build.add_argument("manifest", nargs="?",
+                       help="JSON or TOML manifest listing the targets to build")
+    build.add_argument("--target", action="append", dest="only", metavar="NAME",
+                       help="Only build the named manifest target (repeatable)")
+    build.add_argument("--stop-on-error", action="store_true",
+                       help="Stop after the first failed target (sequential builds only)")
+    build.add_argument("-j", "--jobs", type=int,
+                       help="Number of targets to build in parallel (default: 1, or all of them with --matrix)")
+    build.add_argument("--python", dest="python_exe",
+                       help="Interpreter used to run pip and PyInstaller")
+    build.add_argument("--matrix", metavar="PYTHONS",
+                       help="Build every target with each of these interpreters, e.g. '3.10,3.12,/opt/py/bin/python'; "
+                            "each gets an output subfolder such as py3.12-linux-x86_64")
+    build.add_argument("--remote-cache", metavar="URL_OR_DIR",
+                       help="Shared artifact cache to restore builds from and store them in "
+                            "(default: $LIGHTNING_EXE_REMOTE_CACHE)")
+    build.add_argument("--watch", action="store_true",
+                       help="Keep running and rebuild a folder project whenever its files change (Ctrl+C stops)")
+    build.add_argument("--debounce", type=float, default=0.5, metavar="SECONDS",
+                       help="With --watch, how long the folder must stay quiet before rebuilding (default: 0.5)")
+    build.add_argument("--daemon", action="store_true",
+                       help="Submit the builds to the running build daemon (see 'lightning-exe daemon')")
+
+    single = build.add_argument_group("single target (used when no manifest is given)")
+    single.add_argument("--source", dest="source_path",
+                        help="Python file, project folder or GitHub URL")
+    single.add_argument("--input-type", choices=["file", "folder", "github"],
+                        help="Kind of source (guessed from --source when omitted)")
+    single.add_argument("--main-file", default="",
+                        help="Entry script inside a folder or repository")
+    single.add_argument("--entry-point", dest="entry_points", action="append", default=[], metavar="SCRIPT",
+                        help="Another script next to the main one, built into the same folder as an executable "
+                             "of its own from one shared analysis (repeatable; needs --onedir)")
+    single.add_argument("--ref", help="Branch, tag or commit to build (GitHub sources)")
+    single.add_argument("--archive", action="store_true",
+                        help="Download a snapshot archive of the repository instead of using git")
+    single.add_argument("--archive-sha256", help="Expected sha256 of the downloaded archive")
+    single.add_argument("--output-dir", help="Where to write the executable")
+    single.add_argument("--name", help="Name of the executable")
+    single.add_argument("--onedir", action="store_true",
+                        help="Build a folder instead of a single file")
+    single.add_argument("--windowed", action="store_true",
+                        help="Don't show a console window")
+    single.add_argument("--no-isolated-env", dest="isolated_env", action="store_false",
+                        help="Install requirements into the build interpreter instead of a cached virtualenv")
+    single.add_argument("--bytecode-profile", choices=["default", "release"], default="default",
+                        help="'release' compiles bundled modules with asserts and docstrings stripped "
+                             "and reports the difference against the default profile")
+    single.add_argument("--compression", choices=["default", "none", "pyz", "upx"], default="default",
+                        help="What to compress: PyInstaller's defaults, nothing, only Python modules, "
+                             "or everything plus UPX")
+    single.add_argument("--compare-compression", action="store_true",
+                        help="Also build and benchmark every compression strategy and save <name>-compression.json")
+    single.add_argument("--fast-start", action="store_true",
+                        help="Unpack the single-file executable once into a per-user cache and reuse it on later launches")
+    single.add_argument("--benchmark", dest="benchmark_runs", type=int, default=0, metavar="N",
+                        help="Run the executable N times after building and save a startup report")
+    single.add_argument("--profile-imports", action="store_true",
+                        help="Add an import-time breakdown to the startup report (builds a second, profiling executable)")
+    single.add_argument("--trace", action="store_true",
+                        help="Save the build timeline as <name>-timeline.json and a Chrome trace <name>-trace.json")
+    single.add_argument("--force", action="store_true",
+                        help="Rebuild even if nothing changed since the last build")
+    single.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Environment variable baked into the executable (repeatable)")
+    single.add_argument("--cmd-args", default="",
+                        help="Arguments passed to the application at startup")
+    single.add_argument("--extra-packages", default="",
+                        help="Additional packages to include (comma-separated)")
+    single.add_argument("--drop-unused-requirements", action="store_true",
+                        help="Leave out requirements the project's code never imports")
+
+    prefetch = subparsers.add_parser(
+        "prefetch",
+        help="Fill the local wheelhouse for requirements files (e.g. before going offline)"
+    )
+    prefetch.add_argument("requirements", nargs="+", help="requirements.txt files of one project")
+    prefetch.add_argument("--python", dest="python_exe", default=sys.executable,
+                          help="Interpreter the builds will use")
+    prefetch.add_argument("-j", "--jobs", type=int, default=8,
+                          help="Number of wheels downloaded or built in parallel (default: 8)")
+
+    server = subparsers.add_parser(
+        "cache-server",
+        help="Serve a folder as a shared artifact cache over HTTP"
+    )
+    server.add_argument("--root", required=True, help="Folder holding the cached builds")
+    server.add_argument("--host", default="127.0.0.1",
+                        help="Address to listen on (default: 127.0.0.1; 0.0.0.0 shares it on the network)")
+    server.add_argument("--port", type=int, default=8765, help="Port to listen on (default: 8765)")
+    server.add_argument("--token-file", metavar="FILE",
+                        help="File holding the shared token clients must send (default: $LIGHTNING_EXE_CACHE_TOKEN); "
+                             "clients read it from $LIGHTNING_EXE_CACHE_TOKEN")
+    server.add_argument("--read-only", action="store_true",
+                        help="Serve builds without accepting uploads")
+    server.add_argument("--max-size", type=float, metavar="GB",
+                        help="Drop the least recently used builds once the folder grows beyond this size")
+
+    cache = subparsers.add_parser("cache", help="Manage the local caches")
+    cache_commands = cache.add_subparsers(dest="cache_command", required=True)
+    prune = cache_commands.add_parser(
+        "prune",
+        help="Remove cached builds, wheels, build environments, PyInstaller work folders and staging mirrors "
+             "that haven't been used lately"
+    )
+    prune.add_argument("--older-than", type=float, default=30, metavar="DAYS",
+                       help="Remove entries not used for this many days (default: 30)")
+    prune.add_argument("--max-size", type=float, metavar="GB",
+                       help="Then remove the least recently used entries until each cache fits this size")
+    prune.add_argument("--only", action="append", choices=cache_prune.CACHES, metavar="CACHE",
+                       help=f"Only prune this cache (repeatable; one of {', '.join(cache_prune.CACHES)})")
+    prune.add_argument("--dry-run", action="store_true", help="Only report what would be removed")
+
+    interpreters = subparsers.add_parser(
+        "toolchains",
+        help="List the Python interpreters found on this machine"
+    )
+    interpreters.add_argument("--refresh", action="store_true",
+                              help="Probe every interpreter again instead of using the registry")
+
+    daemon = subparsers.add_parser(
+        "daemon",
+        help="Run a build daemon that keeps PyInstaller warm for 'build --daemon' and the GUI"
+    )
+    daemon.add_argument("--port", type=int, default=0,
+                        help="Port on 127.0.0.1 to listen on (default: any free port)")
+    daemon.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Number of builds run at the same time (default: 1)")
+    daemon.add_argument("--python", dest="python_exe",
+                        help="Default interpreter used to run pip and PyInstaller")
+    daemon.add_argument("--stop", action="store_true", help="Stop the running daemon instead")
+    return parser
+
+
+def run_prefetch(args):
+    """Handle ``lightning-exe prefetch``"""
+    try:
+        deps = resolve_dependencies(args.requirements, args.python_exe)
+        report = lambda message, status_type="info": print(f"[{status_type}] {message}")
+        # Isolated builds install the build tools alone first, then the requirements together with
+        # them; --no-isolated-env builds install the requirements alone. Each set resolves
+        # separately, so an offline build needs all of them
+        wheel_sets = [wheelhouse.prefetch(build_tools_key(deps), args.python_exe, list(BUILD_TOOLS), report,
+                                          max_workers=args.jobs)]
+        for build_tools in (True, False):
+            wheel_sets.append(wheelhouse.prefetch(
+                environment_key(deps, build_tools), args.python_exe,
+                requirement_args(args.requirements, build_tools), report, max_workers=args.jobs))
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    for wheel_set, mode in zip(wheel_sets, ("the build tools", "isolated builds", "--no-isolated-env builds")):
+        print(f"{len(wheel_set.pins)} wheels ready for {mode} in {wheel_set.path}")
+    return 0
+
+
+def target_from_args(args, parser):
+    """Build a single BuildTarget from the command-line flags"""
+    if not args.source_path or not args.output_dir:
+        parser.error("either a manifest or --source and --output-dir are required")
+
+    input_type = args.input_type
+    if input_type is None:
+        if args.source_path.startswith(("http://", "https://", "git@", "file://")):
+            input_type = "github"
+        elif args.source_path.endswith(".py"):
+            input_type = "file"
+        else:
+            input_type = "folder"
+
+    env_vars = []
+    for pair in args.env:
+        key, sep, value = pair.partition("=")
+        if not sep or not key:
+            parser.error(f"--env expects KEY=VALUE, got '{pair}'")
+        env_vars.append((key, value))
+
+    return BuildTarget(
+        source_path=args.source_path,
+        output_dir=args.output_dir,
+        input_type=input_type,
+        main_file=args.main_file,
+        name=args.name,
+        onefile=not args.onedir,
+        console=not args.windowed,
+        env_vars=env_vars,
+        cmd_args=args.cmd_args,
+        extra_packages=args.extra_packages,
+        isolated_env=args.isolated_env,
+        ref=args.ref,
+        fetch_mode="archive" if args.archive else "git",
+        archive_sha256=args.archive_sha256,
+        benchmark_runs=args.benchmark_runs,
+        profile_imports=args.profile_imports,
+        trace=args.trace,
+        fast_start=args.fast_start,
+        bytecode_profile=args.bytecode_profile,
+        compression=args.compression,
+        compare_compression=args.compare_compression,
+        force=args.force,
+        entry_points=", ".join(args.entry_points),
+        drop_unused_requirements=args.drop_unused_requirements,
+    )
+
+
+def run_cache_server(args):
+    """Handle ``lightning-exe cache-server``"""
+    token = os.environ.get("LIGHTNING_EXE_CACHE_TOKEN")
+    try:
+        if args.token_file:
+            with open(args.token_file, "r", encoding="utf-8") as f:
+                token = f.read().strip()
+            if not token:
+                raise Exception(f"{args.token_file} is empty")
+        max_bytes = int(args.max_size * 1024 ** 3) if args.max_size is not None else None
+        artifact_cache.serve(args.root, args.host, args.port, token, args.read_only, max_bytes)
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    return 0
+
+
+def run_cache(args):
+    """Handle ``lightning-exe cache prune``"""
+    max_bytes = int(args.max_size * 1024 ** 3) if args.max_size is not None else None
+    verb = "Would free" if args.dry_run else "Freed"
+    total = 0
+    for cache in args.only or cache_prune.CACHES:
+        try:
+            result = cache_prune.prune(cache, args.older_than * 86400, max_bytes, dry_run=args.dry_run)
+        except Exception as e:
+            print(f"Error: could not prune {cache}: {e}", file=sys.stderr)
+            return 1
+        total += result.freed
+        print(f"{cache:<11} {result.removed} of {result.entries} entries, "
+              f"{verb.lower()} {result.freed / 1e6:.1f} of {result.size / 1e6:.1f} MB")
+    print(f"{verb} {total / 1e6:.1f} MB")
+    return 0
+
+
+def run_daemon(args):
+    """Handle ``lightning-exe daemon``"""
+    client = build_daemon.DaemonClient.find()
+    if args.stop:
+        if client is None:
+            print("No build daemon is running")
+            return 1
+        client.shutdown()
+        print("Build daemon stopped")
+        return 0
+    if client is not None:
+        print(f"Error: a build daemon is already running at {client.url}", file=sys.stderr)
+        return 2
+    try:
+        build_daemon.serve(args.port, max(1, args.jobs), args.python_exe)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def run_toolchains(args):
+    """Handle ``lightning-exe toolchains``"""
+    if args.refresh:
+        toolchains.forget()
+    for interpreter in toolchains.discover():
+        print(f"  {interpreter.tag:<24} {interpreter.describe()}")
+    return 0
+
+
+def build_with_daemon(builds, args):
+    """Submit every (target, interpreter) to the running daemon, then relay their output in order"""
+    client = build_daemon.DaemonClient.find()
+    if client is None:
+        print("Error: no build daemon is running; start one with 'python cli.py daemon'", file=sys.stderr)
+        return None
+    jobs = [(client.submit(target, python_exe, args.remote_cache), target) for target, python_exe in builds]
+    results = []
+    try:
+        for job_id, target in jobs:
+            result = client.follow(job_id, target)
+            results.append(result)
+            if not result.success and args.stop_on_error:
+                break
+    except KeyboardInterrupt:
+        for job_id, _ in jobs[len(results):]:
+            client.cancel(job_id)
+        print("\nCancelled the remaining builds")
+    if len(results) < len(jobs) and args.stop_on_error:
+        for job_id, _ in jobs[len(results):]:
+            client.cancel(job_id)
+    return results
+
+
+def run_build(args, parser):
+    """Handle ``lightning-exe build``"""
+    if args.remote_cache:
+        # Through the environment, so parallel build workers use it too
+        os.environ["LIGHTNING_EXE_REMOTE_CACHE"] = args.remote_cache
+    if args.manifest:
+        try:
+            targets = load_manifest(args.manifest)
+        except Exception as e:
+            print(f"Error: could not load manifest: {e}", file=sys.stderr)
+            return 2
+        if args.only:
+            targets = [t for t in targets if t.display_name in args.only]
+            if not targets:
+                print(f"Error: no targets named {', '.join(args.only)} in manifest", file=sys.stderr)
+                return 2
+    else:
+        targets = [target_from_args(args, parser)]
+
+    if args.matrix:
+        if args.python_exe or args.watch:
+            print("Error: --matrix picks the interpreters itself and can't be combined with --python or --watch",
+                  file=sys.stderr)
+            return 2
+        try:
+            interpreters = [toolchains.find_interpreter(spec.strip()) for spec in args.matrix.split(",") if spec.strip()]
+        except Exception as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+        for interpreter in interpreters:
+            print(f"Matrix: {interpreter.describe()}")
+        builds = expand_matrix(targets, interpreters)
+    else:
+        builds = [(target, args.python_exe) for target in targets]
+    jobs = args.jobs or (len(builds) if args.matrix else 1)
+
+    if args.watch:
+        if args.daemon:
+            print("Error: --watch runs in this process and can't be combined with --daemon", file=sys.stderr)
+            return 2
+        if len(targets) != 1:
+            print("Error: --watch builds exactly one target", file=sys.stderr)
+            return 2
+        engine = BuildEngine(python_exe=args.python_exe)
+        try:
+            engine.watch(targets[0], debounce=args.debounce)
+        except KeyboardInterrupt:
+            print("\nStopped watching")
+        except Exception as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+        return 0
+
+    report = None
+    if args.daemon:
+        try:
+            results = build_with_daemon(builds, args)
+        except Exception as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+        if results is None:
+            return 2
+    elif jobs > 1 and len(builds) > 1:
+        queue = BuildQueue(max_workers=jobs)
+        for target, python_exe in builds:
+            queue.add(target, python_exe)
+        try:
+            report = queue.run()
+        except Exception as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+        results = report.results
+    else:
+        results = []
+        for python_exe in dict.fromkeys(python_exe for _, python_exe in builds):
+            engine = BuildEngine(python_exe=python_exe)
+            results.extend(engine.build_all([t for t, p in builds if p == python_exe], keep_going=not args.stop_on_error))
+            if args.stop_on_error and not all(r.success for r in results):
+                break
+
+    print()
+    for result in results:
+        if result.success:
+            print(f"  OK      {result.target.display_name} -> {result.artifact} ({result.duration:.1f}s)")
+        else:
+            print(f"  FAILED  {result.target.display_name}: {result.error} ({result.duration:.1f}s)")
+
+    failed = sum(1 for r in results if not r.success)
+    skipped = len(builds) - len(results)
+    if report is None:
+        # The queue already reported its own summary
+        print(f"\n{len(results) - failed} succeeded, {failed} failed" + (f", {skipped} skipped" if skipped else ""))
+    return 1 if failed or skipped else 0
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        return run_build(args, parser)
+    if args.command == "prefetch":
+        return run_prefetch(args)
+    if args.command == "cache-server":
+        return run_cache_server(args)
+    if args.command == "cache":
+        return run_cache(args)
+    if args.command == "toolchains":
+        return run_toolchains(args)
+    if args.command == "daemon":
+        return run_daemon(args)
+    parser.error(f"unknown command: {args.command}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,61 +1,65 @@
 """
 Helper module for handling command-line arguments in Lightning EXE.
+
+Arguments and environment variables baked into an executable are applied
+by a PyInstaller runtime hook. The hook is compiled at build time like the
+entry script, and runs just before it. By the time it runs, the bootloader
+has already imported ``os`` and ``sys``. It only extends ``sys.argv`` and
+``os.environ`` with literals that were parsed at build time, so it adds no
+measurable startup cost, and the entry script still runs as PyInstaller's
+precompiled ``__main__``.
 """
-import os
-import sys
+import shlex
+
+# Where the runtime hook is written, relative to the entry script's folder. The leading dot
+# keeps the import scanner away from it.
+RUNTIME_HOOK = ".lightning-exe/launch.py"
+
 
-def create_wrapper_script(source_file, args):
+def parse_args(cmd_args):
     """
-    Create a wrapper script that passes command-line arguments to the main script.
-    
+    Split baked-in command-line arguments the way a POSIX shell would.
+
     Args:
-        source_file: Path to the original Python script
-        args: Command-line arguments to pass to the script
-    
+        cmd_args (str): e.g. ``--name "John Smith" --port 8080``; newlines separate arguments too
+
+    Returns:
+        list: The individual arguments
+
+    Raises:
+        ValueError: If the quoting is unbalanced
+    """
+    return shlex.split(cmd_args or "")
+
+
+def format_args(args):
+    """Join arguments into a string that parse_args() splits back into the same list"""
+    return " ".join(shlex.quote(arg) for arg in args)
+
+
+def runtime_hook_source(args=(), env_vars=()):
+    """
+    Return the source of the runtime hook that applies baked-in arguments and environment variables.
+
+    Baked-in arguments come before the ones the executable is started
+    with, so a later flag given on the command line wins. Baked-in
+    environment variables replace existing ones.
+
+    Args:
+        args (list): Arguments from parse_args()
+        env_vars (list): (name, value) pairs
+
     Returns:
-        Path to the created wrapper script
+        str: Python source of the hook
     """
-    wrapper_dir = os.path.dirname(source_file)
-    wrapper_path = os.path.join(wrapper_dir, "_lightning_exe_wrapper.py")
-    
-    with open(wrapper_path, "w") as f:
-        f.write("# Wrapper script created by Lightning EXE to handle command-line arguments\n")
-        f.write("import sys\n")
-        f.write("import os\n\n")
-        
-        # Get the original script name without path
-        script_name = os.path.basename(source_file)
-        
-        # Define the command-line arguments
-        if args:
-            f.write(f"# Set command-line arguments\n")
-            f.write(f"sys.argv = ['{script_name}'")
-            
-            # Parse and add each argument
-            for arg in args.split():
-                f.write(f", '{arg}'")
-            
-            f.write("]\n\n")
-        
-        # Get full path to the original script
-        f.write(f"# Execute the original script directly\n")
-        f.write(f"script_dir = os.path.dirname(os.path.abspath(__file__))\n")
-        f.write(f"original_script = os.path.join(script_dir, '{script_name}')\n")
-        f.write(f"sys.path.insert(0, script_dir)\n\n")
-        
-        # Execute the original script with exec
-        f.write(f"try:\n")
-        f.write(f"    with open(original_script, 'r') as script_file:\n")
-        f.write(f"        script_content = script_file.read()\n")
-        f.write(f"    # Use globals as namespace to ensure script runs in the main context\n")
-        f.write(f"    namespace = globals()\n")
-        f.write(f"    namespace['__file__'] = original_script\n")
-        f.write(f"    exec(script_content, namespace)\n")
-        f.write(f"except Exception as e:\n")
-        f.write(f"    print(f\"Error running '{script_name}': {{e}}\")\n")
-        f.write(f"    import traceback\n")
-        f.write(f"    traceback.print_exc()\n")
-        f.write(f"    input(\"Press Enter to exit...\")\n")
-        f.write(f"    sys.exit(1)\n")
-    
-    return wrapper_path
+    lines = [
+        "# Generated by Lightning EXE: applies baked-in settings before the application starts",
+        "import os",
+        "import sys",
+        "",
+    ]
+    if env_vars:
+        lines.append(f"os.environ.update({dict((str(k), str(v)) for k, v in env_vars)!r})")
+    if args:
+        lines.append(f"sys.argv[1:1] = {list(args)!r}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,243 @@
+"""
+Collection policy for heavy packages in Lightning EXE.
+
+``--collect-all`` bundles every submodule, data file and binary of a
+package, including test suites, C headers, examples and GUI backends the
+application never loads. PyInstaller's own hooks already collect what
+numpy, scipy, matplotlib, PIL and friends need at runtime, so instead of
+collecting everything, each package the project imports gets a curated
+rule: subpackages that are never needed at runtime are excluded (unless
+the project imports them), and only the data files a package actually
+reads are added. The installed files are measured to report how much
+smaller the bundle is than with ``--collect-all``.
+"""
+import fnmatch
+import json
+import os
+
+import process_runner
+
+# Subpackages no application needs at runtime, in any package
+COMMON_EXCLUDES = ["*.tests", "*.conftest", "*.examples", "*.benchmarks"]
+
+BINARY_SUFFIXES = (".so", ".pyd", ".dll", ".dylib")
+
+
+class CollectionRule:
+    """How to collect one package"""
+
+    def __init__(self, package, excludes=(), data=(), optional=None):
+        """
+        Args:
+            package (str): Top-level import name
+            excludes: Submodule patterns to leave out, on top of COMMON_EXCLUDES
+            data: Glob patterns (relative to the package folder) of data files
+                the package reads at runtime; patterns ending in "/" are folders
+            optional (dict): Submodule pattern -> top-level modules; the
+                submodules are left out unless the project imports one of them
+        """
+        self.package = package
+        self.excludes = list(excludes)
+        self.data = list(data)
+        self.optional = optional or {}
+
+    def exclude_patterns(self, imported):
+        """Exclude patterns for a project importing the given top-level modules"""
+        patterns = COMMON_EXCLUDES + self.excludes
+        for pattern, users in self.optional.items():
+            if not any(user in imported for user in users):
+                patterns.append(pattern)
+        return patterns
+
+
+_QT = ["PyQt5", "PyQt6", "PySide2", "PySide6"]
+
+RULES = {
+    "numpy": CollectionRule("numpy", excludes=["numpy.f2py", "numpy.distutils"]),
+    "scipy": CollectionRule("scipy"),
+    "pandas": CollectionRule("pandas"),
+    "matplotlib": CollectionRule(
+        "matplotlib",
+        excludes=["matplotlib.testing", "matplotlib.backends.backend_macosx"],
+        data=["mpl-data/"],
+        optional={
+            "matplotlib.backends.backend_qt*": _QT,
+            "matplotlib.backends.qt_*": _QT,
+            "matplotlib.backends.backend_tk*": ["tkinter"],
+            "matplotlib.backends._backend_tk": ["tkinter"],
+            "matplotlib.backends.backend_gtk*": ["gi"],
+            "matplotlib.backends.backend_wx*": ["wx"],
+            "matplotlib.backends.backend_webagg*": ["tornado"],
+            "matplotlib.backends.backend_nbagg": ["IPython"],
+        },
+    ),
+    "PIL": CollectionRule("PIL", optional={"PIL.ImageQt": _QT, "PIL.ImageTk": ["tkinter"]}),
+    "pygame": CollectionRule("pygame", excludes=["pygame.docs", "pygame.examples", "pygame.tests"],
+                             data=["freesansbold.ttf", "pygame_icon.*"]),
+}
+
+# Runs inside the build interpreter: every file of the given packages
+_LIST_PACKAGE_FILES = r"""
+import importlib.util, json, os, sys
+out = {}
+for name in sys.argv[1:]:
+    try:
+        spec = importlib.util.find_spec(name)
+    except (ImportError, ValueError):
+        continue
+    if spec is None or not spec.submodule_search_locations:
+        continue
+    root = list(spec.submodule_search_locations)[0]
+    files = []
+    # Wheels repaired by auditwheel/delocate keep their shared libraries next to the package
+    for folder, prefix in ((root, ""), (os.path.join(os.path.dirname(root), name + ".libs"), "../" + name + ".libs/")):
+        for dirpath, dirs, names in os.walk(folder):
+            dirs[:] = [d for d in dirs if d != "__pycache__"]
+            for n in names:
+                path = os.path.join(dirpath, n)
+                files.append([prefix + os.path.relpath(path, folder).replace(os.sep, "/"), os.path.getsize(path)])
+    out[name] = {"root": root, "files": files}
+print(json.dumps(out))
+"""
+
+
+def _module_name(package, relative):
+    """Dotted module a file belongs to, e.g. numpy/core/tests/test_x.py -> numpy.core.tests.test_x"""
+    parts = relative.split("/")
+    last = parts.pop()
+    if last.endswith(".py") and last != "__init__.py":
+        parts.append(last[:-3])
+    return ".".join([package] + parts)
+
+
+def _excluded_prefix(module, patterns, keep):
+    """The shortest prefix of a module matching an exclude pattern, unless the project imports it"""
+    parts = module.split(".")
+    for i in range(2, len(parts) + 1):
+        prefix = ".".join(parts[:i])
+        if any(fnmatch.fnmatchcase(prefix, p) for p in patterns):
+            if any(k == prefix or k.startswith(prefix + ".") for k in keep):
+                return None
+            return prefix
+    return None
+
+
+class PackageCollection:
+    """What the policy collects for one package, and what --collect-all would have"""
+
+    def __init__(self, package, excludes, data, policy_bytes, collect_all_bytes, root=""):
+        self.package = package
+        self.root = root  # folder the package is installed in
+        self.excludes = excludes  # top-most excluded submodules
+        self.data = data  # (absolute source, destination folder) pairs
+        self.policy_bytes = policy_bytes
+        self.collect_all_bytes = collect_all_bytes
+
+    @property
+    def saved_bytes(self):
+        return self.collect_all_bytes - self.policy_bytes
+
+
+class CollectionPlan:
+    """PyInstaller options and size report for all collected packages"""
+
+    def __init__(self, packages):
+        self.packages = packages
+
+    @property
+    def options(self):
+        options = []
+        for package in self.packages:
+            for module in package.excludes:
+                options.extend(["--exclude-module", module])
+            for source, dest in package.data:
+                options.extend(["--add-data", f"{source}{os.pathsep}{dest}"])
+        return options
+
+    @property
+    def saved_bytes(self):
+        return sum(p.saved_bytes for p in self.packages)
+
+    @property
+    def site_dirs(self):
+        """Folders the collected packages are installed in; the data paths in the options start with them"""
+        return sorted({os.path.dirname(p.root) for p in self.packages if p.root})
+
+    def to_dict(self):
+        """The report saved as <name>-collection.json next to the executable"""
+        return {
+            "saved_bytes": self.saved_bytes,
+            "packages": [{
+                "package": p.package,
+                "excludes": p.excludes,
+                "data": [dest if os.path.isdir(source) else f"{dest}/{os.path.basename(source)}"
+                         for source, dest in p.data],
+                "policy_bytes": p.policy_bytes,
+                "collect_all_bytes": p.collect_all_bytes,
+            } for p in self.packages],
+        }
+
+
+def _plan_package(rule, info, imported):
+    patterns = rule.exclude_patterns(imported)
+    # Never exclude something the project imports itself
+    keep = {name for name in imported if name == rule.package or name.startswith(rule.package + ".")}
+
+    excluded = set()
+    data = []
+    policy_bytes = 0
+    collect_all_bytes = 0
+    for relative, size in info["files"]:
+        collect_all_bytes += size
+        if relative.startswith("../"):
+            policy_bytes += size
+            continue
+        prefix = _excluded_prefix(_module_name(rule.package, relative), patterns, keep)
+        if prefix:
+            if relative.endswith(".py"):
+                excluded.add(prefix)
+            continue
+        name = relative.rsplit("/", 1)[-1]
+        if relative.endswith(".py") or name.endswith(BINARY_SUFFIXES) or ".so." in name:
+            policy_bytes += size
+        else:
+            for pattern in rule.data:
+                if pattern.endswith("/") and relative.startswith(pattern):
+                    # Whole folders are added with a single --add-data
+                    policy_bytes += size
+                    entry = (os.path.join(info["root"], pattern.rstrip("/")), f"{rule.package}/{pattern.rstrip('/')}")
+                    if entry not in data:
+                        data.append(entry)
+                    break
+                if fnmatch.fnmatchcase(relative, pattern):
+                    policy_bytes += size
+                    dest = os.path.dirname(relative)
+                    data.append((os.path.join(info["root"], relative), rule.package + ("/" + dest if dest else "")))
+                    break
+
+    return PackageCollection(rule.package, sorted(excluded), data, policy_bytes, collect_all_bytes, info["root"])
+
+
+def plan_collection(packages, imported, python_exe, cancel=None):
+    """
+    Decide how to collect the heavy packages a project uses.
+
+    Args:
+        packages: Top-level modules of the project's requirements that it imports
+        imported: Every (dotted) module name the project imports
+        python_exe (str): Build interpreter the packages are installed in
+        cancel (CancelToken): Stops the lookup when the build is cancelled
+
+    Returns:
+        CollectionPlan: Options to pass to PyInstaller and the size report
+    """
+    imported = set(imported) | {name.split(".")[0] for name in imported}
+    rules = [RULES[p] for p in packages if p in RULES]
+    if not rules:
+        return CollectionPlan([])
+
+    result = process_runner.run([python_exe, "-c", _LIST_PACKAGE_FILES, *[r.package for r in rules]],
+                                cancel=cancel, merge_stderr=False)
+    installed = json.loads(result.stdout) if result.returncode == 0 else {}
+    return CollectionPlan([_plan_package(rule, installed[rule.package], imported)
+                           for rule in rules if rule.package in installed])
@@ -0,0 +1,104 @@
+"""
+Compression strategies for Lightning EXE.
+
+PyInstaller compresses every module in the PYZ archive (zlib level 6) and
+every binary and data file in a one-file executable (zlib level 9). It
+also runs UPX over binaries whenever UPX happens to be on the PATH. Tiny
+command line tools and large scientific applications need different
+tradeoffs between size and startup time, so a build picks one strategy:
+
+* ``default``: PyInstaller's behaviour, unchanged
+* ``none``: nothing compressed; largest, but nothing to inflate at startup
+* ``pyz``: only the Python modules are compressed; binaries and data are stored
+* ``upx``: PyInstaller's zlib compression plus UPX, skipping binaries UPX is
+  known to break
+
+All strategies share one Analysis; switching strategy only redoes the
+packaging steps.
+"""
+import os
+import shutil
+
+STRATEGIES = ["default", "none", "pyz", "upx"]
+
+# (PYZ zlib level, one-file archive zlib level), None to keep PyInstaller's level
+ZLIB_LEVELS = {
+    "default": (None, None),
+    "none": (0, 0),
+    "pyz": (None, 0),
+    "upx": (None, None),
+}
+
+# Binaries UPX corrupts or can't handle, as file name patterns
+UPX_EXCLUDES = [
+    # Windows runtime libraries and the Python DLL use Control Flow Guard
+    "vcruntime*.dll", "msvcp*.dll", "ucrtbase.dll", "api-ms-win-*.dll", "python3*.dll",
+    # Qt platform plugins and the ANGLE/OpenGL fallbacks fail to load once packed
+    "qwindows.dll", "libEGL*.dll", "libGLESv2*.dll", "opengl32sw.dll",
+    # CUDA and torch libraries are too large for UPX and carry device code it mangles
+    "*cuda*", "*cudnn*", "*cublas*", "*cufft*", "*curand*", "*cusolver*", "*cusparse*", "*nvrtc*",
+    "*torch_cpu*", "*torch_cuda*", "libtorch*",
+    # OpenSSL checks its own integrity on some platforms
+    "libcrypto*", "libssl*",
+]
+
+# Runs PyInstaller with the zlib levels given as the first two arguments ("-" keeps the default);
+# a single line so the logged command stays readable
+_RUN_PYINSTALLER = (
+    "import sys, PyInstaller.archive.writers as w, PyInstaller.__main__ as m; z, c = sys.argv[1:3]; "
+    "z == '-' or setattr(w.ZlibArchiveWriter, '_COMPRESSION_LEVEL', int(z)); "
+    "c == '-' or setattr(w.CArchiveWriter, '_COMPRESSION_LEVEL', int(c)); "
+    "m.run(sys.argv[3:])"
+)
+
+
+def find_upx():
+    """Folder containing the upx executable, or None"""
+    upx = shutil.which("upx")
+    return os.path.dirname(upx) if upx else None
+
+
+def pyinstaller_command(python_exe, strategy):
+    """
+    The command that starts PyInstaller for a strategy; arguments follow it.
+
+    Returns:
+        list: e.g. ``[python_exe, "-m", "PyInstaller"]``
+    """
+    pyz_level, archive_level = ZLIB_LEVELS[strategy]
+    if pyz_level is None and archive_level is None:
+        return [python_exe, "-m", "PyInstaller"]
+    return [python_exe, "-c", _RUN_PYINSTALLER,
+            "-" if pyz_level is None else str(pyz_level),
+            "-" if archive_level is None else str(archive_level)]
+
+
+def strategy_options(strategy):
+    """
+    Spec options (makespec) for a strategy.
+
+    Raises:
+        Exception: If the strategy needs UPX and it isn't installed
+    """
+    if strategy == "default":
+        return []
+    if strategy != "upx":
+        return ["--noupx"]
+    if find_upx() is None:
+        raise Exception("The 'upx' compression strategy needs UPX on the PATH (https://upx.github.io)")
+    options = []
+    for pattern in UPX_EXCLUDES:
+        options.extend(["--upx-exclude", pattern])
+    return options
+
+
+def build_options(strategy):
+    """Options for building the spec, which PyInstaller doesn't store in it"""
+    if strategy == "upx":
+        return ["--upx-dir", find_upx()]
+    return []
+
+
+def available_strategies():
+    """Strategies that can be built on this machine"""
+    return [s for s in STRATEGIES if s != "upx" or find_upx()]
@@ -0,0 +1,190 @@
+"""
+Fast-start one-file executables for Lightning EXE.
+
+A regular one-file executable unpacks the whole application into a new
+temporary folder on every launch and deletes it on exit, which dominates
+startup time for large applications. A fast-start executable carries the
+application, built as a one-folder bundle, as a zip. It is unpacked once
+into a per-user cache folder keyed by the payload's sha256 and started from
+there on every later launch. A new build has a new hash, so it never runs
+stale files.
+
+The executable starts with a native stub (fast_start_stub.c), compiled with
+the C compiler found on the build machine, which execs the unpacked
+application directly; the frozen launcher (fast_start_launcher.py) it also
+carries only runs to unpack the payload. Without a C compiler, and on
+Windows, the frozen launcher is the executable itself, and every launch
+unpacks the launcher's own Python runtime before starting the application.
+"""
+import os
+import shutil
+import sys
+import zipfile
+
+import process_runner
+from cache_utils import file_lock, get_cache_dir, hash_file, hash_strings
+from fast_start_launcher import BOOTLOADER_COOKIE, MAGIC, STUB_MAGIC, STUB_TRAILER, TRAILER, format_info
+
+LAUNCHER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fast_start_launcher.py")
+STUB_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fast_start_stub.c")
+
+# zipfile and shutil import these when available; the launcher never needs them
+LAUNCHER_EXCLUDES = ["bz2", "_bz2", "lzma", "_lzma"]
+
+COOKIE_MAGIC = b"MEI\014\013\012\013\016"
+
+
+def stage_launcher(name):
+    """
+    Copy the launcher script to a stable location named after the application.
+
+    PyInstaller names the executable after the script, and a stable path lets
+    the analysis cache reuse the launcher's work folder between builds.
+
+    Returns:
+        str: Path of the staged launcher script
+    """
+    folder = get_cache_dir("launchers", hash_strings(name)[:16])
+    script = os.path.join(folder, f"{name}.py")
+    with open(LAUNCHER_SCRIPT, "rb") as f:
+        source = f.read()
+    try:
+        with open(script, "rb") as f:
+            unchanged = f.read() == source
+    except OSError:
+        unchanged = False
+    if not unchanged:
+        with open(script, "wb") as f:
+            f.write(source)
+    return script
+
+
+def find_compiler():
+    """The C compiler for the native stub, or None"""
+    if sys.platform == "win32":
+        return None
+    for name in (os.environ.get("CC"), "cc", "gcc", "clang"):
+        path = shutil.which(name) if name else None
+        if path:
+            return path
+    return None
+
+
+def build_stub(cancel=None):
+    """
+    Compile the native stub, once per compiler and stub source.
+
+    Returns:
+        str: Path of the stub executable, or None if there is no C compiler
+
+    Raises:
+        Exception: If the stub doesn't compile
+        ProcessCancelled: If the build was cancelled
+    """
+    compiler = find_compiler()
+    if compiler is None:
+        return None
+    with open(STUB_SOURCE, "rb") as f:
+        source = f.read()
+    folder = get_cache_dir("launchers", "stub-" + hash_strings(source.hex(), compiler, sys.platform)[:16])
+    stub = os.path.join(folder, "fast-start-stub")
+    with file_lock(os.path.join(folder, "build.lock")):
+        if not os.path.exists(stub):
+            partial = f"{stub}.{os.getpid()}.partial"
+            result = process_runner.run([compiler, "-O2", "-o", partial, STUB_SOURCE], cancel=cancel,
+                                        merge_stderr=False)
+            if result.returncode != 0:
+                raise Exception(f"Could not compile the fast-start stub: {(result.stderr or result.stdout).strip()}")
+            os.replace(partial, stub)
+    return stub
+
+
+def pack_payload(onedir_path, zip_path):
+    """Zip a one-folder build, keeping file modes, and return the number of files"""
+    count = 0
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for root, dirs, files in os.walk(onedir_path):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                archive.write(path, os.path.relpath(path, onedir_path).replace(os.sep, "/"))
+                count += 1
+    return count
+
+
+def read_bootloader_cookie(launcher_path):
+    """
+    Find the PyInstaller archive cookie of a one-file executable.
+
+    Returns:
+        tuple: (offset of the cookie, its unpacked fields)
+
+    Raises:
+        Exception: If the executable has no PyInstaller archive
+    """
+    with open(launcher_path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        # The cookie ends the archive; only section headers or a signature may follow it
+        window = min(size, 1024 * 1024)
+        f.seek(size - window)
+        tail = f.read(window)
+    index = tail.rfind(COOKIE_MAGIC)
+    if index < 0 or index + BOOTLOADER_COOKIE.size > len(tail):
+        raise Exception(f"No PyInstaller archive found in {launcher_path}")
+    return size - window + index, list(BOOTLOADER_COOKIE.unpack_from(tail, index))
+
+
+def attach_payload(launcher_path, onedir_path, name, executable, stub=None, cancel=None):
+    """
+    Turn a frozen launcher into a fast-start executable carrying a one-folder build.
+
+    Args:
+        launcher_path (str): The frozen launcher, replaced by the fast-start executable
+        onedir_path (str): Folder produced by a --onedir build
+        name (str): Application name, used for its cache folder
+        executable (str): The application's executable, relative to onedir_path
+        stub (str): Native stub from build_stub() to put in front, or None to
+            attach the payload to the launcher itself
+        cancel (CancelToken): Stops re-signing on macOS when the build is cancelled
+
+    Returns:
+        dict: The payload info written into the trailer (sha256, size, files)
+    """
+    zip_path = launcher_path + ".payload"
+    partial = launcher_path + ".partial"
+    try:
+        files = pack_payload(onedir_path, zip_path)
+        info = {"name": name, "executable": executable, "sha256": hash_file(zip_path),
+                "size": os.path.getsize(zip_path), "files": files}
+        encoded = format_info(info)
+        if stub is not None:
+            with open(partial, "wb") as out:
+                for part in (stub, launcher_path, zip_path):
+                    with open(part, "rb") as f:
+                        shutil.copyfileobj(f, out, 1024 * 1024)
+                out.write(encoded)
+                out.write(STUB_TRAILER.pack(len(encoded), info["size"], os.path.getsize(launcher_path), STUB_MAGIC))
+            shutil.copymode(launcher_path, partial)
+            os.replace(partial, launcher_path)
+        else:
+            cookie_offset, cookie = read_bootloader_cookie(launcher_path)
+            archive_start = cookie_offset + BOOTLOADER_COOKIE.size - cookie[1]
+            with open(launcher_path, "ab") as out, open(zip_path, "rb") as payload:
+                shutil.copyfileobj(payload, out, 1024 * 1024)
+                out.write(encoded)
+                out.write(TRAILER.pack(len(encoded), info["size"], MAGIC))
+                # The archive now seemingly runs to the end of the file; its TOC offsets are unchanged
+                cookie[1] = out.tell() + BOOTLOADER_COOKIE.size - archive_start
+                if cookie[1] >= 2 ** 32:
+                    raise Exception("The application is too large for a fast-start executable (4 GB limit)")
+                out.write(BOOTLOADER_COOKIE.pack(*cookie))
+    finally:
+        for path in (zip_path, partial):
+            if os.path.exists(path):
+                os.remove(path)
+
+    if sys.platform == "darwin":
+        # Appending data invalidates the ad-hoc signature PyInstaller applied, and macOS won't run it unsigned
+        process_runner.run(["codesign", "--force", "--sign", "-", launcher_path], cancel=cancel).check()
+    return info
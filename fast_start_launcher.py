@@ -0,0 +1,255 @@
+"""
+Launcher for Lightning EXE fast-start executables.
+
+This script is frozen as a small one-file executable. The real application
+(a PyInstaller one-folder build) travels with it as a zip payload, which the
+launcher extracts into a per-user cache folder named after the payload's
+hash, and then starts the application from there.
+
+Where a C compiler is available, the executable starts with the native stub
+(fast_start_stub.c), which starts an intact extracted copy by itself; this
+launcher only runs when there is something to extract::
+
+    <native stub> <frozen launcher> <zip payload> <info> <info length: 8 bytes LE>
+    <payload length: 8 bytes LE> <launcher length: 8 bytes LE> <STUB_MAGIC>
+
+Otherwise the frozen launcher is the executable, with the payload appended::
+
+    <frozen launcher> <zip payload> <info> <info length: 8 bytes LE> <payload length: 8 bytes LE> <MAGIC>
+    <copy of the PyInstaller archive cookie>
+
+The bootloader looks for its archive cookie by scanning backwards from the
+end of the file, so a copy of the cookie is written last; otherwise every
+launch would scan through the whole payload first. That layout still
+unpacks the launcher's own Python runtime on every start.
+
+The info block holds ``key=value`` lines: name, sha256, executable, size
+and files.
+
+Every launch touches the folder of the version it starts. Unpacking a new
+version removes earlier ones only once they haven't been launched for a
+week, since a copy of an older executable may still be running from them.
+"""
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import time
+import zipfile
+
+MAGIC = b"LXEFAST1"
+TRAILER = struct.Struct("<QQ8s")
+STUB_MAGIC = b"LXEFAST2"
+STUB_TRAILER = struct.Struct("<QQQ8s")
+# PyInstaller's CArchive cookie: magic, archive length, TOC offset, TOC length, Python version, libpython name
+BOOTLOADER_COOKIE = struct.Struct("!8sIIII64s")
+READY_MARKER = "lightning-exe-ready.txt"
+# Set by the native stub to the fast-start executable it hands over from
+STUB_ENV = "LIGHTNING_EXE_FAST_START"
+# Earlier versions launched more recently than this (seconds) are kept
+KEEP_USED_VERSIONS = 7 * 24 * 3600
+
+
+def app_cache_root():
+    """Per-user folder holding extracted fast-start applications"""
+    root = os.environ.get("LIGHTNING_EXE_APP_CACHE")
+    if root:
+        return root
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~\\AppData\\Local")
+        return os.path.join(base, "lightning-exe-apps")
+    if sys.platform == "darwin":
+        return os.path.expanduser("~/Library/Caches/lightning-exe-apps")
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "lightning-exe-apps")
+
+
+def format_info(info):
+    """The info block for a fast-start executable"""
+    return "".join(f"{key}={value}\n" for key, value in info.items()).encode("utf-8")
+
+
+def parse_info(data):
+    """Read an info block written by format_info()"""
+    info = {}
+    for line in data.decode("utf-8").splitlines():
+        key, _, value = line.partition("=")
+        info[key] = value
+    for key in ("size", "files"):
+        if key in info:
+            info[key] = int(info[key])
+    return info
+
+
+def read_trailer(path):
+    """Return (info dict, payload offset, payload length) of a fast-start executable"""
+    with open(path, "rb") as f:
+        f.seek(-STUB_TRAILER.size, os.SEEK_END)
+        info_length, payload_length, _, magic = STUB_TRAILER.unpack(f.read(STUB_TRAILER.size))
+        end = f.tell() - STUB_TRAILER.size
+        if magic != STUB_MAGIC:
+            f.seek(-(TRAILER.size + BOOTLOADER_COOKIE.size), os.SEEK_END)
+            end = f.tell()
+            info_length, payload_length, magic = TRAILER.unpack(f.read(TRAILER.size))
+            if magic != MAGIC:
+                raise RuntimeError(f"{path} has no fast-start payload")
+        f.seek(end - info_length)
+        info = parse_info(f.read(info_length))
+    return info, end - info_length - payload_length, payload_length
+
+
+def is_intact(app_dir, info):
+    """
+    True if the extracted copy is the payload's and every file is unchanged.
+
+    The marker written at extraction records each file's size and modification
+    time; the native stub runs the same check before it starts the application.
+    """
+    try:
+        with open(os.path.join(app_dir, READY_MARKER), "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        _, sha256, count = lines[0].split(" ")
+        if sha256 != info["sha256"] or int(count) != len(lines) - 1:
+            return False
+        for line in lines[1:]:
+            size, mtime_ns, relative = line.split(" ", 2)
+            st = os.stat(os.path.join(app_dir, relative))
+            if st.st_size != int(size) or st.st_mtime_ns != int(mtime_ns):
+                return False
+        return True
+    except (OSError, ValueError, KeyError, IndexError):
+        return False
+
+
+class _PayloadFile:
+    """Read-only view of the zip payload inside the executable"""
+
+    def __init__(self, path, offset, length):
+        self._file = open(path, "rb")
+        self._offset = offset
+        self._length = length
+        self._file.seek(offset)
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._file.tell() - self._offset
+
+    def seek(self, position, whence=os.SEEK_SET):
+        if whence == os.SEEK_SET:
+            position += self._offset
+        elif whence == os.SEEK_END:
+            position += self._offset + self._length
+        else:
+            position += self._file.tell()
+        return self._file.seek(position) - self._offset
+
+    def read(self, size=-1):
+        remaining = self._offset + self._length - self._file.tell()
+        if size < 0 or size > remaining:
+            size = remaining
+        return self._file.read(size)
+
+    def close(self):
+        self._file.close()
+
+
+def extract(path, offset, length, info, app_dir):
+    """Unpack the payload into app_dir, atomically"""
+    partial = f"{app_dir}.partial-{os.getpid()}"
+    shutil.rmtree(partial, ignore_errors=True)
+    payload = _PayloadFile(path, offset, length)
+    files = {}
+    try:
+        # ZipExtFile checks every member's CRC while it's read
+        with zipfile.ZipFile(payload) as archive:
+            for member in archive.infolist():
+                target = os.path.join(partial, member.filename)
+                if member.is_dir():
+                    os.makedirs(target, exist_ok=True)
+                    continue
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with archive.open(member) as source, open(target, "wb") as out:
+                    shutil.copyfileobj(source, out, 1024 * 1024)
+                mode = member.external_attr >> 16
+                if mode:
+                    os.chmod(target, mode & 0o777)
+                files[member.filename] = os.stat(target)
+    finally:
+        payload.close()
+
+    with open(os.path.join(partial, READY_MARKER), "w", encoding="utf-8") as f:
+        f.write(f"lightning-exe {info['sha256']} {len(files)}\n")
+        for relative, st in files.items():
+            f.write(f"{st.st_size} {st.st_mtime_ns} {relative}\n")
+    try:
+        os.replace(partial, app_dir)
+    except OSError:
+        # Another launch won the race, or a damaged copy is in the way
+        if is_intact(app_dir, info):
+            shutil.rmtree(partial, ignore_errors=True)
+            return
+        shutil.rmtree(app_dir, ignore_errors=True)
+        os.replace(partial, app_dir)
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return 0
+
+
+def remove_old_versions(root, name, keep):
+    """Delete earlier extracted versions of the same application, and their launchers, once unused for a while"""
+    now = time.time()
+    for entry in os.listdir(root):
+        version = entry[:-len(".launcher")] if entry.endswith(".launcher") else entry
+        # <name>-<16 hex digits>, so other applications whose names start with this one are left alone
+        if not version.startswith(name + "-") or len(version) != len(name) + 17 or version == keep:
+            continue
+        version_dir = os.path.join(root, version)
+        if now - max(_mtime(version_dir), _mtime(version_dir + ".launcher")) < KEEP_USED_VERSIONS:
+            continue
+        path = os.path.join(root, entry)
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def main():
+    # Started by the native stub, or the payload is attached to this executable itself
+    launcher = os.environ.pop(STUB_ENV, None) or sys.executable
+    info, offset, length = read_trailer(launcher)
+    root = app_cache_root()
+    os.makedirs(root, exist_ok=True)
+    key = f"{info['name']}-{info['sha256'][:16]}"
+    app_dir = os.path.join(root, key)
+
+    if not is_intact(app_dir, info):
+        extract(launcher, offset, length, info, app_dir)
+        remove_old_versions(root, info["name"], key)
+    else:
+        try:
+            os.utime(app_dir)
+        except OSError:
+            pass
+
+    executable = os.path.join(app_dir, info["executable"])
+    env = dict(os.environ)
+    # Let the application's bootloader start from a clean environment instead of ours
+    env["PYINSTALLER_RESET_ENVIRONMENT"] = "1"
+    args = [executable] + sys.argv[1:]
+    if sys.platform == "win32":
+        sys.exit(subprocess.call(args, env=env))
+    os.execve(executable, args, env)
+
+
+if __name__ == "__main__":
+    main()
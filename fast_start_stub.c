@@ -0,0 +1,258 @@
+/*
+ * Native stub for Lightning EXE fast-start executables (Linux and macOS).
+ *
+ * Layout of the executable:
+ *
+ *     <this stub> <frozen launcher> <zip payload> <info> <trailer>
+ *
+ * The trailer is the info length, the payload length and the launcher length,
+ * 8 bytes little-endian each, followed by "LXEFAST2". The info block holds
+ * "key=value" lines, of which the stub reads name, sha256 and executable.
+ *
+ * If the payload was unpacked before and every file listed in its marker still
+ * has the recorded size and modification time, the stub execs the application
+ * straight away, so a warm start runs no Python and unpacks nothing. Otherwise
+ * it writes the frozen launcher (fast_start_launcher.py) next to the unpacked
+ * applications, once, and hands over to it to unpack the payload.
+ *
+ * Every launch touches the unpacked folder, which keeps the launcher from
+ * removing a version that was started recently and may still be running.
+ */
+#include <errno.h>
+#include <limits.h>
+#include <stdarg.h>
+#include <stdint.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <sys/stat.h>
+#include <sys/types.h>
+#include <unistd.h>
+#include <utime.h>
+#ifdef __APPLE__
+#include <mach-o/dyld.h>
+#endif
+
+#define MAGIC "LXEFAST2"
+#define TRAILER_SIZE 32
+#define MARKER "lightning-exe-ready.txt"
+#define MAX_INFO 65536
+
+static void fail(const char *message, const char *detail)
+{
+    fprintf(stderr, "fast-start: %s%s%s\n", message, detail ? ": " : "", detail ? detail : "");
+    exit(127);
+}
+
+/* snprintf() for paths, refusing to truncate them */
+static void format_path(char *out, size_t size, const char *format, ...)
+{
+    va_list args;
+    va_start(args, format);
+    int length = vsnprintf(out, size, format, args);
+    va_end(args);
+    if (length < 0 || (size_t)length >= size)
+        fail("path is too long", out);
+}
+
+static uint64_t read_le64(const unsigned char *p)
+{
+    uint64_t value = 0;
+    for (int i = 7; i >= 0; i--)
+        value = (value << 8) | p[i];
+    return value;
+}
+
+static void self_path(char *out, size_t size)
+{
+#ifdef __APPLE__
+    char raw[PATH_MAX];
+    uint32_t length = sizeof(raw);
+    if (_NSGetExecutablePath(raw, &length) != 0 || realpath(raw, out) == NULL)
+        fail("cannot locate the executable", NULL);
+    (void)size;
+#else
+    ssize_t length = readlink("/proc/self/exe", out, size - 1);
+    if (length < 0)
+        fail("cannot locate the executable", strerror(errno));
+    out[length] = '\0';
+#endif
+}
+
+/* Same folder as app_cache_root() in fast_start_launcher.py */
+static void cache_root(char *out, size_t size)
+{
+    const char *root = getenv("LIGHTNING_EXE_APP_CACHE");
+    const char *home = getenv("HOME");
+    int length;
+    if (root && *root) {
+        length = snprintf(out, size, "%s", root);
+    } else {
+#ifdef __APPLE__
+        if (!home)
+            fail("HOME is not set", NULL);
+        length = snprintf(out, size, "%s/Library/Caches/lightning-exe-apps", home);
+#else
+        const char *xdg = getenv("XDG_CACHE_HOME");
+        if (xdg && *xdg)
+            length = snprintf(out, size, "%s/lightning-exe-apps", xdg);
+        else if (home)
+            length = snprintf(out, size, "%s/.cache/lightning-exe-apps", home);
+        else
+            fail("HOME is not set", NULL);
+#endif
+    }
+    if (length < 0 || (size_t)length >= size)
+        fail("cache folder path is too long", NULL);
+}
+
+static void info_value(const char *info, const char *key, char *out, size_t size)
+{
+    size_t key_length = strlen(key);
+    for (const char *line = info; *line; ) {
+        size_t line_length = strcspn(line, "\n");
+        if (line_length > key_length && strncmp(line, key, key_length) == 0 && line[key_length] == '=') {
+            size_t value_length = line_length - key_length - 1;
+            if (value_length >= size)
+                break;
+            memcpy(out, line + key_length + 1, value_length);
+            out[value_length] = '\0';
+            return;
+        }
+        line += line_length + (line[line_length] == '\n');
+    }
+    fail("damaged fast-start executable, missing", key);
+}
+
+static long long mtime_ns(const struct stat *st)
+{
+#ifdef __APPLE__
+    return (long long)st->st_mtimespec.tv_sec * 1000000000LL + st->st_mtimespec.tv_nsec;
+#else
+    return (long long)st->st_mtim.tv_sec * 1000000000LL + st->st_mtim.tv_nsec;
+#endif
+}
+
+/* Same check as is_intact() in fast_start_launcher.py */
+static int is_intact(const char *app_dir, const char *sha256)
+{
+    char path[PATH_MAX], line[PATH_MAX + 64], digest[80];
+    unsigned long expected = 0, seen = 0;
+    int intact = 0;
+
+    format_path(path, sizeof(path), "%s/%s", app_dir, MARKER);
+    FILE *marker = fopen(path, "r");
+    if (!marker)
+        return 0;
+    if (fgets(line, sizeof(line), marker) && sscanf(line, "lightning-exe %79s %lu", digest, &expected) == 2
+            && strcmp(digest, sha256) == 0) {
+        intact = 1;
+        while (intact && fgets(line, sizeof(line), marker)) {
+            unsigned long long size;
+            long long mtime;
+            int offset = 0;
+            struct stat st;
+            line[strcspn(line, "\n")] = '\0';
+            if (sscanf(line, "%llu %lld %n", &size, &mtime, &offset) != 2 || offset == 0) {
+                intact = 0;
+                break;
+            }
+            format_path(path, sizeof(path), "%s/%s", app_dir, line + offset);
+            if (stat(path, &st) != 0 || (unsigned long long)st.st_size != size || mtime_ns(&st) != mtime)
+                intact = 0;
+            seen++;
+        }
+        if (seen != expected)
+            intact = 0;
+    }
+    fclose(marker);
+    return intact;
+}
+
+static void make_dirs(const char *folder)
+{
+    char path[PATH_MAX];
+    format_path(path, sizeof(path), "%s", folder);
+    for (char *p = path + 1; *p; p++) {
+        if (*p == '/') {
+            *p = '\0';
+            mkdir(path, 0755);
+            *p = '/';
+        }
+    }
+    if (mkdir(path, 0755) != 0 && errno != EEXIST)
+        fail("cannot create the cache folder", strerror(errno));
+}
+
+/* Copy the frozen launcher out of this executable, atomically */
+static void write_launcher(FILE *self, long long offset, unsigned long long length, const char *path)
+{
+    char partial[PATH_MAX + 32], buffer[1 << 16];
+    format_path(partial, sizeof(partial), "%s.partial-%ld", path, (long)getpid());
+    FILE *out = fopen(partial, "wb");
+    if (!out || fseeko(self, (off_t)offset, SEEK_SET) != 0)
+        fail("cannot write the launcher", strerror(errno));
+    while (length > 0) {
+        size_t chunk = length < sizeof(buffer) ? (size_t)length : sizeof(buffer);
+        if (fread(buffer, 1, chunk, self) != chunk || fwrite(buffer, 1, chunk, out) != chunk)
+            fail("cannot write the launcher", strerror(errno));
+        length -= chunk;
+    }
+    if (fclose(out) != 0 || chmod(partial, 0755) != 0 || rename(partial, path) != 0)
+        fail("cannot write the launcher", strerror(errno));
+}
+
+int main(int argc, char **argv)
+{
+    char self[PATH_MAX], root[PATH_MAX], app_dir[PATH_MAX], target[PATH_MAX];
+    unsigned char trailer[TRAILER_SIZE];
+    static char info[MAX_INFO + 1];
+    (void)argc;
+
+    self_path(self, sizeof(self));
+    FILE *file = fopen(self, "rb");
+    if (!file || fseeko(file, -TRAILER_SIZE, SEEK_END) != 0 || fread(trailer, 1, TRAILER_SIZE, file) != TRAILER_SIZE)
+        fail("cannot read the executable", self);
+    if (memcmp(trailer + 24, MAGIC, 8) != 0)
+        fail("damaged fast-start executable", self);
+    long long end = (long long)ftello(file) - TRAILER_SIZE;
+    uint64_t info_length = read_le64(trailer), payload_length = read_le64(trailer + 8);
+    uint64_t launcher_length = read_le64(trailer + 16);
+    if (info_length > MAX_INFO || fseeko(file, (off_t)(end - (long long)info_length), SEEK_SET) != 0
+            || fread(info, 1, info_length, file) != info_length)
+        fail("damaged fast-start executable", self);
+    info[info_length] = '\0';
+
+    char name[256], sha256[80], executable[PATH_MAX];
+    info_value(info, "name", name, sizeof(name));
+    info_value(info, "sha256", sha256, sizeof(sha256));
+    info_value(info, "executable", executable, sizeof(executable));
+    cache_root(root, sizeof(root));
+    format_path(app_dir, sizeof(app_dir), "%s/%s-%.16s", root, name, sha256);
+
+    if (is_intact(app_dir, sha256)) {
+        fclose(file);
+        utime(app_dir, NULL);
+        format_path(target, sizeof(target), "%s/%s", app_dir, executable);
+        /* Let the application's bootloader start from a clean environment */
+        setenv("PYINSTALLER_RESET_ENVIRONMENT", "1", 1);
+        argv[0] = target;
+        execv(target, argv);
+        fail("cannot start the application", strerror(errno));
+    }
+
+    /* First start, or the unpacked copy was changed: let the launcher unpack the payload */
+    struct stat st;
+    format_path(target, sizeof(target), "%s/%s-%.16s.launcher", root, name, sha256);
+    if (stat(target, &st) != 0 || (uint64_t)st.st_size != launcher_length) {
+        make_dirs(root);
+        long long offset = end - (long long)info_length - (long long)payload_length - (long long)launcher_length;
+        write_launcher(file, offset, launcher_length, target);
+    }
+    fclose(file);
+    setenv("LIGHTNING_EXE_FAST_START", self, 1);
+    argv[0] = target;
+    execv(target, argv);
+    fail("cannot start the launcher", strerror(errno));
+    return 127;
+}
@@ -0,0 +1,439 @@
+"""
+Static import scanner for Lightning EXE.
+
+Parses every module of a project with ``ast`` (in parallel, and only the
+files that changed since the last scan) and builds the project's import
+graph. PyInstaller already follows plain ``import`` statements, so the
+graph is used to work out what it can't see on its own, namely modules
+loaded by name through ``importlib.import_module`` or ``__import__``, and
+which of the project's requirements the code really uses. Development-only
+packages that the project never imports are excluded from the bundle.
+"""
+import ast
+import concurrent.futures
+import importlib.machinery
+import json
+import multiprocessing
+import os
+import sys
+
+from cache_utils import file_lock, get_cache_dir, hash_file, hash_strings
+
+# Folders that never contain the project's own modules
+SKIP_DIRS = {".git", ".hg", ".svn", "__pycache__", ".tox", ".nox", ".venv", "venv",
+             "build", "dist", "node_modules", "site-packages", ".mypy_cache", ".pytest_cache"}
+
+# Development-only packages that optional imports elsewhere tend to drag into
+# bundles even though an application never needs them at runtime, mapped to
+# the modules (standard library ones included) that legitimately use them.
+# Runtime toolkits such as tkinter don't belong here: libraries built on them
+# (customtkinter, PySimpleGUI, turtle) would lose them without a trace.
+EXCLUDE_CANDIDATES = {
+    "pytest": [],
+    "_pytest": [],
+    "IPython": [],
+    "ipykernel": [],
+    "jupyter_client": [],
+    "notebook": [],
+    "sphinx": [],
+    "docutils": [],
+    "pydoc_data": ["pydoc"],
+    "lib2to3": [],
+}
+
+# Runs inside the build interpreter: which of the given top-level modules it can import
+_INSTALLED_MODULES = (
+    "import importlib.util, json, sys\n"
+    "print(json.dumps([m for m in sys.argv[1:] if importlib.util.find_spec(m) is not None]))"
+)
+
+# Scanning fewer files than this isn't worth starting worker processes
+PARALLEL_THRESHOLD = 64
+
+_CACHE_VERSION = 2
+
+
+def _string_arg(node):
+    """The string literal passed as the first argument of a call, if any"""
+    if node.args and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str):
+        return node.args[0].value
+    return None
+
+
+def parse_imports(path):
+    """
+    Return the imports of one Python file.
+
+    Returns:
+        dict: ``imports`` as [level, module, [names]] entries, ``dynamic``
+        module names loaded via importlib/__import__ with a literal name,
+        ``docstrings`` if the code reads ``__doc__`` or calls ``getdoc``,
+        and ``error`` if the file couldn't be parsed
+    """
+    try:
+        with open(path, "rb") as f:
+            tree = ast.parse(f.read(), filename=path)
+    except (SyntaxError, ValueError, OSError) as e:
+        return {"imports": [], "dynamic": [], "docstrings": False, "error": str(e)}
+
+    imports = []
+    dynamic = []
+    docstrings = False
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id == "__doc__":
+            docstrings = True
+        elif isinstance(node, ast.Attribute) and node.attr in ("__doc__", "getdoc"):
+            docstrings = True
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                imports.append([0, alias.name, []])
+        elif isinstance(node, ast.ImportFrom):
+            imports.append([node.level, node.module or "", [a.name for a in node.names if a.name != "*"]])
+        elif isinstance(node, ast.Call):
+            func = node.func
+            name = func.attr if isinstance(func, ast.Attribute) else getattr(func, "id", None)
+            if name in ("import_module", "__import__"):
+                module = _string_arg(node)
+                if module and not module.startswith("."):
+                    dynamic.append(module)
+            elif name == "getdoc":
+                docstrings = True
+    return {"imports": imports, "dynamic": dynamic, "docstrings": docstrings, "error": None}
+
+
+def script_files(script, extra_scripts=()):
+    """
+    Find what a standalone script uses from its own folder.
+
+    A script built on its own may sit in a folder full of unrelated files,
+    such as the Desktop or the home folder. Rather than walking that folder,
+    this follows the scripts' imports to the sibling modules and packages
+    Python would load from it, and on through their imports.
+
+    Args:
+        script (str): The main script
+        extra_scripts: Further entry scripts in the same folder
+
+    Returns:
+        list: The scripts and the sibling module files and package folders they import
+    """
+    folder = os.path.dirname(os.path.abspath(script))
+    suffixes = [".py"] + importlib.machinery.EXTENSION_SUFFIXES
+    found = set()
+    pending = [os.path.abspath(path) for path in (script, *extra_scripts)]
+    while pending:
+        path = pending.pop()
+        if path in found:
+            continue
+        found.add(path)
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs[:] = [d for d in dirs if d not in SKIP_DIRS and not d.startswith(".")]
+                pending.extend(os.path.join(root, name) for name in files if name.endswith(".py"))
+            continue
+        if not path.endswith(".py"):
+            continue
+        scan = parse_imports(path)
+        # Relative imports stay inside a package, which is staged as a whole
+        names = [target for level, target, members in scan["imports"] if not level] + scan["dynamic"]
+        for top in {name.split(".")[0] for name in names if name}:
+            package = os.path.join(folder, top)
+            if os.path.isfile(os.path.join(package, "__init__.py")):
+                pending.append(package)
+                continue
+            pending.extend(package + suffix for suffix in suffixes if os.path.isfile(package + suffix))
+    # Modules inside the packages come along with their folder
+    return sorted(path for path in found if os.path.dirname(path) == folder)
+
+
+def exclude_candidates_command(python_exe):
+    """Command whose output installed_exclude_candidates() reads; runs alongside the other environment probes"""
+    return [python_exe, "-c", _INSTALLED_MODULES, *sorted(EXCLUDE_CANDIDATES)]
+
+
+def installed_exclude_candidates(result):
+    """
+    The EXCLUDE_CANDIDATES the build interpreter has, from a finished exclude_candidates_command().
+
+    Returns:
+        list: Installed candidates, or None if the probe failed (then all of them are considered)
+    """
+    if result.returncode != 0:
+        return None
+    try:
+        return json.loads(result.stdout)
+    except ValueError:
+        return None
+
+
+def _parse_batch(paths):
+    return [parse_imports(path) for path in paths]
+
+
+def find_modules(project_dir):
+    """Map dotted module names to the .py files of a project"""
+    modules = {}
+    for root, dirs, files in os.walk(project_dir):
+        dirs[:] = [d for d in dirs if d not in SKIP_DIRS and not d.startswith(".")
+                   and not os.path.exists(os.path.join(root, d, "pyvenv.cfg"))]
+        relative = os.path.relpath(root, project_dir)
+        package = [] if relative == "." else relative.split(os.sep)
+        for name in files:
+            if not name.endswith(".py"):
+                continue
+            if not all(p.isidentifier() for p in package):
+                continue
+            # Scripts like my-app.py can't be imported but can still be the entry point
+            parts = package + ([] if name == "__init__.py" else [name[:-3]])
+            if parts:
+                modules[".".join(parts)] = os.path.join(root, name)
+    return modules
+
+
+class ImportGraph:
+    """Imports between a project's modules and everything they import"""
+
+    def __init__(self, project_dir, modules, scans, parsed=0):
+        self.project_dir = project_dir
+        self.modules = modules  # module name -> path
+        self.scans = scans  # module name -> parse_imports() result
+        self.parsed = parsed  # files parsed this time rather than taken from the cache
+
+    def is_package(self, module):
+        return os.path.basename(self.modules.get(module, "")) == "__init__.py"
+
+    def local_module(self, name):
+        """The project module a dotted name refers to (longest matching prefix), or None"""
+        parts = name.split(".")
+        while parts:
+            candidate = ".".join(parts)
+            if candidate in self.modules:
+                return candidate
+            parts.pop()
+        return None
+
+    def imported_names(self, module):
+        """Absolute names imported by a module, with relative imports resolved"""
+        names = set()
+        package = module if self.is_package(module) else module.rpartition(".")[0]
+        for level, target, members in self.scans[module]["imports"]:
+            if level:
+                base = package.split(".") if package else []
+                base = base[:len(base) - (level - 1)] if level > 1 else base
+                target = ".".join(base + ([target] if target else []))
+                if not target:
+                    # "from . import x" at the top of the project
+                    names.update(members)
+                    continue
+            names.add(target)
+            # "from pkg import sub" may import a submodule
+            names.update(f"{target}.{member}" for member in members)
+        return names
+
+    def edges(self, module):
+        """Local modules a module imports"""
+        found = set()
+        for name in self.imported_names(module) | set(self.scans[module]["dynamic"]):
+            local = self.local_module(name)
+            if local and local != module:
+                found.add(local)
+                # Importing a.b.c runs a/__init__.py and a/b/__init__.py too
+                parts = local.split(".")
+                for i in range(1, len(parts)):
+                    if ".".join(parts[:i]) in self.modules:
+                        found.add(".".join(parts[:i]))
+        return found
+
+    def reachable(self, entry):
+        """Project modules reachable from an entry module, through static and literal dynamic imports"""
+        seen = set()
+        pending = [entry]
+        while pending:
+            module = pending.pop()
+            if module in seen or module not in self.modules:
+                continue
+            seen.add(module)
+            pending.extend(self.edges(module) - seen)
+        return seen
+
+    def external_imports(self, modules):
+        """Non-project names imported statically by the given modules"""
+        names = set()
+        for module in modules:
+            names.update(n for n in self.imported_names(module) if not self.local_module(n))
+        return names
+
+    def dynamic_imports(self, modules):
+        """Names the given modules load through importlib/__import__"""
+        names = set()
+        for module in modules:
+            names.update(self.scans[module]["dynamic"])
+        return names
+
+    def docstring_users(self, modules):
+        """The given modules that read docstrings at runtime"""
+        return sorted(module for module in modules if self.scans[module]["docstrings"])
+
+    @property
+    def errors(self):
+        """Files that couldn't be parsed, with the reason"""
+        return {self.modules[m]: s["error"] for m, s in self.scans.items() if s["error"]}
+
+
+def _cache_path(project_dir):
+    return os.path.join(get_cache_dir("imports"), hash_strings(os.path.abspath(project_dir))[:24] + ".json")
+
+
+def scan_project(project_dir, max_workers=None):
+    """
+    Parse every module of a project and return its import graph.
+
+    Results are cached per file. A file is parsed again only when its size
+    or modification time changed and its contents hash differs from the
+    cached one. Large scans are spread over worker processes.
+
+    Args:
+        project_dir (str): Folder containing the project's modules
+        max_workers (int): Worker processes for large scans (default: CPU count)
+
+    Returns:
+        ImportGraph: The project's modules and their imports
+    """
+    project_dir = os.path.abspath(project_dir)
+    modules = find_modules(project_dir)
+    cache_path = _cache_path(project_dir)
+    version = f"{_CACHE_VERSION}:{sys.version_info[0]}.{sys.version_info[1]}"
+
+    with file_lock(cache_path + ".lock"):
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached.get("version") != version:
+                cached = {}
+        except (OSError, ValueError):
+            cached = {}
+        cached_files = cached.get("files", {})
+
+        entries = {}
+        stale = []
+        for module, path in modules.items():
+            stat = os.stat(path)
+            entry = cached_files.get(path)
+            if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+                entries[path] = entry
+                continue
+            sha256 = hash_file(path)
+            if entry and entry["sha256"] == sha256:
+                entries[path] = dict(entry, mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+                continue
+            entries[path] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": sha256}
+            stale.append(path)
+
+        if len(stale) >= PARALLEL_THRESHOLD:
+            workers = max_workers or os.cpu_count() or 1
+            chunk = max(16, len(stale) // (workers * 4))
+            batches = [stale[i:i + chunk] for i in range(0, len(stale), chunk)]
+            context = multiprocessing.get_context("spawn")
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                results = [r for batch in pool.map(_parse_batch, batches) for r in batch]
+        else:
+            results = _parse_batch(stale)
+        for path, result in zip(stale, results):
+            entries[path]["result"] = result
+
+        if stale or len(entries) != len(cached_files):
+            with open(cache_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"version": version, "files": entries}, f)
+            os.replace(cache_path + ".tmp", cache_path)
+
+    scans = {module: entries[path]["result"] for module, path in modules.items()}
+    return ImportGraph(project_dir, modules, scans, parsed=len(stale))
+
+
+class ImportPlan:
+    """Hidden imports and excludes derived from a project's import graph"""
+
+    def __init__(self, hidden_imports, excludes, used_requirements, unused_requirements, modules, imports,
+                 docstring_modules=(), drop_unused=False):
+        self.hidden_imports = hidden_imports
+        self.excludes = excludes
+        self.used_requirements = used_requirements  # top-level modules of requirements the code imports
+        self.unused_requirements = unused_requirements  # requirement modules nothing imports
+        self.drop_unused = drop_unused  # whether the unused requirements are left out of the bundle
+        self.modules = modules  # project modules reachable from the entry script
+        self.imports = imports  # every non-project name imported anywhere in the project
+        self.docstring_modules = list(docstring_modules)  # reachable project modules reading __doc__
+
+    @property
+    def bundled_requirements(self):
+        """Top-level modules of the requirements that go into the bundle"""
+        if self.drop_unused:
+            return list(self.used_requirements)
+        return sorted(set(self.used_requirements) | set(self.unused_requirements))
+
+
+def plan_imports(graph, entry_file, deps=None, extra_packages=(), installed_candidates=None, drop_unused=False):
+    """
+    Work out the hidden imports and excludes for building an entry script.
+
+    Hidden imports cover what PyInstaller's own analysis misses: names
+    loaded through importlib/__import__, and requirements that are only
+    imported by project modules the entry script doesn't reach statically.
+    Requirements nothing imports are still bundled, since plugins loaded
+    through entry points or by a computed name look unused, unless
+    ``drop_unused`` says otherwise.
+
+    Excludes are limited to the fixed EXCLUDE_CANDIDATES, and only those
+    the build interpreter has and nothing in the project or its
+    requirements needs. Deciding from the graph alone which other
+    modules a library only imports optionally isn't possible, so the
+    list is deliberately short.
+
+    Args:
+        graph (ImportGraph): Result of scan_project()
+        entry_file (str): The script PyInstaller starts from, or a list of
+            scripts for a build with several entry points
+        deps (DependencySet): Resolved requirements, with map_imports() done; nothing
+            the requirements install or depend on is excluded
+        extra_packages: Modules the user asked to include
+        installed_candidates: Result of installed_exclude_candidates(), or None to consider them all
+        drop_unused (bool): Leave out requirements nothing imports
+
+    Returns:
+        ImportPlan: The options to pass to PyInstaller
+    """
+    entry_files = [entry_file] if isinstance(entry_file, str) else list(entry_file)
+    entries = [os.path.splitext(os.path.relpath(os.path.abspath(path), graph.project_dir))[0].replace(os.sep, ".")
+               for path in entry_files]
+    reachable = set()
+    for entry in entries:
+        reachable |= graph.reachable(entry)
+    everything = set(graph.modules)
+
+    static = graph.external_imports(reachable)
+    dynamic = graph.dynamic_imports(reachable)
+    anywhere = graph.external_imports(everything) | graph.dynamic_imports(everything)
+    top_levels = {name.split(".")[0] for name in anywhere}
+
+    requirement_modules = set(deps.top_level_modules) if deps is not None else set()
+    dependency_modules = set(deps.dependency_modules) if deps is not None else set()
+    used = sorted(requirement_modules & top_levels)
+    unused = sorted(requirement_modules - top_levels)
+
+    # Anything loaded by name, project modules included, is invisible to PyInstaller
+    hidden = set(dynamic)
+    static_tops = {name.split(".")[0] for name in static}
+    hidden.update(module for module in used if module not in static_tops)
+    if not drop_unused:
+        hidden.update(unused)
+    hidden.difference_update(entries)
+
+    keep = top_levels | requirement_modules | dependency_modules | {p.split(".")[0] for p in extra_packages}
+    candidates = EXCLUDE_CANDIDATES if installed_candidates is None else \
+        {module: users for module, users in EXCLUDE_CANDIDATES.items() if module in installed_candidates}
+    excludes = sorted(
+        module for module, users in candidates.items()
+        if module not in keep and not any(user in keep for user in users)
+    )
+    return ImportPlan(sorted(hidden), excludes, used, unused, sorted(reachable), sorted(anywhere),
+                      graph.docstring_users(reachable), drop_unused)
@@ -0,0 +1,131 @@
+"""
+Multi-entry builds for Lightning EXE.
+
+A project folder often ships several small tools that import the same
+libraries. Building them one at a time repeats PyInstaller's Analysis over
+the same dependency closure for every tool and stores a full copy of every
+shared library next to each executable.
+
+A target can list extra entry scripts next to its main file. All of them go
+into a single Analysis, and the generated spec is rewritten to package one
+executable per entry point into one application folder, so the tools share
+a single ``_internal`` runtime and every library is on disk once. Each
+executable still carries its own copy of the compressed Python modules
+(the PYZ archive), which PyInstaller embeds in the executable itself.
+"""
+import os
+import re
+
+# What makespec writes for the executable and the folder collecting it
+_EXE_BLOCK = re.compile(r"^exe = EXE\(\n(.*?)^\)\n", re.MULTILINE | re.DOTALL)
+_NAME_ARG = re.compile(r"^    name=.*,\n", re.MULTILINE)
+
+
+def split_entry_points(value):
+    """The entry scripts listed in a comma-separated option"""
+    return [entry.strip() for entry in (value or "").split(",") if entry.strip()]
+
+
+def executable_names(main_name, entry_points):
+    """
+    Names of the executables in a multi-entry build.
+
+    The main file's executable keeps the target's name, so the folder still
+    starts the same program; every other one is named after its script.
+
+    Args:
+        main_name (str): Name of the main executable and the folder
+        entry_points (list): Extra entry scripts
+
+    Returns:
+        list: Executable names, main first
+    """
+    return [main_name] + [os.path.splitext(os.path.basename(entry))[0] for entry in entry_points]
+
+
+def check_entry_points(main_name, entry_points):
+    """
+    Check that every entry point gets an executable name of its own.
+
+    Returns:
+        str: An error message, or None
+    """
+    for entry in entry_points:
+        if not entry.endswith(".py"):
+            return f"Entry point '{entry}' is not a .py file"
+    names = executable_names(main_name, entry_points)
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        return f"Two entry points would both produce an executable named '{duplicates[0]}'"
+    return None
+
+
+def resolve_entry_points(source_file, entry_points):
+    """
+    Locate the extra entry scripts in the main file's folder.
+
+    Args:
+        source_file (str): The main entry script
+        entry_points (list): Extra entry scripts, relative to its folder
+
+    Returns:
+        list: Absolute paths of the extra entry scripts
+
+    Raises:
+        Exception: If one is missing or outside the project folder
+    """
+    project_dir = os.path.dirname(os.path.abspath(source_file))
+    paths = []
+    for entry in entry_points:
+        path = os.path.normpath(os.path.join(project_dir, entry))
+        if os.path.commonpath([project_dir, path]) != project_dir:
+            raise Exception(f"Entry point '{entry}' is outside the project folder")
+        if not os.path.isfile(path):
+            raise Exception(f"Entry point not found in the project folder: {entry}")
+        paths.append(path)
+    return paths
+
+
+def rewrite_spec(spec_path, names):
+    """
+    Turn a spec makespec wrote for several scripts into one executable per script.
+
+    makespec runs all scripts of an Analysis one after another in a single
+    executable. The rewritten spec keeps the Analysis and PYZ, gives every
+    executable the runtime hooks plus its own script, and collects them all,
+    with the binaries and data files once, into the same folder.
+
+    Args:
+        spec_path (str): Spec generated for a one-folder build of the scripts
+        names (list): Executable name for each script, in Analysis order
+
+    Raises:
+        Exception: If the spec doesn't have the layout makespec writes
+    """
+    with open(spec_path, "r", encoding="utf-8") as f:
+        spec = f.read()
+
+    block = _EXE_BLOCK.search(spec)
+    collect = "coll = COLLECT(\n    exe,\n"
+    if block is None or "    a.scripts,\n" not in block.group(1) or not _NAME_ARG.search(block.group(1)) \
+            or collect not in spec:
+        raise Exception(f"Could not set up the entry points: unexpected spec layout in {spec_path}")
+
+    arguments = block.group(1).replace("    a.scripts,\n", "    scripts,\n")
+    arguments = _NAME_ARG.sub("    name=name,\n", arguments, count=1)
+    loop = (
+        "# One executable per entry point, sharing the Analysis above and the folder below\n"
+        f"entry_names = {names!r}\n"
+        "runtime_scripts = a.scripts[:-len(entry_names)]\n"
+        "exes = []\n"
+        "for index, name in enumerate(entry_names):\n"
+        "    scripts = runtime_scripts + [a.scripts[len(runtime_scripts) + index]]\n"
+        "    exes.append(EXE(\n"
+        + "".join("    " + line for line in arguments.splitlines(True))
+        + "    ))\n"
+    )
+    spec = spec[:block.start()] + loop + spec[block.end():]
+    spec = spec.replace(collect, "coll = COLLECT(\n    *exes,\n", 1)
+
+    with open(spec_path, "w", encoding="utf-8") as f:
+        f.write(spec)
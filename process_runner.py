@@ -0,0 +1,288 @@
+"""
+Subprocess orchestration for Lightning EXE.
+
+Every external command a build runs (git, pip, probes of the build
+interpreter, the C compiler, codesign and PyInstaller itself) goes through
+here. The exceptions are processes whose lifetime isn't a build step: the
+executables startup_bench times (it needs its own wall-clock and memory
+measurements and kills them itself), the warm interpreters of the build
+daemon, and the application the frozen fast-start launcher starts. Commands run on
+asyncio, so their output is streamed as it arrives instead of being
+polled, and several independent commands can run at once. Each kind of
+command has a time limit and, where it prints progress, a limit on how
+long it may stay silent. A command that runs past either limit is killed
+together with everything it started, and so is every running command
+when the build is cancelled.
+
+A process that builds repeatedly (the build daemon) can install a pool of
+warm interpreters with use_warm_pool(); Python commands are then forked
+from an interpreter that already imported PyInstaller instead of being
+started from scratch, with the same limits and cancellation.
+"""
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+# Seconds a command may run in total, and without printing anything (None = no limit).
+# Override the total with e.g. LIGHTNING_EXE_PIP_TIMEOUT=7200.
+PHASE_TIMEOUTS = {
+    "git": (1800, None),
+    "pip": (3600, None),  # pip runs with --quiet, so silence means nothing
+    "probe": (300, None),
+    "pyinstaller": (3600, 900),
+}
+PHASE_LABELS = {"git": "git", "pip": "pip", "probe": "The build interpreter", "pyinstaller": "PyInstaller"}
+
+_warm_pool = None  # warm_interpreter.WarmPool, see use_warm_pool()
+
+
+class ProcessCancelled(Exception):
+    """The build was cancelled while a command was running"""
+
+
+class ProcessTimeout(Exception):
+    """A command ran past its time limit and was killed"""
+
+
+def phase_timeouts(phase):
+    """(total, idle) time limits for a kind of command"""
+    total, idle = PHASE_TIMEOUTS.get(phase, (None, None))
+    override = os.environ.get(f"LIGHTNING_EXE_{phase.upper()}_TIMEOUT")
+    if override:
+        total = float(override) or None
+    return total, idle
+
+
+def use_warm_pool(pool):
+    """
+    Fork Python commands from warm interpreters from now on.
+
+    Args:
+        pool (WarmPool): The interpreters to use, or None to start every command cold again
+    """
+    global _warm_pool
+    _warm_pool = pool
+
+
+def kill_tree(pid):
+    """Kill a process started by run_process and everything it started"""
+    try:
+        if sys.platform == "win32":
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(pid)], capture_output=True)
+        else:
+            # Commands are started in their own session, so the group id is their pid
+            os.killpg(pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+
+class CancelToken:
+    """Shared between a build and whatever may cancel it, e.g. a Cancel button"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._pids = set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        """Stop the build: kill every running command and refuse to start new ones"""
+        self._event.set()
+        with self._lock:
+            pids = list(self._pids)
+        for pid in pids:
+            kill_tree(pid)
+
+    def check(self):
+        """
+        Raises:
+            ProcessCancelled: If the build was cancelled
+        """
+        if self.cancelled:
+            raise ProcessCancelled("Build cancelled")
+
+    def _register(self, pid):
+        with self._lock:
+            self._pids.add(pid)
+        # Cancelled between starting the process and registering it
+        if self.cancelled:
+            kill_tree(pid)
+
+    def _unregister(self, pid):
+        with self._lock:
+            self._pids.discard(pid)
+
+
+class ProcessResult:
+    """Outcome of one command"""
+
+    def __init__(self, cmd, returncode, stdout, stderr, duration):
+        self.cmd = cmd
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr  # empty when stderr was merged into stdout
+        self.duration = duration
+
+    def check(self):
+        """
+        Raises:
+            subprocess.CalledProcessError: If the command failed
+        """
+        if self.returncode != 0:
+            raise subprocess.CalledProcessError(self.returncode, self.cmd, self.stdout, self.stderr or self.stdout)
+        return self
+
+
+async def _pump(stream, sink, line_callback, activity):
+    while True:
+        line = await stream.readline()
+        if not line:
+            break
+        text = line.decode("utf-8", "replace")
+        sink.append(text)
+        activity[0] = time.monotonic()
+        if line_callback is not None:
+            line_callback(text)
+
+
+async def run_process(cmd, line_callback=None, phase="probe", cancel=None, env=None, cwd=None, merge_stderr=True,
+                      warm=True):
+    """
+    Run a command to completion.
+
+    Args:
+        cmd (list): Program and arguments
+        line_callback: Called with every line of output as it arrives
+        phase (str): Kind of command, selecting its PHASE_TIMEOUTS
+        cancel (CancelToken): Kills the command when cancelled
+        env (dict): Environment (default: inherited)
+        cwd (str): Working directory
+        merge_stderr (bool): Read stderr as part of stdout
+        warm (bool): Fork it from a warm interpreter when there is a pool (see use_warm_pool)
+
+    Returns:
+        ProcessResult: Exit code and output
+
+    Raises:
+        ProcessCancelled: If the build was cancelled
+        ProcessTimeout: If the command ran past a time limit
+    """
+    if cancel is not None:
+        cancel.check()
+    total, idle = phase_timeouts(phase)
+    kwargs = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP} if sys.platform == "win32" \
+        else {"start_new_session": True}
+
+    start = time.monotonic()
+    interpreter = _warm_pool.interpreter_for(cmd, env) if warm and _warm_pool is not None else None
+    if interpreter is not None:
+        process = await interpreter.spawn(cmd, cwd=cwd, merge_stderr=merge_stderr)
+    else:
+        process = await asyncio.create_subprocess_exec(
+            *cmd, stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT if merge_stderr else asyncio.subprocess.PIPE,
+            env=env, cwd=cwd, **kwargs)
+    if cancel is not None:
+        cancel._register(process.pid)
+
+    stdout, stderr = [], []
+    activity = [start]
+    readers = [asyncio.ensure_future(_pump(process.stdout, stdout, line_callback, activity))]
+    if not merge_stderr:
+        readers.append(asyncio.ensure_future(_pump(process.stderr, stderr, None, activity)))
+    waiter = asyncio.ensure_future(asyncio.gather(process.wait(), *readers))
+
+    timed_out = None
+    try:
+        while not waiter.done():
+            await asyncio.wait([waiter], timeout=0.25)
+            if waiter.done():
+                break
+            now = time.monotonic()
+            if cancel is not None and cancel.cancelled:
+                kill_tree(process.pid)
+            elif total is not None and now - start > total:
+                timed_out = f"ran for more than {total:.0f}s"
+                kill_tree(process.pid)
+            elif idle is not None and now - activity[0] > idle:
+                timed_out = f"printed nothing for {idle:.0f}s"
+                kill_tree(process.pid)
+            else:
+                continue
+            # Killed: the pipes close once every process in the tree is gone
+            await waiter
+    finally:
+        if cancel is not None:
+            cancel._unregister(process.pid)
+        if not waiter.done():
+            kill_tree(process.pid)
+            waiter.cancel()
+
+    if cancel is not None and cancel.cancelled:
+        raise ProcessCancelled("Build cancelled")
+    if timed_out:
+        raise ProcessTimeout(f"{PHASE_LABELS.get(phase, os.path.basename(cmd[0]))} {timed_out} and was stopped")
+    return ProcessResult(cmd, process.returncode, "".join(stdout), "".join(stderr), time.monotonic() - start)
+
+
+def _run_sync(coroutine):
+    """Run a coroutine to completion from synchronous code, even inside a running event loop"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    # Called from a coroutine (e.g. a GUI handler): give the command a loop of its own
+    outcome = {}
+
+    def target():
+        try:
+            outcome["result"] = asyncio.run(coroutine)
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join()
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
+
+
+def run(cmd, **kwargs):
+    """Synchronous run_process(); same arguments"""
+    return _run_sync(run_process(cmd, **kwargs))
+
+
+def run_concurrently(commands, return_errors=False, **kwargs):
+    """
+    Run independent commands at the same time.
+
+    Args:
+        commands (list): Command lists
+        return_errors (bool): Put the exception in place of the result of a command that
+            couldn't be started or was stopped, instead of raising it
+        **kwargs: Passed to run_process for every command
+
+    Returns:
+        list: ProcessResult for each command, in order
+
+    Raises:
+        ProcessCancelled, ProcessTimeout: After every command has finished, if any was stopped
+    """
+    async def run_all():
+        return await asyncio.gather(*(run_process(cmd, **kwargs) for cmd in commands), return_exceptions=True)
+
+    results = _run_sync(run_all())
+    if return_errors:
+        return results
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
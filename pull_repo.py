@@ -2,39 +2,177 @@ import os
 import shutil
 import subprocess
 
-def clone_github_repo(github_url, repo_dir):
+import process_runner
+from cache_utils import file_lock, get_cache_dir, hash_strings
+
+
+def _report(status_callback, message, status_type="info"):
+    """Pass a message to the build's status callback, or print it when there is none"""
+    if status_callback is not None:
+        status_callback(message, status_type)
+    else:
+        print(message)
+
+
+def _git(args, cancel=None, echo=True, status_callback=None):
+    """
+    Run git under the git time limit, reporting its output as status lines.
+
+    Returns:
+        ProcessResult: The finished command
+
+    Raises:
+        subprocess.CalledProcessError: If git fails
+        ProcessCancelled: If the build was cancelled
+        ProcessTimeout: If git hangs, e.g. waiting on the network
+    """
+    def on_line(line):
+        if line.strip():
+            _report(status_callback, line.rstrip(), "info")
+
+    line_callback = on_line if echo else None
+    return process_runner.run(["git", *args], line_callback=line_callback, phase="git", cancel=cancel).check()
+
+
+def get_mirror_path(github_url):
+    """Return where the bare mirror of a repository is cached"""
+    name = os.path.basename(github_url.rstrip("/"))
+    if name.endswith(".git"):
+        name = name[:-4]
+    return os.path.join(get_cache_dir("mirrors"), f"{name}-{hash_strings(github_url)[:16]}.git")
+
+
+def update_mirror(github_url, cancel=None, status_callback=None):
+    """
+    Create or refresh the cached bare mirror of a repository.
+    
+    The first call clones the full repository once; later calls only
+    fetch what changed upstream. The mirror is deliberately not shallow:
+    a ref may name any commit, and fetching into a shallow mirror costs
+    more on every build than the one-time full clone saves.
+    
+    Args:
+        github_url (str): The URL of the repository
+        cancel (CancelToken): Stops git when the build is cancelled
+        status_callback: Called as ``status_callback(message, status_type)`` with
+            progress and git's output (printed when None)
+        
+    Returns:
+        str: Path of the bare mirror
+    """
+    mirror_dir = get_mirror_path(github_url)
+    if os.path.exists(os.path.join(mirror_dir, "HEAD")):
+        _report(status_callback, f"Fetching updates for {github_url}...")
+        _git(["--git-dir", mirror_dir, "fetch", "--prune", "--quiet", "origin"], cancel,
+             status_callback=status_callback)
+    else:
+        if os.path.exists(mirror_dir):
+            # Left behind by an interrupted clone
+            shutil.rmtree(mirror_dir)
+        _report(status_callback, f"Creating local mirror of {github_url}...")
+        _git(["clone", "--mirror", "--quiet", github_url, mirror_dir], cancel, status_callback=status_callback)
+    return mirror_dir
+
+
+def checkout_from_mirror(github_url, repo_dir, ref=None, cancel=None, status_callback=None):
+    """
+    Check out a repository at ``ref`` using the local mirror cache.
+    
+    The checkout is a detached worktree of the bare mirror, so it shares the
+    mirror's objects instead of copying the repository history.
+    
+    Args:
+        github_url (str): The URL of the repository
+        repo_dir (str): Directory for the checkout (must not exist yet)
+        ref (str): Branch, tag or commit to check out (default branch if None)
+        cancel (CancelToken): Stops git when the build is cancelled
+        status_callback: Called as ``status_callback(message, status_type)`` with
+            progress and git's output (printed when None)
+        
+    Returns:
+        str: The commit that was checked out
+    """
+    mirror_dir = get_mirror_path(github_url)
+    with file_lock(mirror_dir + ".lock"):
+        update_mirror(github_url, cancel, status_callback)
+        # Forget worktrees whose folders were deleted without 'git worktree remove'
+        _git(["--git-dir", mirror_dir, "worktree", "prune"], cancel, status_callback=status_callback)
+        _git(["--git-dir", mirror_dir, "worktree", "add", "--detach", "--quiet",
+              os.path.abspath(repo_dir), ref or "HEAD"], cancel, status_callback=status_callback)
+    commit = _git(["-C", repo_dir, "rev-parse", "HEAD"], cancel, echo=False).stdout.strip()
+    _report(status_callback, f"Checked out {ref or 'default branch'} at {commit[:12]}")
+    return commit
+
+
+def remove_checkout(repo_dir):
+    """
+    Delete a checkout created by clone_github_repo.
+    
+    Args:
+        repo_dir (str): The checkout directory
+    """
+    if os.path.exists(os.path.join(repo_dir, ".git")) and os.path.isfile(os.path.join(repo_dir, ".git")):
+        # Worktree of a cached mirror: let git unregister it too
+        # Cleanup also runs after a cancelled build, so it doesn't take the cancel token
+        result = process_runner.run(["git", "-C", repo_dir, "worktree", "remove", "--force", "."], phase="git")
+        if result.returncode == 0:
+            return
+    shutil.rmtree(repo_dir, ignore_errors=True)
+
+
+def clone_github_repo(github_url, repo_dir, ref=None, use_mirror=True, cancel=None, status_callback=None):
     """
     Clone a GitHub repository to the specified directory.
     
     Args:
         github_url (str): The URL of the GitHub repository to clone
         repo_dir (str): The directory where to clone the repository
+        ref (str): Branch, tag or commit to check out (default branch if None)
+        use_mirror (bool): Check out from the local mirror cache instead of
+            doing a full clone
+        cancel (CancelToken): Stops git when the build is cancelled
+        status_callback: Called as ``status_callback(message, status_type)`` with
+            progress and git's output (printed when None)
         
     Returns:
         bool: True if successful, raises exception otherwise
         
     Raises:
         Exception: If any error occurs during the process
+        ProcessCancelled: If the build was cancelled
     """
+    if use_mirror:
+        if os.path.exists(repo_dir):
+            _report(status_callback, f"Removing existing directory {repo_dir}...")
+            remove_checkout(repo_dir)
+        os.makedirs(os.path.dirname(os.path.abspath(repo_dir)), exist_ok=True)
+        try:
+            checkout_from_mirror(github_url, repo_dir, ref, cancel, status_callback)
+            return True
+        except subprocess.CalledProcessError as e:
+            error_msg = f"Failed to clone repository. Make sure the URL and ref are correct and you have git installed. Command returned: {e}"
+            _report(status_callback, f"Error: {error_msg}", "error")
+            raise Exception(error_msg)
+        
     # Clean up if repo directory already exists
     if os.path.exists(repo_dir):
         try:
             # First try to update if it's a git repo
             if os.path.exists(os.path.join(repo_dir, '.git')):
-                print(f"Repository directory already exists. Attempting to update...")
+                _report(status_callback, "Repository directory already exists. Attempting to update...")
                 current_dir = os.getcwd()
                 try:
                     # Try to update the repo
                     os.chdir(repo_dir)
-                    subprocess.run(["git", "fetch", "--all"], check=True)
-                    subprocess.run(["git", "reset", "--hard", "origin/main"], check=True)
-                    print("Repository updated successfully!")
+                    _git(["fetch", "--all"], cancel, status_callback=status_callback)
+                    _git(["reset", "--hard", "origin/main"], cancel, status_callback=status_callback)
+                    _report(status_callback, "Repository updated successfully!", "success")
                     os.chdir(current_dir)
                     return True
                 except subprocess.CalledProcessError:
                     # If update fails, fall back to deleting and cloning
                     os.chdir(current_dir)
-                    print("Couldn't update repository. Removing and cloning fresh...")
+                    _report(status_callback, "Couldn't update repository. Removing and cloning fresh...", "warning")
                     shutil.rmtree(repo_dir)
                 except Exception as e:
                     # Make sure we return to the original directory
@@ -42,10 +180,12 @@ def clone_github_repo(github_url, repo_dir):
                     raise e
             else:
                 # Not a git repo, just remove it
-                print(f"Removing existing directory {repo_dir}...")
+                _report(status_callback, f"Removing existing directory {repo_dir}...")
                 shutil.rmtree(repo_dir)
+        except process_runner.ProcessCancelled:
+            raise
         except Exception as e:
-            print(f"Warning handling existing repository: {e}")
+            _report(status_callback, f"Warning handling existing repository: {e}", "warning")
             # Continue even if we couldn't handle the old repo
     
     # Create a new empty repo directory
@@ -53,20 +193,24 @@ def clone_github_repo(github_url, repo_dir):
         os.makedirs(repo_dir, exist_ok=True)
     except Exception as e:
         error_msg = f"Could not create repository directory: {str(e)}"
-        print(f"Error: {error_msg}")
+        _report(status_callback, f"Error: {error_msg}", "error")
         raise Exception(error_msg)
     
     try:
         # Clone the repository
-        print(f"Cloning {github_url} into '{repo_dir}'...")
-        subprocess.run(["git", "clone", github_url, repo_dir], check=True)
-        print("Repository cloned successfully!")
+        _report(status_callback, f"Cloning {github_url} into '{repo_dir}'...")
+        _git(["clone", github_url, repo_dir], cancel, status_callback=status_callback)
+        if ref:
+            _git(["-C", repo_dir, "checkout", "--detach", ref], cancel, status_callback=status_callback)
+        _report(status_callback, "Repository cloned successfully!", "success")
         return True
     except subprocess.CalledProcessError as e:
         error_msg = f"Failed to clone repository. Make sure the URL is correct and you have git installed. Command returned: {e}"
-        print(f"Error: {error_msg}")
+        _report(status_callback, f"Error: {error_msg}", "error")
         raise subprocess.CalledProcessError(e.returncode, e.cmd, e.output, e.stderr, error_msg)
+    except process_runner.ProcessCancelled:
+        raise
     except Exception as e:
         error_msg = f"An unexpected error occurred during cloning: {str(e)}"
-        print(f"Error: {error_msg}")
+        _report(status_callback, f"Error: {error_msg}", "error")
         raise Exception(error_msg)
@@ -0,0 +1,294 @@
+"""
+Requirements resolver for Lightning EXE.
+
+Parses a project's requirements files once, following ``-r``/``-c``
+includes and evaluating environment markers for the build interpreter,
+and maps distribution names to the modules they actually install
+(``Pillow`` -> ``PIL``, ``PyYAML`` -> ``yaml``, ``beautifulsoup4`` -> ``bs4``).
+The resulting DependencySet is shared by every later build stage.
+"""
+import json
+import os
+import re
+import sys
+
+import process_runner
+import toolchains
+from cache_utils import hash_strings
+
+REQUIREMENTS_FILENAMES = ["requirements.txt", "requirements.pip", "reqs.txt"]
+
+# Lines that read another requirements (-r) or constraints (-c) file
+_INCLUDE = re.compile(r"^(-r|--requirement|-c|--constraint)\s*=?\s*(.+)$")
+
+try:
+    from packaging.requirements import InvalidRequirement, Requirement as _PEP508
+except ImportError:
+    try:
+        from pip._vendor.packaging.requirements import InvalidRequirement, Requirement as _PEP508
+    except ImportError:
+        # Without packaging, names are split off by hand and markers aren't evaluated
+        _PEP508 = None
+
+# Runs inside the build interpreter: top-level modules of every installed distribution
+_TOP_LEVEL_MODULES = r"""
+import importlib.metadata as md, json, re
+out = {}
+requires = {}
+for dist in md.distributions():
+    name = re.sub(r"[-_.]+", "-", dist.metadata["Name"] or "").lower()
+    for line in dist.requires or []:
+        match = re.match(r"\s*([A-Za-z0-9][A-Za-z0-9._-]*)", line)
+        if match and "extra" not in line.partition(";")[2]:
+            requires.setdefault(name, []).append(re.sub(r"[-_.]+", "-", match.group(1)).lower())
+    top = dist.read_text("top_level.txt")
+    modules = set(top.split()) if top else set()
+    if not modules:
+        for f in dist.files or []:
+            parts = f.parts
+            if not parts or parts[0] in ("..", "__pycache__", "bin", "Scripts"):
+                continue
+            if parts[0].endswith((".dist-info", ".egg-info", ".data", ".pth")):
+                continue
+            if len(parts) > 1:
+                modules.add(parts[0])
+            elif parts[0].endswith(".py"):
+                modules.add(parts[0][:-3])
+            elif parts[0].endswith((".so", ".pyd")):
+                modules.add(parts[0].split(".")[0])
+    modules = {m.replace("/", ".") for m in modules if m.replace("/", "").isidentifier()}
+    out.setdefault(name, [])
+    out[name] = sorted(set(out[name]) | modules)
+print(json.dumps({"modules": out, "requires": requires}))
+"""
+
+
+def normalize_name(name):
+    """PEP 503 normalized distribution name"""
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def interpreter_info(python_exe):
+    """Return the version string and marker environment of an interpreter, from the toolchain registry"""
+    info = toolchains.lookup(python_exe).info
+    return {"version": info["version"], "environment": info["environment"]}
+
+
+class Requirement:
+    """One requirement line from a requirements file"""
+
+    def __init__(self, line, source, name=None, marker=None, active=True):
+        self.line = line
+        self.source = source  # "path:lineno"
+        self.name = name  # None for unnamed URLs/paths
+        self.marker = marker
+        self.active = active  # False when the marker excludes this interpreter
+
+    @property
+    def key(self):
+        return normalize_name(self.name) if self.name else None
+
+    def __repr__(self):
+        return f"<Requirement {self.line!r} from {self.source}{'' if self.active else ' (inactive)'}>"
+
+
+def find_requirements_files(project_dir):
+    """Return the requirements files found in the project directory"""
+    return [os.path.join(project_dir, name) for name in REQUIREMENTS_FILENAMES
+            if os.path.exists(os.path.join(project_dir, name))]
+
+
+def included_requirements_files(requirement_files):
+    """The requirements files plus every file they pull in with -r or -c"""
+    found = []
+    pending = [os.path.abspath(path) for path in requirement_files]
+    while pending:
+        path = pending.pop(0)
+        if path in found or not os.path.isfile(path):
+            continue
+        found.append(path)
+        with open(path, "r", encoding="utf-8") as f:
+            for raw in f.read().replace("\\\n", " ").splitlines():
+                include = _INCLUDE.match(re.sub(r"(^|\s)#.*$", "", raw).strip())
+                if include:
+                    pending.append(os.path.normpath(os.path.join(os.path.dirname(path), include.group(2).strip())))
+    return found
+
+
+def _strip_options(line):
+    """Drop per-requirement pip options such as --hash"""
+    return re.split(r"\s+--?[a-zA-Z]", line, maxsplit=1)[0].strip()
+
+
+def _parse_line(line, source, environment):
+    """Turn a requirement line into a Requirement"""
+    editable = line.startswith(("-e ", "--editable "))
+    text = line.split(None, 1)[1] if editable else _strip_options(line)
+
+    egg = re.search(r"#egg=([A-Za-z0-9_.\-]+)", text)
+    if editable or re.match(r"^(\w+\+)?\w+://|^[./\\]", text):
+        return Requirement(line, source, name=egg.group(1) if egg else None)
+
+    if _PEP508 is None:
+        name = re.split(r"[\s\[<>=!~;@]", text, maxsplit=1)[0]
+        return Requirement(line, source, name=name or None)
+
+    try:
+        parsed = _PEP508(text)
+    except InvalidRequirement:
+        return Requirement(line, source, name=None)
+    active = True
+    if parsed.marker is not None:
+        try:
+            active = parsed.marker.evaluate(environment)
+        except Exception:
+            active = True
+    return Requirement(line, source, name=parsed.name,
+                       marker=str(parsed.marker) if parsed.marker else None, active=active)
+
+
+class DependencySet:
+    """Everything known about a project's dependencies for one build interpreter"""
+
+    def __init__(self, requirement_files, python_exe, python_version, environment):
+        self.requirement_files = requirement_files
+        self.python_exe = python_exe
+        self.python_version = python_version
+        self.environment = environment
+        self.requirements = []  # every requirement line, in file order
+        self.constraints = []  # lines from -c files, which never add packages
+        self.options = []  # global pip options such as --index-url
+        self.import_names = {}  # normalized distribution name -> top-level modules
+        self.dependency_modules = []  # top-level modules of the requirements and everything they pull in
+        self.missing = []  # active distributions that aren't installed
+
+    @property
+    def active(self):
+        """Requirements that apply to the build interpreter"""
+        return [r for r in self.requirements if r.active]
+
+    @property
+    def names(self):
+        """Normalized names of the active named requirements"""
+        return sorted({r.key for r in self.active if r.key})
+
+    @property
+    def key(self):
+        """
+        Hash of everything that decides which packages get installed.
+
+        This covers the requirement lines, not the versions they resolve to:
+        resolving needs the package index on every build, which would defeat
+        warm and offline builds. An unpinned requirement therefore keeps the
+        version of its first resolution until the requirements change or the
+        environment is pruned.
+        """
+        return hash_strings(
+            os.path.abspath(self.python_exe),
+            self.python_version,
+            *sorted({r.line for r in self.active}),
+            *sorted(set(self.constraints)),
+            *self.options
+        )
+
+    def modules_for(self, name):
+        """Top-level modules installed by a distribution"""
+        return self.import_names.get(normalize_name(name), [])
+
+    @property
+    def top_level_modules(self):
+        """Importable top-level modules of all active requirements"""
+        modules = set()
+        for name in self.names:
+            public = [m for m in self.modules_for(name) if not m.startswith("_")]
+            modules.update(public or self.modules_for(name))
+        return sorted(modules)
+
+    def import_names_command(self, python_exe=None):
+        """Command whose output apply_import_names() reads; lets callers run it alongside other probes"""
+        return [python_exe or self.python_exe, "-c", _TOP_LEVEL_MODULES]
+
+    def apply_import_names(self, result):
+        """
+        Record the modules installed by each requirement from a finished import_names_command().
+
+        Args:
+            result (ProcessResult): The command's outcome
+
+        Returns:
+            list: Active distributions that aren't installed
+        """
+        probe = json.loads(result.stdout) if result.returncode == 0 else {}
+        installed, requires = probe.get("modules", {}), probe.get("requires", {})
+        self.import_names = {name: installed[name] for name in self.names if name in installed}
+        self.missing = [name for name in self.names if name not in installed]
+
+        # Walk the installed dependencies, so nothing a requirement needs is mistaken for unused
+        seen = set()
+        pending = [name for name in self.names if name in installed]
+        while pending:
+            name = pending.pop()
+            if name in seen or name not in installed:
+                continue
+            seen.add(name)
+            pending.extend(requires.get(name, []))
+        self.dependency_modules = sorted({module for name in seen for module in installed[name]})
+        return self.missing
+
+    def map_imports(self, python_exe=None, cancel=None):
+        """
+        Look up the modules installed by each requirement in an interpreter.
+
+        Args:
+            python_exe (str): Interpreter with the requirements installed
+                (defaults to the interpreter the set was resolved for)
+            cancel (CancelToken): Stops the lookup when the build is cancelled
+
+        Returns:
+            list: Active distributions that aren't installed there
+        """
+        return self.apply_import_names(process_runner.run(self.import_names_command(python_exe),
+                                                          cancel=cancel, merge_stderr=False))
+
+    def _read(self, path, seen, constraint=False):
+        path = os.path.abspath(path)
+        if path in seen:
+            return
+        seen.add(path)
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.read().replace("\\\n", " ").splitlines()
+        for lineno, raw in enumerate(lines, 1):
+            line = re.sub(r"(^|\s)#.*$", "", raw).strip()
+            if not line:
+                continue
+            include = _INCLUDE.match(line)
+            if include:
+                flag, included = include.groups()
+                self._read(os.path.join(os.path.dirname(path), included.strip()), seen,
+                           constraint=constraint or flag in ("-c", "--constraint"))
+            elif constraint:
+                self.constraints.append(line)
+            elif line.startswith("-") and not line.startswith(("-e ", "--editable ")):
+                self.options.append(line)
+            else:
+                self.requirements.append(_parse_line(line, f"{path}:{lineno}", self.environment))
+
+
+def resolve_dependencies(requirement_files, python_exe=None):
+    """
+    Parse requirements files for a build interpreter.
+
+    Args:
+        requirement_files (list): The project's top-level requirements files
+        python_exe (str): Interpreter whose environment markers apply
+
+    Returns:
+        DependencySet: Parsed requirements; call map_imports() once they're installed
+    """
+    python_exe = python_exe or sys.executable
+    info = interpreter_info(python_exe)
+    deps = DependencySet(list(requirement_files), python_exe, info["version"], info["environment"])
+    seen = set()
+    for path in requirement_files:
+        deps._read(path, seen)
+    return deps
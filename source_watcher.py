@@ -0,0 +1,117 @@
+"""
+Source watching for Lightning EXE's watch mode.
+
+Watch mode rebuilds a folder project whenever its files change. The folder
+is polled, which needs no extra packages and behaves the same on every
+platform and file system, including network shares. Editors often write a
+file several times per save, and a "save all" or branch switch touches
+many files at once, so changes are collected until the folder has been
+quiet for a moment and then handled as one rebuild.
+"""
+import os
+import time
+
+from import_scanner import SKIP_DIRS
+
+
+def snapshot(root, exclude=()):
+    """
+    Record the size and modification time of every file in a folder.
+
+    Args:
+        root (str): Folder to scan
+        exclude: Files and folders inside it to leave out, e.g. the build output
+
+    Returns:
+        dict: Path -> (mtime_ns, size)
+    """
+    excluded = {os.path.abspath(path) for path in exclude}
+    files = {}
+    for dirpath, dirs, names in os.walk(os.path.abspath(root)):
+        dirs[:] = [d for d in dirs if d not in SKIP_DIRS and os.path.join(dirpath, d) not in excluded
+                   and not os.path.exists(os.path.join(dirpath, d, "pyvenv.cfg"))]
+        for name in names:
+            path = os.path.join(dirpath, name)
+            if path in excluded or name.endswith((".pyc", ".swp", "~")):
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files[path] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+
+def changed_files(before, after):
+    """Paths added, removed or modified between two snapshots"""
+    return sorted(path for path in set(before) | set(after) if before.get(path) != after.get(path))
+
+
+class ChangeSet:
+    """A burst of changes handled by one rebuild"""
+
+    def __init__(self, paths, saved_at):
+        self.paths = paths
+        self.saved_at = saved_at  # wall-clock time of the first save in the burst
+
+    def describe(self, root):
+        names = [os.path.relpath(path, root) for path in self.paths]
+        shown = ", ".join(names[:3]) + (f" and {len(names) - 3} more" if len(names) > 3 else "")
+        return f"{len(names)} file{'s' if len(names) != 1 else ''} changed ({shown})"
+
+
+class SourceWatcher:
+    """Polls a folder and reports debounced bursts of changes"""
+
+    def __init__(self, root, exclude=(), interval=0.25, debounce=0.5, max_delay=5.0):
+        """
+        Args:
+            root (str): Folder to watch
+            exclude: Files and folders inside it to ignore
+            interval (float): Seconds between polls
+            debounce (float): Seconds the folder must stay quiet before a burst is reported
+            max_delay (float): Report a burst after this many seconds even if changes keep coming
+        """
+        self.root = os.path.abspath(root)
+        self.exclude = list(exclude)
+        self.interval = interval
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.state = snapshot(self.root, self.exclude)
+
+    def rescan(self):
+        """Accept the folder as it is now, e.g. after a build wrote into it"""
+        self.state = snapshot(self.root, self.exclude)
+
+    def wait(self, should_stop=None):
+        """
+        Block until files change and the folder has been quiet for ``debounce`` seconds.
+
+        Args:
+            should_stop: Called between polls; waiting ends when it returns True
+
+        Returns:
+            ChangeSet: The burst of changes, or None if should_stop ended the wait
+        """
+        changed = set()
+        saved_at = None
+        first_seen = last_seen = None
+        while True:
+            if should_stop is not None and should_stop():
+                return None
+            polled_at = time.time()
+            time.sleep(self.interval)
+            current = snapshot(self.root, self.exclude)
+            paths = changed_files(self.state, current)
+            now = time.monotonic()
+            if paths:
+                self.state = current
+                changed.update(paths)
+                # Copies can keep an old modification time, so never date a save before the previous poll
+                mtimes = [current[path][0] / 1e9 for path in paths if path in current]
+                earliest = max(min(mtimes), polled_at) if mtimes else polled_at
+                saved_at = earliest if saved_at is None else min(saved_at, earliest)
+                first_seen = first_seen or now
+                last_seen = now
+            if changed and (now - last_seen >= self.debounce or now - first_seen >= self.max_delay):
+                return ChangeSet(sorted(changed), saved_at)
@@ -0,0 +1,262 @@
+"""
+Staging trees for Lightning EXE.
+
+Builds never write into the user's project. Each build works on a mirror
+of the project folder in the Lightning EXE cache, and the files the build
+generates (such as the runtime hook) only ever exist there. A project gets the
+same mirror every time it is built, so PyInstaller's analysis cache and the
+build fingerprints keep seeing the same paths. This also holds for GitHub
+sources, whose temporary checkout changes with every build. Two builds of
+one project at the same time each get a mirror of their own. A mirror can
+also be limited to some files and folders of the project, which is how a
+single script is staged without copying everything that sits next to it.
+
+Files are mirrored in the cheapest way the file system allows:
+
+* ``reflink``: a copy-on-write clone (Btrfs, XFS, APFS), which costs no
+  space and can't be changed through the original
+* ``hardlink``: the same file under a second name; generated files
+  replace the link instead of writing through it
+* ``copy``: a plain copy, when the cache is on another drive
+
+A mirror is updated rather than rebuilt, so only files whose size or
+modification time changed are linked again. Staging an unchanged project
+therefore costs one stat() per file.
+"""
+import contextlib
+import errno
+import json
+import os
+import shutil
+import sys
+import time
+
+from cache_utils import file_lock, get_cache_dir, hash_strings
+from import_scanner import SKIP_DIRS
+
+METHODS = ("reflink", "hardlink", "copy")
+MAX_SLOTS = 8  # mirrors per project, i.e. builds of one project that can run at once
+
+_FICLONE = 0x40049409  # Linux ioctl that clones a file's extents
+
+
+def _reflink(src, dst):
+    """Clone a file copy-on-write, or raise OSError when the file system can't"""
+    if sys.platform.startswith("linux"):
+        import fcntl
+        with open(src, "rb") as source, open(dst, "wb") as target:
+            try:
+                fcntl.ioctl(target.fileno(), _FICLONE, source.fileno())
+            except OSError:
+                target.close()
+                os.remove(dst)
+                raise
+    elif sys.platform == "darwin":
+        import ctypes
+        libc = ctypes.CDLL("libc.dylib", use_errno=True)
+        if libc.clonefile(os.fsencode(src), os.fsencode(dst), 0) != 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code), dst)
+    else:
+        raise OSError(errno.EOPNOTSUPP, "reflinks aren't supported here", dst)
+    shutil.copystat(src, dst)
+
+
+def _link(method, src, dst):
+    if method == "reflink":
+        _reflink(src, dst)
+    elif method == "hardlink":
+        os.link(src, dst)
+    else:
+        shutil.copy2(src, dst)
+
+
+def _remove(path):
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    elif os.path.lexists(path):
+        os.remove(path)
+
+
+class StagingTree:
+    """A project's mirror for one build; generated files are written here"""
+
+    def __init__(self, source_dir, path, state_path, generated, include=None):
+        self.source_dir = source_dir
+        self.path = path
+        self.state_path = state_path
+        self.generated = set(generated)  # relative paths the build writes itself
+        self.include = include  # files and folders to mirror, or None for the whole project
+        self.method = None
+        self.files = 0
+        self.updated = 0
+        self.duration = 0.0
+        self._lock = None
+
+    def release(self):
+        """Let the next build of the project use this mirror"""
+        if self._lock is not None:
+            self._lock.close()
+            self._lock = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    def staged(self, source_path):
+        """The mirror's copy of a path inside the project"""
+        return os.path.join(self.path, os.path.relpath(source_path, self.source_dir))
+
+    def write(self, relative, content):
+        """
+        Write a generated file into the mirror.
+
+        The file is only rewritten when its content changed, so its
+        modification time (and PyInstaller's cached analysis) stays valid.
+
+        Returns:
+            str: Path of the written file
+        """
+        if relative not in self.generated:
+            raise Exception(f"{relative} wasn't declared as a generated file when the project was staged")
+        path = os.path.join(self.path, relative)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                if f.read() == content:
+                    return path
+        except (OSError, UnicodeDecodeError):
+            pass
+        # Never write through a hard link into the user's project
+        _remove(path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+    def _walk(self):
+        """os.walk() over the project, or over just the included files and folders"""
+        if self.include is None:
+            yield from os.walk(self.source_dir)
+            return
+        files = {}
+        folders = []
+        for path in self.include:
+            if os.path.commonpath([self.source_dir, path]) != self.source_dir:
+                continue  # can't be mirrored, e.g. a requirements file included from ../
+            if os.path.isdir(path):
+                folders.append(path)
+            else:
+                files.setdefault(os.path.dirname(path), []).append(os.path.basename(path))
+        for root in sorted(files):
+            yield root, [], sorted(files[root])
+        for folder in sorted(folders):
+            yield from os.walk(folder)
+
+    def sync(self, exclude=()):
+        """Bring the mirror up to date with the project folder"""
+        start = time.monotonic()
+        excluded = {os.path.abspath(path) for path in exclude}
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+        self.method = state.get("method")
+        previously_generated = set(state.get("generated", []))
+
+        wanted = set()
+        for root, dirs, files in self._walk():
+            dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS and os.path.join(root, d) not in excluded
+                             and not os.path.exists(os.path.join(root, d, "pyvenv.cfg")))
+            relative_root = os.path.relpath(root, self.source_dir)
+            staged_root = os.path.normpath(os.path.join(self.path, relative_root))
+            if os.path.lexists(staged_root) and not os.path.isdir(staged_root):
+                os.remove(staged_root)  # was a file in the previous build
+            os.makedirs(staged_root, exist_ok=True)
+            for name in files:
+                src = os.path.join(root, name)
+                relative = os.path.normpath(os.path.join(relative_root, name))
+                if src in excluded or relative in self.generated:
+                    continue
+                wanted.add(relative)
+                dst = os.path.join(self.path, relative)
+                try:
+                    source_stat = os.stat(src)
+                except OSError:
+                    continue
+                self.files += 1
+                try:
+                    staged_stat = os.lstat(dst)
+                    if (staged_stat.st_size == source_stat.st_size and staged_stat.st_mtime_ns == source_stat.st_mtime_ns
+                            and relative not in previously_generated):
+                        continue
+                    _remove(dst)
+                except FileNotFoundError:
+                    pass
+                self._stage_file(src, dst)
+                self.updated += 1
+
+        # Drop files deleted from the project, and generated files this build doesn't write
+        for root, dirs, files in os.walk(self.path, topdown=False):
+            for name in files:
+                path = os.path.join(root, name)
+                relative = os.path.relpath(path, self.path)
+                if relative not in wanted and relative not in self.generated:
+                    os.remove(path)
+            if root != self.path and not os.listdir(root):
+                os.rmdir(root)
+
+        with open(self.state_path, "w", encoding="utf-8") as f:
+            json.dump({"source": self.source_dir, "method": self.method, "generated": sorted(self.generated)}, f)
+        self.duration = time.monotonic() - start
+
+    def _stage_file(self, src, dst):
+        methods = METHODS[METHODS.index(self.method):] if self.method else METHODS
+        for method in methods:
+            try:
+                _link(method, src, dst)
+            except OSError as e:
+                if method == "copy" or e.errno not in (errno.EOPNOTSUPP, errno.ENOTSUP, errno.EXDEV, errno.EINVAL,
+                                                       errno.ENOTTY, errno.EPERM, errno.EMLINK, errno.ENOSYS):
+                    raise
+                continue
+            # Remember the cheapest method that works on this file system
+            self.method = method
+            return
+
+
+def stage_project(key, source_dir, exclude=(), generated=(), include=None):
+    """
+    Mirror a project folder for one build.
+
+    Args:
+        key (str): Identifies the project across builds, e.g. its path or repository URL
+        source_dir (str): Folder to mirror
+        exclude: Files and folders inside it to leave out, e.g. the build output
+        generated: Relative paths of files the build will write with StagingTree.write()
+        include: Files and folders inside it to mirror (default: all of it)
+
+    Returns:
+        StagingTree: The up-to-date mirror, reserved for this build until release()
+    """
+    base = get_cache_dir("staging", hash_strings(key)[:24])
+    with contextlib.ExitStack() as stack:
+        for slot in range(MAX_SLOTS):
+            try:
+                stack.enter_context(file_lock(os.path.join(base, f"{slot}.lock"), timeout=0))
+                break
+            except TimeoutError:
+                continue
+        else:
+            # Every mirror is busy: wait for the first one
+            slot = 0
+            stack.enter_context(file_lock(os.path.join(base, "0.lock")))
+
+        tree = StagingTree(os.path.abspath(source_dir), os.path.join(base, str(slot), "tree"),
+                           os.path.join(base, str(slot), "state.json"), [os.path.normpath(g) for g in generated],
+                           None if include is None else [os.path.abspath(path) for path in include])
+        tree.sync(exclude)
+        tree._lock = stack.pop_all()
+    return tree
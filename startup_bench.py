@@ -0,0 +1,277 @@
+"""
+Startup benchmarks for executables built by Lightning EXE.
+
+Runs a produced executable several times and measures how long it takes
+to print its first output and to exit, and its peak memory use. Cold runs
+come first (after dropping the OS page cache when that's permitted), then
+warm runs. An import-time breakdown can be taken from a profiling build
+whose bootloader passes ``-X importtime`` to the bundled interpreter,
+since bundled executables ignore PYTHON* environment variables.
+"""
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+
+def executable_in(artifact):
+    """The file to run for a onefile executable, onedir folder or macOS .app bundle"""
+    if os.path.isdir(artifact):
+        name = os.path.basename(artifact.rstrip("/\\"))
+        if name.endswith(".app"):
+            return os.path.join(artifact, "Contents", "MacOS", name[:-4])
+        return os.path.join(artifact, name + (".exe" if sys.platform == "win32" else ""))
+    return artifact
+
+
+def drop_page_cache():
+    """
+    Evict file contents from the OS page cache so the next run reads from disk.
+
+    Only possible on Linux with root privileges.
+
+    Returns:
+        bool: True if the cache was dropped
+    """
+    if not sys.platform.startswith("linux"):
+        return False
+    try:
+        os.sync()
+        with open("/proc/sys/vm/drop_caches", "w") as f:
+            f.write("3\n")
+        return True
+    except OSError:
+        return False
+
+
+class RunSample:
+    """Measurements of one run of the executable"""
+
+    def __init__(self, kind, wall_time=None, first_output=None, peak_rss=None, returncode=None, timed_out=False):
+        self.kind = kind  # "cold" or "warm"
+        self.wall_time = wall_time  # seconds until the process exited
+        self.first_output = first_output  # seconds until the first byte on stdout/stderr
+        self.peak_rss = peak_rss  # bytes, including child processes such as the onefile payload
+        self.returncode = returncode
+        self.timed_out = timed_out
+
+    def to_dict(self):
+        return {
+            "kind": self.kind,
+            "wall_time": self.wall_time,
+            "first_output": self.first_output,
+            "peak_rss": self.peak_rss,
+            "returncode": self.returncode,
+            "timed_out": self.timed_out,
+        }
+
+
+def _watch(pipe, start, first, chunks):
+    """Read a pipe to the end, noting when the first byte arrived"""
+    while True:
+        data = pipe.read1(65536) if hasattr(pipe, "read1") else pipe.read(65536)
+        if not data:
+            break
+        if not first:
+            first.append(time.perf_counter() - start)
+        chunks.append(data)
+    pipe.close()
+
+
+def run_once(executable, kind="warm", args=(), timeout=60, env=None):
+    """
+    Run the executable once and measure it.
+
+    Returns:
+        tuple: (RunSample, captured stderr as text)
+    """
+    popen_args = {}
+    if sys.platform == "win32":
+        popen_args["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        popen_args["start_new_session"] = True
+
+    start = time.perf_counter()
+    process = subprocess.Popen([executable, *args], stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, env=env, **popen_args)
+    first = []
+    stdout, stderr = [], []
+    readers = [threading.Thread(target=_watch, args=(process.stdout, start, first, stdout), daemon=True),
+               threading.Thread(target=_watch, args=(process.stderr, start, first, stderr), daemon=True)]
+    for reader in readers:
+        reader.start()
+
+    sample = RunSample(kind)
+    # Threads can't be woken from os.wait4, so a timer kills runaway processes (e.g. GUI apps)
+    killer = threading.Timer(timeout, _kill_tree, args=(process, sample))
+    killer.start()
+    try:
+        if hasattr(os, "wait4"):
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            # ru_maxrss covers the largest reaped descendant too; kilobytes on Linux, bytes on macOS
+            sample.peak_rss = usage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+        else:
+            process.wait()
+    finally:
+        killer.cancel()
+    end = time.perf_counter()
+    for reader in readers:
+        reader.join(5)
+
+    sample.returncode = process.returncode
+    if not sample.timed_out:
+        sample.wall_time = end - start
+    sample.first_output = min(first) if first else None
+    return sample, b"".join(stderr).decode("utf-8", "replace")
+
+
+def _kill_tree(process, sample):
+    sample.timed_out = True
+    try:
+        if sys.platform == "win32":
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)], capture_output=True)
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+
+def parse_importtime(stderr, limit=25):
+    """
+    Summarize ``-X importtime`` output.
+
+    Returns:
+        list: The slowest top-level imports as dicts with ``module``,
+        ``self_us`` and ``cumulative_us``, slowest first
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        # Nested imports are indented below the module that triggered them
+        if name.startswith("  "):
+            continue
+        entries.append({"module": name.strip(), "self_us": int(parts[0]), "cumulative_us": int(parts[1])})
+    entries.sort(key=lambda e: e["cumulative_us"], reverse=True)
+    return entries[:limit]
+
+
+def _stats(values):
+    values = [v for v in values if v is not None]
+    if not values:
+        return None
+    return {"min": min(values), "median": statistics.median(values), "max": max(values)}
+
+
+class StartupReport:
+    """Results of benchmarking one executable"""
+
+    def __init__(self, artifact, samples, page_cache_dropped, importtime=None, options=None):
+        self.artifact = artifact
+        self.samples = samples
+        self.page_cache_dropped = page_cache_dropped
+        self.importtime = importtime
+        self.options = options or {}  # build options, so reports can be compared
+        self.compared = {}  # name -> StartupReport of other builds of the same program
+
+    def runs(self, kind):
+        return [s for s in self.samples if s.kind == kind]
+
+    def stats(self, kind):
+        runs = self.runs(kind)
+        return {
+            "runs": len(runs),
+            "wall_time": _stats([s.wall_time for s in runs]),
+            "first_output": _stats([s.first_output for s in runs]),
+            "peak_rss": _stats([s.peak_rss for s in runs]),
+        }
+
+    def summary(self):
+        """One-line description of the results"""
+        parts = []
+        for kind in ("cold", "warm"):
+            stats = self.stats(kind)
+            if not stats["runs"]:
+                continue
+            wall = stats["wall_time"]
+            text = f"{kind} {wall['median'] * 1000:.0f} ms" if wall else f"{kind} timed out"
+            if stats["first_output"]:
+                text += f" (first output {stats['first_output']['median'] * 1000:.0f} ms)"
+            parts.append(text)
+        rss = self.stats("warm")["peak_rss"] or self.stats("cold")["peak_rss"]
+        if rss:
+            parts.append(f"peak RSS {rss['max'] / 1e6:.1f} MB")
+        return "Startup: " + ", ".join(parts)
+
+    def to_dict(self):
+        return {
+            "artifact": self.artifact,
+            "size": artifact_size(self.artifact),
+            "platform": sys.platform,
+            "options": self.options,
+            "page_cache_dropped": self.page_cache_dropped,
+            "cold": self.stats("cold"),
+            "warm": self.stats("warm"),
+            "samples": [s.to_dict() for s in self.samples],
+            "importtime": self.importtime,
+            "compared": {name: report.to_dict() for name, report in self.compared.items()},
+        }
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+def artifact_size(artifact):
+    """Size in bytes of an executable or of everything in a build folder"""
+    if os.path.isfile(artifact):
+        return os.path.getsize(artifact)
+    total = 0
+    for root, _, files in os.walk(artifact):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total
+
+
+def benchmark(artifact, runs=5, cold_runs=1, args=(), timeout=60, profile_artifact=None, options=None, env=None):
+    """
+    Benchmark the startup of a built executable.
+
+    Args:
+        artifact (str): Onefile executable or onedir folder
+        runs (int): Number of warm runs
+        cold_runs (int): Number of runs preceded by dropping the page cache
+        args: Command-line arguments for the executable
+        timeout (float): Seconds before a run is killed
+        profile_artifact (str): Same program built with ``-X importtime``
+        options (dict): Build options to record in the report
+        env (dict): Environment for the runs (default: inherited)
+
+    Returns:
+        StartupReport: The measurements
+    """
+    executable = executable_in(artifact)
+    samples = []
+    dropped = True
+    for _ in range(cold_runs):
+        dropped = drop_page_cache() and dropped
+        samples.append(run_once(executable, "cold", args, timeout, env)[0])
+
+    # One untimed run so warm runs all start from the same state
+    run_once(executable, "warm", args, timeout, env)
+    for _ in range(runs):
+        samples.append(run_once(executable, "warm", args, timeout, env)[0])
+
+    importtime = None
+    if profile_artifact:
+        _, stderr = run_once(executable_in(profile_artifact), "warm", args, timeout)
+        importtime = parse_importtime(stderr)
+    return StartupReport(artifact, samples, dropped and cold_runs > 0, importtime, options)
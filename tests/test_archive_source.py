@@ -0,0 +1,120 @@
+"""
+Archive downloads against a local HTTP server standing in for GitHub.
+
+Run with ``python -m pytest tests`` or ``python -m unittest discover tests``
+from the repository root.
+"""
+import functools
+import hashlib
+import http.server
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import unittest
+import zipfile
+
+from archive_source import download_archive
+
+
+def make_tar_gz(path, files):
+    with tarfile.open(path, "w:gz") as tar:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+
+def make_zip(path, files):
+    with zipfile.ZipFile(path, "w") as archive:
+        for name, data in files.items():
+            archive.writestr(name, data)
+
+
+class ArchiveDownloadTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.served = tempfile.mkdtemp(prefix="lightning-exe-served-")
+        handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=cls.served)
+        handler.log_message = lambda *args: None
+        cls.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        shutil.rmtree(cls.served, ignore_errors=True)
+
+    def setUp(self):
+        self.work = tempfile.mkdtemp(prefix="lightning-exe-archive-")
+        self.dest = os.path.join(self.work, "repo")
+
+    def tearDown(self):
+        shutil.rmtree(self.work, ignore_errors=True)
+
+    def serve(self, name, maker, files):
+        maker(os.path.join(self.served, name), files)
+        return f"{self.base_url}/{name}"
+
+    def read(self, *parts):
+        with open(os.path.join(self.dest, *parts), "rb") as f:
+            return f.read()
+
+    def test_github_layout_drops_the_top_level_folder(self):
+        url = self.serve("github.tar.gz", make_tar_gz, {
+            "repo-main/main.py": b"print('hi')\n",
+            "repo-main/pkg/mod.py": b"x = 1\n",
+        })
+        download = download_archive(url, self.dest)
+        self.assertEqual(download.files, 2)
+        self.assertEqual(self.read("main.py"), b"print('hi')\n")
+        self.assertEqual(self.read("pkg", "mod.py"), b"x = 1\n")
+        self.assertFalse(os.path.exists(self.dest + ".partial"))
+
+    def test_flat_tarball_keeps_root_level_files(self):
+        url = self.serve("flat.tar.gz", make_tar_gz, {"main.py": b"print(1)\n", "lib/util.py": b""})
+        download_archive(url, self.dest)
+        self.assertEqual(self.read("main.py"), b"print(1)\n")
+        self.assertTrue(os.path.isfile(os.path.join(self.dest, "lib", "util.py")))
+
+    def test_flat_zip_keeps_root_level_files(self):
+        url = self.serve("flat.zip", make_zip, {"main.py": b"print(2)\n", "data/a.txt": b"a"})
+        download_archive(url, self.dest)
+        self.assertEqual(self.read("main.py"), b"print(2)\n")
+        self.assertEqual(self.read("data", "a.txt"), b"a")
+
+    def test_zip_with_one_top_level_folder(self):
+        url = self.serve("wrapped.zip", make_zip, {"project-1.0/main.py": b"print(3)\n"})
+        download_archive(url, self.dest)
+        self.assertEqual(self.read("main.py"), b"print(3)\n")
+
+    def test_checksum_is_verified(self):
+        url = self.serve("checked.tar.gz", make_tar_gz, {"main.py": b"print(4)\n"})
+        with open(os.path.join(self.served, "checked.tar.gz"), "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        self.assertEqual(download_archive(url, self.dest, expected_sha256=digest).sha256, digest)
+
+        other = os.path.join(self.work, "other")
+        with self.assertRaisesRegex(Exception, "checksum mismatch"):
+            download_archive(url, other, expected_sha256="0" * 64)
+        self.assertFalse(os.path.exists(other))
+        self.assertFalse(os.path.exists(other + ".partial"))
+
+    def test_unsafe_paths_are_refused(self):
+        url = self.serve("unsafe.tar.gz", make_tar_gz, {"../evil.py": b"", "main.py": b""})
+        with self.assertRaisesRegex(Exception, "unsafe path"):
+            download_archive(url, self.dest)
+        self.assertFalse(os.path.exists(self.dest))
+
+    def test_missing_archive(self):
+        with self.assertRaisesRegex(Exception, "Failed to download archive"):
+            download_archive(f"{self.base_url}/missing.tar.gz", self.dest)
+
+
+if __name__ == "__main__":
+    unittest.main()
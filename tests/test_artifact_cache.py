@@ -0,0 +1,57 @@
+"""
+Validation of artifact manifests read from a (possibly shared) cache.
+
+Run with ``python -m pytest tests`` or ``python -m unittest discover tests``
+from the repository root.
+"""
+import unittest
+
+from artifact_cache import check_manifest
+
+DIGEST = "0" * 64
+
+
+def folder(*files):
+    return {"kind": "dir", "files": list(files)}
+
+
+def blob(path, mode=0o644):
+    return {"path": path, "sha256": DIGEST, "mode": mode}
+
+
+class CheckManifestTest(unittest.TestCase):
+
+    def test_valid_manifests(self):
+        check_manifest({"kind": "file", "files": [blob("", 0o755)]})
+        check_manifest(folder(blob("app", 0o755), blob("_internal/lib.so"),
+                              {"path": "_internal/current", "link": "lib.so"},
+                              {"path": "_internal/sub/up", "link": "../lib.so"}))
+
+    def test_malformed_manifests(self):
+        for manifest in (None, [], {"kind": "zip", "files": []}, {"kind": "dir"}, folder("app"),
+                         folder({"mode": 0o644}), {"kind": "file", "files": [blob("app")]},
+                         {"kind": "file", "files": [blob(""), blob("")]}):
+            with self.subTest(manifest=manifest), self.assertRaises(ValueError):
+                check_manifest(manifest)
+
+    def test_paths_must_stay_inside_the_artifact(self):
+        for path in ("../evil", "a/../../evil", "/etc/passwd", "a//b", "./a", "a\\..\\evil", "C:evil", ""):
+            with self.subTest(path=path), self.assertRaises(ValueError):
+                check_manifest(folder(blob(path)))
+
+    def test_links_must_stay_inside_the_artifact(self):
+        for target in ("../outside", "a/../../outside", "/etc/passwd", "..\\outside"):
+            with self.subTest(target=target), self.assertRaises(ValueError):
+                check_manifest(folder({"path": "link", "link": target}))
+        with self.assertRaises(ValueError):
+            check_manifest({"kind": "file", "files": [{"path": "", "link": "app"}]})
+
+    def test_unsafe_modes_and_digests(self):
+        for item in (blob("app", 0o4755), blob("app", 0o2755), blob("app", "755"),
+                     {"path": "app", "sha256": "not-a-digest", "mode": 0o644}):
+            with self.subTest(item=item), self.assertRaises(ValueError):
+                check_manifest(folder(item))
+
+
+if __name__ == "__main__":
+    unittest.main()
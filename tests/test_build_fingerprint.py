@@ -0,0 +1,112 @@
+"""
+Fingerprints that decide whether a build can be skipped or restored.
+
+Run with ``python -m pytest tests`` or ``python -m unittest discover tests``
+from the repository root.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import build_fingerprint
+
+SPEC = """a = Analysis(
+    [{main!r}],
+    datas=[({data!r}, 'matplotlib/mpl-data')],
+    hiddenimports=['matplotlib'],
+)
+"""
+
+
+class TreeFingerprintTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work = tempfile.mkdtemp(prefix="lightning-exe-fp-")
+        cache = mock.patch.dict(os.environ, {"LIGHTNING_EXE_CACHE": os.path.join(self.work, "cache")})
+        cache.start()
+        self.addCleanup(cache.stop)
+        self.project = os.path.join(self.work, "project")
+        self.write("main.py", "print(1)\n")
+        self.write("data/config.json", "{}\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.work, ignore_errors=True)
+
+    def write(self, relative, content):
+        path = os.path.join(self.project, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+    def test_unchanged_tree_has_the_same_fingerprint(self):
+        first = build_fingerprint.tree_fingerprint(self.project)
+        self.assertEqual(build_fingerprint.tree_fingerprint(self.project), first)
+
+    def test_edits_change_the_fingerprint(self):
+        first = build_fingerprint.tree_fingerprint(self.project)
+        path = self.write("main.py", "print(2)\n")
+        stamp = os.stat(path).st_mtime + 10
+        os.utime(path, (stamp, stamp))
+        second = build_fingerprint.tree_fingerprint(self.project)
+        self.assertNotEqual(second, first)
+
+        self.write("data/new.txt", "")
+        self.assertNotEqual(build_fingerprint.tree_fingerprint(self.project), second)
+
+    def test_excluded_and_skipped_folders_dont_count(self):
+        first = build_fingerprint.tree_fingerprint(self.project, exclude=[os.path.join(self.project, "dist")])
+        self.write("dist/main", "built\n")
+        self.write("__pycache__/main.cpython-311.pyc", "")
+        self.assertEqual(build_fingerprint.tree_fingerprint(self.project, exclude=[os.path.join(self.project, "dist")]),
+                         first)
+
+    def test_record_matches_until_the_artifact_changes(self):
+        artifact = self.write("dist/main", "built\n")
+        self.assertFalse(build_fingerprint.matches("abc", artifact))
+        build_fingerprint.record("abc", artifact)
+        self.assertTrue(build_fingerprint.matches("abc", artifact))
+        self.assertFalse(build_fingerprint.matches("def", artifact))
+        self.write("dist/main", "tampered\n")
+        self.assertFalse(build_fingerprint.matches("abc", artifact))
+
+
+class PortableFingerprintTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work = tempfile.mkdtemp(prefix="lightning-exe-fp-")
+
+    def tearDown(self):
+        shutil.rmtree(self.work, ignore_errors=True)
+
+    def build_key(self, cache_name, env_name, source="print(1)\n"):
+        """Lay out a staged project and a build environment in a cache root and key the spec"""
+        root = os.path.join(self.work, cache_name)
+        with mock.patch.dict(os.environ, {"LIGHTNING_EXE_CACHE": root}):
+            project = os.path.join(root, "staging", "abc", "0", "tree")
+            env = os.path.join(root, "envs", env_name)
+            site = os.path.join(env, "lib", "python3", "site-packages")
+            os.makedirs(project)
+            os.makedirs(os.path.join(site, "matplotlib", "mpl-data"))
+            with open(os.path.join(project, "main.py"), "w", encoding="utf-8") as f:
+                f.write(source)
+            spec_path = os.path.join(root, "workpaths", "x", "main.spec")
+            os.makedirs(os.path.dirname(spec_path))
+            with open(spec_path, "w", encoding="utf-8") as f:
+                f.write(SPEC.format(main=os.path.join(project, "main.py"),
+                                    data=os.path.join(site, "matplotlib", "mpl-data")))
+            python_exe = os.path.join(env, "bin", "python")
+            return build_fingerprint.portable_fingerprint(spec_path, project, "deps", [python_exe, "-m", "PyInstaller"],
+                                                          python_exe, site_dirs=[site])
+
+    def test_same_build_from_two_cache_roots_has_the_same_key(self):
+        self.assertEqual(self.build_key("cache-a", "1111"), self.build_key("other/cache-b", "2222"))
+
+    def test_project_contents_change_the_key(self):
+        self.assertNotEqual(self.build_key("cache-a", "1111"), self.build_key("cache-b", "1111", "print(2)\n"))
+
+
+if __name__ == "__main__":
+    unittest.main()
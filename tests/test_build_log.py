@@ -0,0 +1,80 @@
+"""
+Batching and the ring buffer of the build log.
+
+Run with ``python -m pytest tests`` or ``python -m unittest discover tests``
+from the repository root.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from build_log import BuildLog
+
+
+class BuildLogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.flushes = []
+
+    def make_log(self, **kwargs):
+        return BuildLog(self.flushes.append, **kwargs)
+
+    def test_lines_are_flushed_in_batches(self):
+        log = self.make_log(flush_interval=60, flush_lines=3)
+        log.write("one")
+        log.write("two")
+        self.assertEqual(self.flushes, [])
+        log.write("three")
+        self.assertEqual(self.flushes, ["one\ntwo\nthree"])
+        log.write("four")
+        self.assertEqual(len(self.flushes), 1)
+        log.close()
+        self.assertEqual(self.flushes[-1], "one\ntwo\nthree\nfour")
+
+    def test_a_timer_flushes_a_partial_batch(self):
+        flushed = threading.Event()
+        log = BuildLog(lambda text: (self.flushes.append(text), flushed.set()), flush_interval=0.01, flush_lines=100)
+        log.write("only line")
+        self.assertTrue(flushed.wait(5))
+        self.assertEqual(self.flushes, ["only line"])
+
+    def test_flush_without_new_lines_does_nothing(self):
+        log = self.make_log(flush_interval=60, flush_lines=1)
+        log.write("line")
+        log.flush()
+        self.assertEqual(self.flushes, ["line"])
+
+    def test_ring_buffer_keeps_the_newest_lines(self):
+        log = self.make_log(max_lines=3, flush_interval=60, flush_lines=1000)
+        for i in range(10):
+            log.write(f"line {i}")
+        self.assertEqual(log.text(), "line 7\nline 8\nline 9")
+        log.close()
+        self.assertEqual(self.flushes, ["line 7\nline 8\nline 9"])
+
+    def test_file_keeps_every_line(self):
+        folder = tempfile.mkdtemp(prefix="lightning-exe-log-")
+        self.addCleanup(shutil.rmtree, folder, True)
+        path = os.path.join(folder, "logs", "app-build.log")
+        log = self.make_log(max_lines=2, flush_interval=60)
+        log.open_file(path)
+        for i in range(5):
+            log.write(f"line {i}")
+        log.close()
+        with open(path, "r", encoding="utf-8") as f:
+            self.assertEqual(f.read().splitlines(), [f"line {i}" for i in range(5)])
+        self.assertEqual(log.text(), "line 3\nline 4")
+
+    def test_clear_drops_buffered_lines(self):
+        log = self.make_log(flush_interval=60, flush_lines=100)
+        log.write("stale")
+        log.clear()
+        log.flush()
+        self.assertEqual(log.text(), "")
+        self.assertEqual(self.flushes, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+"""
+Parsing, quoting and applying baked-in command-line arguments.
+
+Run with ``python -m pytest tests`` or ``python -m unittest discover tests``
+from the repository root.
+"""
+import os
+import sys
+import unittest
+from unittest import mock
+
+import cmd_args_helper
+
+
+class ParseArgsTest(unittest.TestCase):
+
+    def test_quotes_group_words(self):
+        self.assertEqual(cmd_args_helper.parse_args('--name "John Smith" --greeting \'hi there\' --port 8080'),
+                         ["--name", "John Smith", "--greeting", "hi there", "--port", "8080"])
+
+    def test_newlines_separate_arguments(self):
+        self.assertEqual(cmd_args_helper.parse_args("--verbose\n--port 8080\n"), ["--verbose", "--port", "8080"])
+
+    def test_empty(self):
+        self.assertEqual(cmd_args_helper.parse_args(""), [])
+        self.assertEqual(cmd_args_helper.parse_args(None), [])
+
+    def test_unbalanced_quotes_fail(self):
+        with self.assertRaises(ValueError):
+            cmd_args_helper.parse_args('--name "John')
+
+    def test_round_trip(self):
+        for args in (
+            ["--name", "John Smith"],
+            ["it's", 'say "hi"', "back\\slash", "$HOME", "*.txt"],
+            ["", "  padded  ", "tab\there", "line\nbreak"],
+            ["--flag=a b", "ünïcödé"],
+        ):
+            with self.subTest(args=args):
+                self.assertEqual(cmd_args_helper.parse_args(cmd_args_helper.format_args(args)), args)
+
+
+class RuntimeHookTest(unittest.TestCase):
+
+    def run_hook(self, source, argv):
+        with mock.patch.object(sys, "argv", list(argv)), mock.patch.dict(os.environ, clear=False):
+            exec(compile(source, cmd_args_helper.RUNTIME_HOOK, "exec"), {})
+            return list(sys.argv), dict(os.environ)
+
+    def test_baked_arguments_come_before_the_given_ones(self):
+        source = cmd_args_helper.runtime_hook_source(cmd_args_helper.parse_args('--name "John Smith"'))
+        argv, _ = self.run_hook(source, ["app", "--name", "Jane"])
+        self.assertEqual(argv, ["app", "--name", "John Smith", "--name", "Jane"])
+
+    def test_environment_variables_are_set(self):
+        source = cmd_args_helper.runtime_hook_source(env_vars=[("LIGHTNING_EXE_TEST", "a 'quoted' value")])
+        argv, env = self.run_hook(source, ["app"])
+        self.assertEqual(argv, ["app"])
+        self.assertEqual(env["LIGHTNING_EXE_TEST"], "a 'quoted' value")
+
+
+if __name__ == "__main__":
+    unittest.main()
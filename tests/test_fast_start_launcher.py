@@ -0,0 +1,51 @@
+"""
+Cleanup of earlier unpacked versions by the fast-start launcher.
+
+Run with ``python -m pytest tests`` or ``python -m unittest discover tests``
+from the repository root.
+"""
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import fast_start_launcher
+
+
+class RemoveOldVersionsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="lightning-exe-apps-")
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def version(self, key, age):
+        """An unpacked version with its launcher, last launched ``age`` seconds ago"""
+        path = os.path.join(self.root, key)
+        os.makedirs(path)
+        with open(path + ".launcher", "wb") as f:
+            f.write(b"launcher")
+        stamp = time.time() - age
+        for entry in (path, path + ".launcher"):
+            os.utime(entry, (stamp, stamp))
+
+    def test_only_versions_unused_for_a_while_are_removed(self):
+        week = fast_start_launcher.KEEP_USED_VERSIONS
+        self.version("app-" + "a" * 16, 2 * week)
+        self.version("app-" + "b" * 16, 60)
+        self.version("app-" + "c" * 16, 2 * week)
+        self.version("app-cli-" + "d" * 16, 2 * week)
+
+        fast_start_launcher.remove_old_versions(self.root, "app", "app-" + "c" * 16)
+
+        self.assertEqual(sorted(os.listdir(self.root)), [
+            "app-" + "b" * 16, "app-" + "b" * 16 + ".launcher",
+            "app-" + "c" * 16, "app-" + "c" * 16 + ".launcher",
+            "app-cli-" + "d" * 16, "app-cli-" + "d" * 16 + ".launcher",
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()
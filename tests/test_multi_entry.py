@@ -0,0 +1,162 @@
+"""
+Multi-entry builds: entry point checks and the spec rewrite.
+
+Run with ``python -m pytest tests`` or ``python -m unittest discover tests``
+from the repository root.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+import multi_entry
+
+# What makespec writes for ``--onedir main.py tool.py``
+MAKESPEC_ONEDIR = """# -*- mode: python ; coding: utf-8 -*-
+
+
+a = Analysis(
+    ['../main.py', '../tool.py'],
+    pathex=[],
+    binaries=[],
+    datas=[],
+    hiddenimports=[],
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=['../.lightning-exe/launch.py'],
+    excludes=[],
+    noarchive=False,
+    optimize=0,
+)
+pyz = PYZ(a.pure)
+
+exe = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name='main',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=True,
+    console=True,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+)
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=True,
+    upx_exclude=[],
+    name='main',
+)
+"""
+
+
+class _Recorder:
+    """Stands in for one of PyInstaller's spec classes and remembers how it was called"""
+
+    calls = None
+
+    def __init__(self, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        self.calls.append(self)
+
+
+def run_spec(spec):
+    """Execute a spec against stand-ins; returns (EXE calls, COLLECT calls)"""
+    exes, collects = [], []
+
+    class Analysis(_Recorder):
+        calls = []
+
+        def __init__(self, scripts, **kwargs):
+            super().__init__(scripts, **kwargs)
+            # PyInstaller's TOC: the runtime hooks first, then the entry scripts
+            self.scripts = [os.path.basename(path) for path in kwargs["runtime_hooks"] + scripts]
+            self.pure, self.binaries, self.datas = ["pure"], ["binaries"], ["datas"]
+
+    class EXE(_Recorder):
+        calls = exes
+
+    class COLLECT(_Recorder):
+        calls = collects
+
+    exec(compile(spec, "main.spec", "exec"), {"Analysis": Analysis, "PYZ": lambda pure: "pyz",
+                                               "EXE": EXE, "COLLECT": COLLECT})
+    return exes, collects
+
+
+class RewriteSpecTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="lightning-exe-spec-")
+        self.spec_path = os.path.join(self.folder, "main.spec")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def rewrite(self, spec, names):
+        with open(self.spec_path, "w", encoding="utf-8") as f:
+            f.write(spec)
+        multi_entry.rewrite_spec(self.spec_path, names)
+        with open(self.spec_path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def test_one_executable_per_script_in_one_folder(self):
+        exes, collects = run_spec(self.rewrite(MAKESPEC_ONEDIR, ["main", "tool"]))
+
+        self.assertEqual([exe.kwargs["name"] for exe in exes], ["main", "tool"])
+        self.assertEqual([exe.args[1] for exe in exes], [["launch.py", "main.py"], ["launch.py", "tool.py"]])
+        for exe in exes:
+            self.assertEqual(exe.args[0], "pyz")
+            self.assertTrue(exe.kwargs["exclude_binaries"])
+            self.assertTrue(exe.kwargs["console"])
+
+        self.assertEqual(len(collects), 1)
+        self.assertEqual(collects[0].args, (*exes, ["binaries"], ["datas"]))
+        self.assertEqual(collects[0].kwargs["name"], "main")
+
+    def test_unexpected_layout_fails(self):
+        onefile = MAKESPEC_ONEDIR.split("coll = COLLECT(")[0]
+        with self.assertRaises(Exception):
+            self.rewrite(onefile, ["main", "tool"])
+        with self.assertRaises(Exception):
+            self.rewrite(MAKESPEC_ONEDIR.replace("    a.scripts,\n", "    a.scripts + [],\n"), ["main", "tool"])
+
+
+class EntryPointsTest(unittest.TestCase):
+
+    def test_split_entry_points(self):
+        self.assertEqual(multi_entry.split_entry_points(" stats.py, tools/fetch.py ,,"), ["stats.py", "tools/fetch.py"])
+        self.assertEqual(multi_entry.split_entry_points(None), [])
+
+    def test_check_entry_points(self):
+        self.assertIsNone(multi_entry.check_entry_points("app", ["stats.py", "tools/fetch.py"]))
+        self.assertIn("not a .py file", multi_entry.check_entry_points("app", ["stats.sh"]))
+        self.assertIn("'app'", multi_entry.check_entry_points("app", ["tools/app.py"]))
+        self.assertIn("'fetch'", multi_entry.check_entry_points("app", ["fetch.py", "tools/fetch.py"]))
+
+    def test_resolve_entry_points(self):
+        folder = tempfile.mkdtemp(prefix="lightning-exe-entries-")
+        self.addCleanup(shutil.rmtree, folder, True)
+        for name in ("main.py", "stats.py"):
+            with open(os.path.join(folder, name), "w", encoding="utf-8") as f:
+                f.write("")
+        main = os.path.join(folder, "main.py")
+        self.assertEqual(multi_entry.resolve_entry_points(main, ["stats.py"]), [os.path.join(folder, "stats.py")])
+        with self.assertRaises(Exception):
+            multi_entry.resolve_entry_points(main, ["missing.py"])
+        with self.assertRaises(Exception):
+            multi_entry.resolve_entry_points(main, ["../main.py"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+"""
+Checkouts from the bare-mirror cache, against a file:// upstream repository.
+
+Run with ``python -m pytest tests`` or ``python -m unittest discover tests``
+from the repository root.
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+import pull_repo
+
+GIT_IDENTITY = ["-c", "user.name=Lightning EXE", "-c", "user.email=tests@lightning-exe.invalid",
+                "-c", "commit.gpgsign=false", "-c", "tag.gpgsign=false"]
+
+
+def git(*args, cwd=None):
+    return subprocess.run(["git", *GIT_IDENTITY, *args], cwd=cwd, check=True,
+                          capture_output=True, text=True).stdout.strip()
+
+
+@unittest.skipIf(shutil.which("git") is None, "git is not installed")
+class MirrorCheckoutTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work = tempfile.mkdtemp(prefix="lightning-exe-git-")
+        cache = mock.patch.dict(os.environ, {"LIGHTNING_EXE_CACHE": os.path.join(self.work, "cache")})
+        cache.start()
+        self.addCleanup(cache.stop)
+
+        self.upstream = os.path.join(self.work, "upstream")
+        os.makedirs(self.upstream)
+        git("init", "--quiet", "--initial-branch=main", cwd=self.upstream)
+        self.first = self.commit("main.py", "print(1)\n")
+        git("tag", "v1", cwd=self.upstream)
+        self.url = "file://" + self.upstream
+        self.messages = []
+
+    def tearDown(self):
+        shutil.rmtree(self.work, ignore_errors=True)
+
+    def commit(self, name, content):
+        with open(os.path.join(self.upstream, name), "w", encoding="utf-8") as f:
+            f.write(content)
+        git("add", name, cwd=self.upstream)
+        git("commit", "--quiet", "-m", f"Update {name}", cwd=self.upstream)
+        return git("rev-parse", "HEAD", cwd=self.upstream)
+
+    def checkout(self, name, ref=None):
+        repo_dir = os.path.join(self.work, name)
+        commit = pull_repo.checkout_from_mirror(self.url, repo_dir, ref,
+                                                status_callback=lambda m, t="info": self.messages.append(m))
+        return repo_dir, commit
+
+    def read(self, repo_dir, name="main.py"):
+        with open(os.path.join(repo_dir, name), "r", encoding="utf-8") as f:
+            return f.read()
+
+    def test_first_checkout_creates_the_mirror(self):
+        repo_dir, commit = self.checkout("repo")
+        mirror = pull_repo.get_mirror_path(self.url)
+        self.assertTrue(os.path.isfile(os.path.join(mirror, "HEAD")))
+        self.assertEqual(commit, self.first)
+        self.assertEqual(self.read(repo_dir), "print(1)\n")
+        self.assertTrue(any(m.startswith("Creating local mirror") for m in self.messages))
+
+    def test_later_checkouts_fetch_new_commits(self):
+        self.checkout("repo1")
+        second = self.commit("main.py", "print(2)\n")
+        self.messages.clear()
+        repo_dir, commit = self.checkout("repo2")
+        self.assertEqual(commit, second)
+        self.assertEqual(self.read(repo_dir), "print(2)\n")
+        self.assertTrue(any(m.startswith("Fetching updates") for m in self.messages))
+        self.assertFalse(any(m.startswith("Creating local mirror") for m in self.messages))
+
+    def test_checkout_of_a_tag_and_a_branch(self):
+        git("checkout", "--quiet", "-b", "feature", cwd=self.upstream)
+        feature = self.commit("extra.py", "x = 1\n")
+        git("checkout", "--quiet", "main", cwd=self.upstream)
+
+        tagged, commit = self.checkout("tagged", "v1")
+        self.assertEqual(commit, self.first)
+        self.assertFalse(os.path.exists(os.path.join(tagged, "extra.py")))
+
+        branch, commit = self.checkout("branch", "feature")
+        self.assertEqual(commit, feature)
+        self.assertEqual(self.read(branch, "extra.py"), "x = 1\n")
+
+    def test_unknown_ref_fails(self):
+        with self.assertRaises(subprocess.CalledProcessError):
+            self.checkout("repo", "no-such-branch")
+
+    def test_remove_checkout_unregisters_the_worktree(self):
+        repo_dir, _ = self.checkout("repo")
+        mirror = pull_repo.get_mirror_path(self.url)
+        self.assertIn(repo_dir, git("--git-dir", mirror, "worktree", "list"))
+
+        pull_repo.remove_checkout(repo_dir)
+        self.assertFalse(os.path.exists(repo_dir))
+        self.assertNotIn(repo_dir, git("--git-dir", mirror, "worktree", "list"))
+
+        # The same folder can be checked out again
+        self.checkout("repo")
+        self.assertEqual(self.read(repo_dir), "print(1)\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+"""
+Parsing requirements files: markers, includes, per-line options and editables.
+
+Run with ``python -m pytest tests`` or ``python -m unittest discover tests``
+from the repository root.
+"""
+import json
+import os
+import shutil
+import tempfile
+import types
+import unittest
+from unittest import mock
+
+import requirements_resolver
+
+# Marker environment of a CPython 3.11 on Linux
+ENVIRONMENT = {
+    "implementation_name": "cpython", "implementation_version": "3.11.4", "os_name": "posix",
+    "platform_machine": "x86_64", "platform_release": "", "platform_system": "Linux", "platform_version": "",
+    "python_full_version": "3.11.4", "platform_python_implementation": "CPython", "python_version": "3.11",
+    "sys_platform": "linux",
+}
+
+
+class ResolveDependenciesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.project = tempfile.mkdtemp(prefix="lightning-exe-reqs-")
+        info = mock.patch.object(requirements_resolver, "interpreter_info",
+                                 return_value={"version": "3.11.4", "environment": ENVIRONMENT})
+        info.start()
+        self.addCleanup(info.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.project, ignore_errors=True)
+
+    def write(self, name, content):
+        path = os.path.join(self.project, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+    def resolve(self, content):
+        return requirements_resolver.resolve_dependencies([self.write("requirements.txt", content)], "python")
+
+    def test_markers_are_evaluated_for_the_build_interpreter(self):
+        deps = self.resolve(
+            "requests>=2.0\n"
+            "pywin32==306; sys_platform == 'win32'\n"
+            "tomli; python_version < '3.11'\n"
+            "typing-extensions; python_version >= '3.8'  # comment\n"
+        )
+        self.assertEqual([r.name for r in deps.requirements], ["requests", "pywin32", "tomli", "typing-extensions"])
+        self.assertEqual(deps.names, ["requests", "typing-extensions"])
+        self.assertEqual(deps.requirements[1].marker, 'sys_platform == "win32"')
+
+    def test_includes_and_constraints(self):
+        self.write("reqs/base.txt", "Pillow\n-c ../constraints.txt\n")
+        self.write("constraints.txt", "Pillow<11\nnumpy==1.26.4\n")
+        self.write("extra.txt", "beautifulsoup4\n")
+        deps = self.resolve("-r reqs/base.txt\n--requirement=extra.txt\nPyYAML\n")
+        self.assertEqual(deps.names, ["beautifulsoup4", "pillow", "pyyaml"])
+        self.assertEqual(deps.constraints, ["Pillow<11", "numpy==1.26.4"])
+        included = requirements_resolver.included_requirements_files([os.path.join(self.project, "requirements.txt")])
+        self.assertEqual(included, [os.path.join(self.project, name) for name in (
+            "requirements.txt", os.path.join("reqs", "base.txt"), "extra.txt", "constraints.txt")])
+
+    def test_hashes_and_continuation_lines(self):
+        deps = self.resolve(
+            "click==8.1.7 \\\n"
+            "    --hash=sha256:ae74fb96c20a0277a1d615f1e4d73c8414f5a98db8b799a7931d1582f3390c28 \\\n"
+            "    --hash=sha256:ca9853ad459e787e2192211578cc907e7594e294c7ccc834310722b41b9ca6de\n"
+            "--index-url https://example.invalid/simple\n"
+        )
+        self.assertEqual(deps.names, ["click"])
+        self.assertEqual(deps.options, ["--index-url https://example.invalid/simple"])
+
+    def test_editables_and_urls(self):
+        deps = self.resolve(
+            "-e ./libs/helper\n"
+            "-e git+https://example.invalid/tool.git#egg=my_tool\n"
+            "https://example.invalid/pkg-1.0.tar.gz\n"
+        )
+        self.assertEqual([r.name for r in deps.requirements], [None, "my_tool", None])
+        self.assertEqual(deps.names, ["my-tool"])
+
+    def test_key_follows_the_lines_not_their_order(self):
+        first = self.resolve("requests\nnumpy\n").key
+        self.assertEqual(self.resolve("numpy\n\n# comment\nrequests\n").key, first)
+        self.assertNotEqual(self.resolve("numpy\nrequests==2.31.0\n").key, first)
+
+    def test_import_names_cover_dependencies(self):
+        deps = self.resolve("Pillow\nrequests\nmissing-package\n")
+        probe = {"modules": {"pillow": ["PIL"], "requests": ["requests"], "urllib3": ["urllib3"]},
+                 "requires": {"requests": ["urllib3"]}}
+        missing = deps.apply_import_names(types.SimpleNamespace(returncode=0, stdout=json.dumps(probe)))
+        self.assertEqual(missing, ["missing-package"])
+        self.assertEqual(deps.top_level_modules, ["PIL", "requests"])
+        self.assertEqual(deps.dependency_modules, ["PIL", "requests", "urllib3"])
+
+
+if __name__ == "__main__":
+    unittest.main()
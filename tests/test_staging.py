@@ -0,0 +1,112 @@
+"""
+Staging mirrors: include lists, incremental updates and generated files.
+
+Run with ``python -m pytest tests`` or ``python -m unittest discover tests``
+from the repository root.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import staging
+
+
+class StageProjectTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work = tempfile.mkdtemp(prefix="lightning-exe-stage-")
+        cache = mock.patch.dict(os.environ, {"LIGHTNING_EXE_CACHE": os.path.join(self.work, "cache")})
+        cache.start()
+        self.addCleanup(cache.stop)
+        self.project = os.path.join(self.work, "project")
+        self.write("main.py", "import helper\n")
+        self.write("helper.py", "x = 1\n")
+        self.write("other.py", "y = 2\n")
+        self.write("assets/logo.txt", "logo\n")
+        self.write("dist/main", "old build\n")
+        self.write("__pycache__/helper.cpython-311.pyc", "")
+
+    def tearDown(self):
+        shutil.rmtree(self.work, ignore_errors=True)
+
+    def write(self, relative, content):
+        path = os.path.join(self.project, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+    def stage(self, **kwargs):
+        tree = staging.stage_project(self.project, self.project, **kwargs)
+        self.addCleanup(tree.release)
+        return tree
+
+    def staged_files(self, tree):
+        found = []
+        for root, dirs, files in os.walk(tree.path):
+            found.extend(os.path.relpath(os.path.join(root, name), tree.path).replace(os.sep, "/") for name in files)
+        return sorted(found)
+
+    def test_whole_project_without_excluded_and_skipped_folders(self):
+        tree = self.stage(exclude=[os.path.join(self.project, "dist")])
+        self.assertEqual(self.staged_files(tree), ["assets/logo.txt", "helper.py", "main.py", "other.py"])
+        self.assertIn(tree.method, staging.METHODS)
+        with open(tree.staged(os.path.join(self.project, "main.py")), "r", encoding="utf-8") as f:
+            self.assertEqual(f.read(), "import helper\n")
+
+    def test_include_list_mirrors_only_the_given_files_and_folders(self):
+        include = [os.path.join(self.project, name) for name in ("main.py", "helper.py", "assets")]
+        tree = self.stage(include=include + [os.path.join(self.work, "elsewhere.txt")])
+        self.assertEqual(self.staged_files(tree), ["assets/logo.txt", "helper.py", "main.py"])
+
+    def test_restaging_only_updates_changed_files(self):
+        tree = self.stage()
+        self.assertEqual(tree.updated, tree.files)
+        tree.release()
+
+        tree = self.stage()
+        self.assertEqual(tree.updated, 0)
+        tree.release()
+
+        # Saved the way editors do, as a new file; hard-linked mirrors already see in-place writes
+        path = os.path.join(self.project, "helper.py")
+        os.replace(self.write("helper.py.new", "x = 2  # changed\n"), path)
+        os.remove(os.path.join(self.project, "other.py"))
+        tree = self.stage()
+        self.assertEqual(tree.updated, 1)
+        self.assertNotIn("other.py", self.staged_files(tree))
+        with open(tree.staged(path), "r", encoding="utf-8") as f:
+            self.assertEqual(f.read(), "x = 2  # changed\n")
+
+    def test_narrowing_the_include_list_drops_files(self):
+        self.stage().release()
+        tree = self.stage(include=[os.path.join(self.project, "main.py")])
+        self.assertEqual(self.staged_files(tree), ["main.py"])
+
+    def test_generated_files_stay_out_of_the_project(self):
+        tree = self.stage(generated=[".lightning-exe/launch.py"])
+        path = tree.write(".lightning-exe/launch.py", "print('hook')\n")
+        self.assertTrue(path.startswith(tree.path))
+        self.assertFalse(os.path.exists(os.path.join(self.project, ".lightning-exe")))
+        with self.assertRaises(Exception):
+            tree.write("undeclared.py", "")
+
+        # A generated file replaces a hard link instead of writing through it
+        tree = staging.stage_project(self.project + "-other", self.project, generated=["main.py"])
+        self.addCleanup(tree.release)
+        tree.write("main.py", "generated\n")
+        with open(os.path.join(self.project, "main.py"), "r", encoding="utf-8") as f:
+            self.assertEqual(f.read(), "import helper\n")
+
+    def test_concurrent_builds_get_separate_mirrors(self):
+        first = self.stage()
+        second = self.stage()
+        self.assertNotEqual(first.path, second.path)
+        first.release()
+        self.assertEqual(self.stage().path, first.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,333 @@
+"""
+Registry of the Python interpreters Lightning EXE can build with.
+
+Every build used to ask its interpreter for the same facts again: its
+version and marker environment to resolve requirements, and
+``PyInstaller --version`` to decide whether PyInstaller has to be
+installed. The registry probes an interpreter once and keeps the answer
+in the cache, keyed by the interpreter's path. An entry is used as long
+as the interpreter binary keeps its size and modification time and its
+site-packages folders are unchanged, so installing or removing packages
+is noticed without probing on every build.
+
+discover() finds the interpreters on this machine (the PATH, pyenv, the
+Windows ``py`` launcher), and find_interpreter() turns a version such as
+``3.12`` into one of them. Matrix builds use this.
+"""
+import glob
+import json
+import os
+import re
+import shutil
+import sys
+
+import process_runner
+from cache_utils import file_lock, get_cache_dir
+
+# Runs inside the interpreter being registered; kept to syntax every Python 3 understands
+_PROBE = r"""
+import json, os, platform, site, sys, sysconfig
+try:
+    from importlib import metadata
+except ImportError:
+    metadata = None
+
+def dist_version(name, module):
+    if metadata is not None:
+        try:
+            return metadata.version(name)
+        except metadata.PackageNotFoundError:
+            return None
+    import importlib.util
+    return "unknown" if importlib.util.find_spec(module) else None
+
+impl = sys.implementation
+version = "{0.major}.{0.minor}.{0.micro}".format(impl.version)
+if impl.version.releaselevel != "final":
+    version += impl.version.releaselevel[0] + str(impl.version.serial)
+site_dirs = [site.getusersitepackages()] + list(getattr(site, "getsitepackages", lambda: [])())
+site_dirs.append(sysconfig.get_paths()["purelib"])
+print(json.dumps({
+    "executable": sys.executable,
+    "version": sys.version,
+    "python_version": platform.python_version(),
+    "implementation": impl.name,
+    "platform": sysconfig.get_platform(),
+    "prefix": sys.prefix,
+    "base_prefix": getattr(sys, "base_prefix", sys.prefix),
+    "site": sorted(set(p for p in site_dirs if os.path.isdir(p))),
+    "pyinstaller": dist_version("pyinstaller", "PyInstaller"),
+    "pip": dist_version("pip", "pip"),
+    "environment": {
+        "implementation_name": impl.name,
+        "implementation_version": version,
+        "os_name": os.name,
+        "platform_machine": platform.machine(),
+        "platform_release": platform.release(),
+        "platform_system": platform.system(),
+        "platform_version": platform.version(),
+        "python_full_version": platform.python_version(),
+        "platform_python_implementation": platform.python_implementation(),
+        "python_version": ".".join(platform.python_version_tuple()[:2]),
+        "sys_platform": sys.platform,
+    },
+}))
+"""
+
+_PYTHON_NAME = re.compile(r"^python(3(\.\d+)?)?(\.exe)?$", re.IGNORECASE)
+
+
+class Interpreter:
+    """What the registry knows about one interpreter"""
+
+    def __init__(self, path, info):
+        self.path = path
+        self.info = info
+
+    @property
+    def version(self):
+        """e.g. ``3.12.1``"""
+        return self.info["python_version"]
+
+    @property
+    def platform(self):
+        """sysconfig platform, e.g. ``linux-x86_64`` or ``win-amd64``"""
+        return self.info["platform"]
+
+    @property
+    def pyinstaller(self):
+        """Installed PyInstaller version, or None"""
+        return self.info["pyinstaller"]
+
+    @property
+    def pip(self):
+        """Installed pip version, or None"""
+        return self.info["pip"]
+
+    @property
+    def is_venv(self):
+        return self.info["prefix"] != self.info["base_prefix"]
+
+    @property
+    def tag(self):
+        """Short name for output folders, e.g. ``py3.12-linux-x86_64``"""
+        prefix = "py" if self.info["implementation"] == "cpython" else self.info["implementation"]
+        short = ".".join(self.version.split(".")[:2])
+        return f"{prefix}{short}-{self.platform}"
+
+    def matches(self, spec):
+        """True for a version prefix such as ``3.12`` or ``3.12.1``"""
+        return self.version == spec or self.version.startswith(spec + ".")
+
+    def describe(self):
+        tools = f"PyInstaller {self.pyinstaller}" if self.pyinstaller else \
+            ("pip, no PyInstaller" if self.pip else "no pip or PyInstaller")
+        kind = "virtualenv, " if self.is_venv else ""
+        return f"Python {self.version} ({kind}{self.platform}, {tools}) at {self.path}"
+
+
+def _stamp(path, site_dirs=()):
+    """What has to stay the same for a registry entry to be valid"""
+    stamp = []
+    for item in [path] + list(site_dirs):
+        try:
+            st = os.stat(item)
+            stamp.append([st.st_size, st.st_mtime_ns] if item == path else st.st_mtime_ns)
+        except OSError:
+            stamp.append(None)
+    return stamp
+
+
+class ToolchainRegistry:
+    """Probed interpreters, persisted in the Lightning EXE cache"""
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(get_cache_dir("toolchains"), "interpreters.json")
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, entries):
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entries, f, indent=1)
+        os.replace(tmp, self.path)
+
+    def cached(self, python_exe):
+        """
+        The registry entry of an interpreter, if it's still valid.
+
+        Returns:
+            Interpreter, or the error message if the interpreter couldn't be run, or None if it
+            has to be probed
+        """
+        path = os.path.abspath(python_exe)
+        entry = self._load().get(path)
+        if entry is None or entry["stamp"] != _stamp(path, entry.get("info", {}).get("site", ())):
+            return None
+        return Interpreter(path, entry["info"]) if "info" in entry else entry["error"]
+
+    def lookup_all(self, paths, cancel=None):
+        """
+        Look up several interpreters, probing the ones that aren't registered side by side.
+
+        Returns:
+            dict: path -> Interpreter, or the error message for interpreters that couldn't be run
+        """
+        paths = [os.path.abspath(p) for p in paths]
+        found = {}
+        for path in paths:
+            interpreter = self.cached(path)
+            if interpreter is not None:
+                found[path] = interpreter
+        missing = [p for p in dict.fromkeys(paths) if p not in found]
+        if not missing:
+            return found
+
+        # Each interpreter is probed once, so there's nothing to gain from keeping it warm
+        results = process_runner.run_concurrently([[p, "-c", _PROBE] for p in missing], return_errors=True,
+                                                  cancel=cancel, merge_stderr=False, warm=False)
+        probed = {}
+        for path, result in zip(missing, results):
+            if isinstance(result, process_runner.ProcessCancelled):
+                raise result
+            info = None
+            if isinstance(result, BaseException):
+                error = str(result)
+            else:
+                try:
+                    info = json.loads(result.stdout) if result.returncode == 0 else None
+                except ValueError:
+                    pass
+                lines = (result.stderr or result.stdout).strip().splitlines()
+                error = lines[-1] if lines else f"exited with code {result.returncode}"
+            if info is None:
+                # Remembered too, so scripts named python* aren't run again on every discovery
+                probed[path] = {"stamp": _stamp(path), "error": error}
+                found[path] = error
+            else:
+                probed[path] = {"stamp": _stamp(path, info["site"]), "info": info}
+                found[path] = Interpreter(path, info)
+
+        with file_lock(self.path + ".lock"):
+            entries = self._load()
+            entries.update(probed)
+            self._save(entries)
+        return found
+
+    def lookup(self, python_exe, cancel=None):
+        """
+        Registry entry of an interpreter, probing it if needed.
+
+        Raises:
+            Exception: If the interpreter can't be run
+            ProcessCancelled: If the build was cancelled
+        """
+        path = os.path.abspath(python_exe)
+        interpreter = self.lookup_all([path], cancel)[path]
+        if not isinstance(interpreter, Interpreter):
+            raise Exception(f"Could not run the Python interpreter {python_exe}: {interpreter}")
+        return interpreter
+
+    def forget(self, python_exe=None):
+        """Drop one interpreter, or all of them, so they're probed again"""
+        with file_lock(self.path + ".lock"):
+            entries = self._load() if python_exe else {}
+            entries.pop(os.path.abspath(python_exe or ""), None)
+            self._save(entries)
+
+    def discover(self, extra=(), cancel=None):
+        """
+        Find the interpreters on this machine.
+
+        Args:
+            extra: More interpreter paths to include
+
+        Returns:
+            list: Interpreter objects, newest version first, one per installation
+        """
+        found = {}
+        for path in candidate_paths() + [os.path.abspath(p) for p in extra]:
+            if path not in found and os.path.isfile(path):
+                found[path] = None
+        interpreters = {}
+        for path, interpreter in self.lookup_all(list(found), cancel).items():
+            if not isinstance(interpreter, Interpreter):
+                continue
+            # pyenv shims, symlinks and aliases all lead to the same installation
+            key = (os.path.realpath(interpreter.info["executable"] or path), interpreter.info["prefix"])
+            if key not in interpreters or path == interpreter.info["executable"]:
+                interpreters[key] = interpreter
+        return sorted(interpreters.values(),
+                      key=lambda i: ([int(p) for p in re.findall(r"\d+", i.version)[:3]], i.path), reverse=True)
+
+
+def candidate_paths():
+    """Places interpreters are usually found: this one, the PATH, pyenv and the py launcher"""
+    paths = [sys.executable]
+    for folder in os.environ.get("PATH", "").split(os.pathsep):
+        if os.path.basename(os.path.normpath(folder)) == "shims":
+            continue  # pyenv and asdf shims; pyenv's versions are listed below
+        try:
+            names = sorted(os.listdir(folder))
+        except OSError:
+            continue
+        paths.extend(os.path.join(folder, name) for name in names if _PYTHON_NAME.match(name))
+
+    pyenv_root = os.environ.get("PYENV_ROOT") or os.path.expanduser("~/.pyenv")
+    if sys.platform == "win32":
+        paths.extend(glob.glob(os.path.join(pyenv_root, "pyenv-win", "versions", "*", "python.exe")))
+        launcher = shutil.which("py")
+        if launcher:
+            try:
+                listing = process_runner.run([launcher, "-0p"], merge_stderr=False, warm=False).stdout
+                paths.extend(m.group(1) for m in re.finditer(r"(\S+python\w*\.exe)\s*$", listing, re.MULTILINE))
+            except (OSError, process_runner.ProcessTimeout):
+                pass
+    else:
+        paths.extend(sorted(glob.glob(os.path.join(pyenv_root, "versions", "*", "bin", "python3"))))
+    return [os.path.abspath(p) for p in paths]
+
+
+_registry = ToolchainRegistry()
+
+
+def lookup(python_exe, cancel=None):
+    """ToolchainRegistry.lookup() on the per-user registry"""
+    return _registry.lookup(python_exe, cancel)
+
+
+def discover(extra=(), cancel=None):
+    """ToolchainRegistry.discover() on the per-user registry"""
+    return _registry.discover(extra, cancel)
+
+
+def forget(python_exe=None):
+    """ToolchainRegistry.forget() on the per-user registry"""
+    _registry.forget(python_exe)
+
+
+def find_interpreter(spec, cancel=None):
+    """
+    Resolve a path or a version such as ``3.12`` to an interpreter.
+
+    Versions pick the newest matching installation, preferring one that has PyInstaller.
+
+    Raises:
+        Exception: If nothing matches
+    """
+    if os.sep in spec or (os.altsep and os.altsep in spec) or os.path.isfile(spec):
+        return lookup(spec, cancel)
+    if not re.match(r"^\d+(\.\d+){0,2}$", spec):
+        path = shutil.which(spec)
+        if path is None:
+            raise Exception(f"No interpreter named {spec} on the PATH")
+        return lookup(path, cancel)
+    matches = [i for i in discover(cancel=cancel) if i.matches(spec) and not i.is_venv]
+    if not matches:
+        raise Exception(f"No Python {spec} found (looked on the PATH and in pyenv); give its path instead")
+    return sorted(matches, key=lambda i: i.pyinstaller is None)[0]
@@ -0,0 +1,314 @@
+"""
+Warm build interpreters for Lightning EXE.
+
+A build starts its interpreter several times: to ask for the PyInstaller
+version, to probe what is installed, to write the spec and to run
+PyInstaller. Each of those is a fresh process that imports PyInstaller
+again, which costs a few hundred milliseconds before any work is done.
+
+A warm interpreter is started once per build interpreter. It imports
+PyInstaller's build machinery up front and then forks a copy of itself
+for every command. The copy starts with everything already imported, but
+otherwise behaves like ``python -m ...`` or ``python -c ...`` would: it
+has its own process group, output and exit code, and commands can't
+leak state into each other. Forking needs POSIX; on Windows commands
+simply start cold.
+
+An interpreter whose site-packages change (pip installed or removed
+something) is replaced, so commands never see modules that are out of
+date.
+"""
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+
+# Programs that are worth forking warm; installers change the environment, so they start cold
+_COLD_MODULES = ("pip", "venv", "ensurepip")
+
+# Runs inside the build interpreter; argv[1] is the socket to listen on
+_SERVER = r'''
+import importlib, json, os, runpy, select, signal, site, socket, sys, sysconfig, time, traceback
+
+sys.path[0] = ""  # like python -m and -c: commands import from their working directory
+
+for name in ("PyInstaller.building.build_main", "PyInstaller.building.makespec", "PyInstaller.depend.analysis",
+             "PyInstaller.utils.hooks", "PyInstaller.configure", "importlib.metadata"):
+    try:
+        importlib.import_module(name)
+    except Exception:
+        pass
+
+site_dirs = [site.getusersitepackages()] + list(getattr(site, "getsitepackages", lambda: [])())
+site_dirs.append(sysconfig.get_paths()["purelib"])
+listener = socket.socket(socket.AF_UNIX)
+listener.bind(sys.argv[1])
+listener.listen(64)
+wake_r, wake_w = socket.socketpair()
+wake_w.setblocking(False)
+signal.signal(signal.SIGCHLD, lambda *args: None)
+signal.set_wakeup_fd(wake_w.fileno())
+print(json.dumps({"pid": os.getpid(), "site": sorted({p for p in site_dirs if os.path.isdir(p)}),
+                  "pyinstaller": "PyInstaller" in sys.modules}), flush=True)
+
+
+def run_job(conn, request):
+    os.setsid()
+    signal.set_wakeup_fd(-1)
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    listener.close()
+    for other in jobs.values():
+        other.close()
+    conn.sendall(b"%d\n" % os.getpid())
+    null = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(null, 0)
+    os.dup2(conn.fileno(), 1)
+    if request["stderr"]:
+        os.dup2(os.open(request["stderr"], os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 2)
+    else:
+        os.dup2(conn.fileno(), 2)
+    os.chdir(request["cwd"])
+    importlib.invalidate_caches()
+    if "logging" in sys.modules:
+        sys.modules["logging"]._startTime = time.time()  # PyInstaller logs milliseconds since this
+    mode, program, args = request["argv"][0], request["argv"][1], request["argv"][2:]
+    code = 0
+    try:
+        if mode == "-m":
+            sys.argv = [program] + args
+            runpy.run_module(program, run_name="__main__", alter_sys=True)
+        else:
+            sys.argv = ["-c"] + args
+            exec(compile(program, "<string>", "exec"), {"__name__": "__main__", "__builtins__": __builtins__})
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            code = e.code or 0
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    for stream in (sys.stdout, sys.stderr):
+        try:
+            stream.flush()
+        except Exception:
+            pass
+    os._exit(code)
+
+
+jobs = {}
+while True:
+    ready = select.select([listener, wake_r, sys.stdin], [], [])[0]
+    if sys.stdin in ready and not os.read(sys.stdin.fileno(), 1024):
+        break  # whoever started us is gone
+    if wake_r in ready:
+        wake_r.recv(4096)
+    if listener in ready:
+        conn = listener.accept()[0]
+        line = b""
+        while not line.endswith(b"\n"):
+            chunk = conn.recv(65536)
+            if not chunk:
+                break
+            line += chunk
+        if line.endswith(b"\n"):
+            pid = os.fork()
+            if pid == 0:
+                run_job(conn, json.loads(line))
+            jobs[pid] = conn
+        else:
+            conn.close()
+    while jobs:
+        pid, status = os.waitpid(-1, os.WNOHANG)
+        if pid == 0:
+            break
+        conn = jobs.pop(pid, None)
+        if conn is not None:
+            code = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+            try:
+                conn.sendall(b"\0exit %d\n" % code)
+            except OSError:
+                pass
+            conn.close()
+'''
+
+_EXIT_MARKER = b"\0exit "
+
+
+class _Output:
+    """Stream of a forked command's output that ends at the exit marker"""
+
+    def __init__(self, reader, process):
+        self.reader = reader
+        self.process = process
+
+    async def readline(self):
+        line = await self.reader.readline()
+        if line.startswith(_EXIT_MARKER) or (_EXIT_MARKER in line and line.endswith(b"\n")):
+            head, _, status = line.partition(_EXIT_MARKER)
+            self.process._finish(int(status))
+            return head  # output that didn't end with a newline
+        if not line:
+            self.process._finish(-9)  # the interpreter itself went away
+        return line
+
+
+class _StderrFile:
+    """Separate stderr of a forked command, read once it has finished"""
+
+    def __init__(self, path, process):
+        self.path = path
+        self.process = process
+        self.lines = None
+
+    async def readline(self):
+        if self.lines is None:
+            await self.process.wait()
+            with open(self.path, "rb") as f:
+                self.lines = f.readlines()
+            os.remove(self.path)
+            self.lines.reverse()
+        return self.lines.pop() if self.lines else b""
+
+
+class WarmProcess:
+    """A forked command; quacks like the asyncio process run_process() expects"""
+
+    def __init__(self, pid, reader, writer, stderr_path=None):
+        self.pid = pid
+        self.returncode = None
+        self.stdout = _Output(reader, self)
+        self.stderr = _StderrFile(stderr_path, self) if stderr_path else None
+        self._writer = writer
+        self._done = asyncio.Event()
+
+    def _finish(self, returncode):
+        if self.returncode is None:
+            self.returncode = returncode
+            self._writer.close()
+            self._done.set()
+
+    async def wait(self):
+        await self._done.wait()
+        return self.returncode
+
+
+class WarmInterpreter:
+    """One build interpreter kept running with PyInstaller imported"""
+
+    def __init__(self, python_exe):
+        self.python_exe = python_exe
+        self.directory = tempfile.mkdtemp(prefix="lightning-exe-")
+        self.socket_path = os.path.join(self.directory, "warm.sock")
+        server_path = os.path.join(self.directory, "warm_server.py")
+        with open(server_path, "w", encoding="utf-8") as f:
+            f.write(_SERVER)
+        self.process = subprocess.Popen([python_exe, server_path, self.socket_path], stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE, start_new_session=True)
+        hello = self.process.stdout.readline()
+        if not hello:
+            self.close()
+            raise Exception(f"Could not start a warm interpreter for {python_exe}")
+        info = json.loads(hello)
+        self.has_pyinstaller = info["pyinstaller"]
+        self.site_dirs = info["site"]
+        self.state = self._state()
+
+    def _state(self):
+        state = []
+        for path in [self.python_exe] + self.site_dirs:
+            try:
+                state.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                state.append(None)
+        return state
+
+    def is_current(self):
+        """False once the interpreter exited or its packages changed"""
+        return self.process.poll() is None and self._state() == self.state
+
+    async def spawn(self, cmd, cwd=None, merge_stderr=True):
+        """
+        Fork the interpreter to run ``[python, "-m" or "-c", ...]``.
+
+        Returns:
+            WarmProcess: The running command
+        """
+        stderr_path = None
+        if not merge_stderr:
+            fd, stderr_path = tempfile.mkstemp(dir=self.directory, suffix=".err")
+            os.close(fd)
+        reader, writer = await asyncio.open_unix_connection(self.socket_path, limit=2 ** 20)
+        request = {"argv": list(cmd[1:]), "cwd": os.path.abspath(cwd or os.getcwd()), "stderr": stderr_path}
+        writer.write(json.dumps(request).encode("utf-8") + b"\n")
+        await writer.drain()
+        pid = await reader.readline()
+        if not pid.strip().isdigit():
+            writer.close()
+            raise Exception(f"The warm interpreter for {self.python_exe} didn't start {cmd[1]} {cmd[2]}")
+        return WarmProcess(int(pid), reader, writer, stderr_path)
+
+    def close(self):
+        """Stop the interpreter; commands it is running keep going"""
+        if self.process.poll() is None:
+            self.process.stdin.close()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class WarmPool:
+    """Warm interpreters by path, started on first use"""
+
+    def __init__(self):
+        self._interpreters = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def supported():
+        return hasattr(os, "fork") and sys.platform != "win32"
+
+    def interpreter_for(self, cmd, env=None):
+        """
+        The warm interpreter that can run a command, or None if it should start cold.
+
+        Only ``python -m module`` and ``python -c code`` with the inherited environment
+        are forked, and not pip or venv.
+        """
+        if env is not None or len(cmd) < 3 or cmd[1] not in ("-m", "-c") or not self.supported():
+            return None
+        if not os.path.basename(cmd[0]).lower().startswith("python"):
+            return None
+        if cmd[1] == "-m" and cmd[2].split(".")[0] in _COLD_MODULES:
+            return None
+        python_exe = os.path.abspath(cmd[0])
+        with self._lock:
+            interpreter = self._interpreters.get(python_exe)
+            if interpreter is not None and not interpreter.is_current():
+                interpreter.close()
+                interpreter = None
+            if interpreter is None:
+                try:
+                    interpreter = self._interpreters[python_exe] = WarmInterpreter(python_exe)
+                except Exception:
+                    self._interpreters.pop(python_exe, None)
+                    return None
+            return interpreter
+
+    def describe(self):
+        """Paths of the running warm interpreters"""
+        with self._lock:
+            return sorted(path for path, interpreter in self._interpreters.items() if interpreter.is_current())
+
+    def close(self):
+        with self._lock:
+            for interpreter in self._interpreters.values():
+                interpreter.close()
+            self._interpreters.clear()
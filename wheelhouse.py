@@ -0,0 +1,231 @@
+"""
+Local wheelhouse for Lightning EXE.
+
+Requirements are resolved once, then every resolved distribution is
+downloaded (or built from source) into a content-addressed store in
+parallel. Each resolved requirement set gets a folder of links into that
+store, and installs run with ``--no-index --find-links`` against it, so
+repeat builds never touch the network and a pre-filled cache lets
+air-gapped machines build too.
+
+Layout inside the cache::
+
+    wheelhouse/blobs/<sha256[:2]>/<sha256>   wheel contents, stored once
+    wheelhouse/sources/<id>.json             source -> built wheel, for sdists and VCS URLs
+    wheelhouse/sets/<key>/                   links named like the wheels + wheelset.json
+"""
+import concurrent.futures
+import json
+import os
+import shutil
+import tempfile
+
+import process_runner
+from cache_utils import file_lock, get_cache_dir, hash_file, hash_strings
+
+MANIFEST = "wheelset.json"
+
+
+def is_offline():
+    """True when LIGHTNING_EXE_OFFLINE forbids reaching package indexes"""
+    return os.environ.get("LIGHTNING_EXE_OFFLINE", "").lower() in ("1", "true", "yes")
+
+
+class WheelSet:
+    """The wheels making up one resolved requirement set"""
+
+    def __init__(self, key, path):
+        self.key = key
+        self.path = path
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.path, MANIFEST)
+
+    def load(self):
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @property
+    def pins(self):
+        """Exact ``name==version`` requirements of the set"""
+        return [f"{w['name']}=={w['version']}" for w in self.load()["wheels"]]
+
+    def is_complete(self):
+        """True if the manifest exists and every wheel it lists is present"""
+        try:
+            wheels = self.load()["wheels"]
+        except (OSError, ValueError, KeyError):
+            return False
+        return all(os.path.exists(os.path.join(self.path, w["filename"])) for w in wheels)
+
+
+def _blob_path(sha256):
+    return os.path.join(get_cache_dir("wheelhouse", "blobs", sha256[:2]), sha256)
+
+
+def _store_blob(wheel_path):
+    """Move a wheel into the content-addressed store and return its sha256"""
+    sha256 = hash_file(wheel_path)
+    blob = _blob_path(sha256)
+    if os.path.exists(blob):
+        os.remove(wheel_path)
+    else:
+        # Wheels are built inside the wheelhouse, so this is an atomic rename
+        os.replace(wheel_path, blob)
+    return sha256
+
+
+def _link(src, dst):
+    """Hardlink src to dst, copying when links aren't possible"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _source_record_path(source_id):
+    return os.path.join(get_cache_dir("wheelhouse", "sources"), hash_strings(source_id)[:32] + ".json")
+
+
+def _pip_source(item):
+    """Return (pip requirement/URL to fetch, stable identifier of that source) for a report entry"""
+    info = item["download_info"]
+    url = info["url"]
+    archive = info.get("archive_info", {})
+    sha256 = archive.get("hashes", {}).get("sha256")
+    if "vcs_info" in info:
+        vcs = info["vcs_info"]
+        return f"{vcs['vcs']}+{url}@{vcs['commit_id']}", f"{url}@{vcs['commit_id']}"
+    if "dir_info" in info:
+        # Local project folders can change at any time, so they're never reused
+        return url, None
+    return url, f"sha256:{sha256}" if sha256 else url
+
+
+def resolve(python_exe, requirement_args, cancel=None):
+    """
+    Resolve requirements to exact distributions without installing anything.
+
+    Args:
+        python_exe (str): Interpreter whose pip (and platform) is used
+        requirement_args (list): pip arguments, e.g. ``["-r", "requirements.txt", "pyinstaller"]``
+        cancel (CancelToken): Stops pip when the build is cancelled
+
+    Returns:
+        list: Entries of pip's installation report
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        report_path = os.path.join(tmp, "report.json")
+        cmd = [python_exe, "-m", "pip", "install", "--dry-run", "--ignore-installed", "--quiet",
+               "--disable-pip-version-check", "--report", report_path, *requirement_args]
+        result = process_runner.run(cmd, phase="pip", cancel=cancel, merge_stderr=False)
+        if result.returncode != 0:
+            tail = "\n".join(result.stderr.strip().splitlines()[-5:])
+            raise Exception(f"Could not resolve requirements: {tail}")
+        with open(report_path, "r", encoding="utf-8") as f:
+            return json.load(f)["install"]
+
+
+def _fetch_wheel(python_exe, item, cancel=None):
+    """Make sure the wheel for one resolved distribution is in the store"""
+    name = item["metadata"]["name"]
+    version = item["metadata"]["version"]
+    source, source_id = _pip_source(item)
+
+    if source_id:
+        try:
+            with open(_source_record_path(source_id), "r", encoding="utf-8") as f:
+                record = json.load(f)
+            if os.path.exists(_blob_path(record["sha256"])):
+                return {"name": name, "version": version, "filename": record["filename"],
+                        "sha256": record["sha256"], "cached": True}
+        except (OSError, ValueError, KeyError):
+            pass
+
+    with tempfile.TemporaryDirectory(dir=get_cache_dir("wheelhouse", "tmp")) as tmp:
+        # Downloads ready-made wheels and builds sdists/VCS checkouts into one
+        cmd = [python_exe, "-m", "pip", "wheel", "--no-deps", "--quiet",
+               "--disable-pip-version-check", "--wheel-dir", tmp, source]
+        result = process_runner.run(cmd, phase="pip", cancel=cancel, merge_stderr=False)
+        wheels = [f for f in os.listdir(tmp) if f.endswith(".whl")]
+        if result.returncode != 0 or len(wheels) != 1:
+            tail = "\n".join(result.stderr.strip().splitlines()[-3:])
+            raise Exception(f"Could not fetch a wheel for {name}=={version}: {tail}")
+        filename = wheels[0]
+        sha256 = _store_blob(os.path.join(tmp, filename))
+
+    if source_id:
+        record_path = _source_record_path(source_id)
+        with open(record_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"source": source_id, "filename": filename, "sha256": sha256}, f)
+        os.replace(record_path + ".tmp", record_path)
+    return {"name": name, "version": version, "filename": filename, "sha256": sha256, "cached": False}
+
+
+def prefetch(key, python_exe, requirement_args, status_callback=None, max_workers=8, cancel=None):
+    """
+    Return the wheel set for a requirement set, filling the wheelhouse if needed.
+
+    Args:
+        key (str): Identifies the requirement set and interpreter
+        python_exe (str): Interpreter the wheels are for
+        requirement_args (list): pip requirement arguments
+        status_callback: Called as ``status_callback(message, status_type)``
+        max_workers (int): Downloads/builds running at the same time
+        cancel (CancelToken): Stops every pip run when the build is cancelled
+
+    Returns:
+        WheelSet: A complete wheel set
+
+    Raises:
+        Exception: If resolving or fetching fails, or the set is missing in offline mode
+        ProcessCancelled: If the build was cancelled
+    """
+    report = status_callback or (lambda message, status_type="info": print(message))
+    sets_dir = get_cache_dir("wheelhouse", "sets")
+    wheel_set = WheelSet(key, os.path.join(sets_dir, key[:24]))
+
+    with file_lock(wheel_set.path + ".lock"):
+        if wheel_set.is_complete():
+            os.utime(wheel_set.manifest_path)  # last use, for cache pruning
+            report(f"Using {len(wheel_set.pins)} wheels from the local wheelhouse", "info")
+            return wheel_set
+        if is_offline():
+            raise Exception("Offline mode: the local wheelhouse has no wheels for these requirements")
+
+        report("Resolving requirements...", "info")
+        items = resolve(python_exe, requirement_args, cancel)
+        report(f"Fetching {len(items)} wheels into the local wheelhouse ({max_workers} at a time)...", "info")
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+            wheels = list(pool.map(lambda item: _fetch_wheel(python_exe, item, cancel), items))
+
+        partial = wheel_set.path + ".partial"
+        shutil.rmtree(partial, ignore_errors=True)
+        os.makedirs(partial)
+        for wheel in wheels:
+            _link(_blob_path(wheel["sha256"]), os.path.join(partial, wheel["filename"]))
+        with open(os.path.join(partial, MANIFEST), "w", encoding="utf-8") as f:
+            json.dump({"key": key, "requirements": requirement_args,
+                       "wheels": [{k: w[k] for k in ("name", "version", "filename", "sha256")} for w in wheels]},
+                      f, indent=1)
+        shutil.rmtree(wheel_set.path, ignore_errors=True)
+        os.replace(partial, wheel_set.path)
+
+        reused = sum(1 for w in wheels if w["cached"])
+        report(f"Wheelhouse ready: {len(wheels) - reused} fetched, {reused} already stored", "success")
+        return wheel_set
+
+
+def install(python_exe, wheel_set, cancel=None):
+    """
+    Install a wheel set without contacting any package index.
+
+    Raises:
+        subprocess.CalledProcessError: If pip fails
+        ProcessCancelled: If the build was cancelled
+    """
+    cmd = [python_exe, "-m", "pip", "install", "--no-index", "--find-links", wheel_set.path,
+           "--disable-pip-version-check", "--quiet", *wheel_set.pins]
+    return process_runner.run(cmd, phase="pip", cancel=cancel, merge_stderr=False).check()